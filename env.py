@@ -8,6 +8,8 @@
 import os
 
 CONFIG_FILE=os.getcwd()+'/.config.json'
+#Clusters backed up by fleet mode, with their credentials
+FLEET_FILE=os.getcwd()+'/fleet.json'
 
 #Configurable default values
 DCOS_IP='127.0.0.1'
@@ -16,11 +18,26 @@ DCOS_PASSWORD='deleteme'
 DEFAULT_USER_PASSWORD='deleteme'
 DEFAULT_USER_SECRET='secret'
 
+#Metrics endpoint. A port of 0 disables the listener.
+METRICS_PORT=0
+METRICS_ADDRESS='127.0.0.1'
+METRICS_PATH='/metrics'
+
+#Log pipeline. An empty LOG_FILE disables the JSON-lines file sink.
+LOG_FILE=os.getcwd()+'/log/dcos-saver.jsonl'
+LOG_MAX_BYTES=10*1024*1024
+LOG_BACKUPS=5
+LOG_BATCH_SIZE=500
+LOG_PROGRESS_BAR_WIDTH=20
+
 #directories
 WORKING_DIR=os.getcwd()
+#where the program itself is installed, wherever it is run from
+PROJECT_DIR=os.path.dirname( os.path.abspath( __file__ ) )
 DATA_DIR=WORKING_DIR+'/data'
 SRC_DIR=WORKING_DIR+'/src'
 BACKUP_DIR=WORKING_DIR+'/backup'
+FLEET_DIR=WORKING_DIR+'/fleet'
 
 #data files
 USERS_FILE=DATA_DIR+'/users.json'
@@ -30,8 +47,95 @@ GROUPS_USERS_FILE=DATA_DIR+'/groups_users.json'
 ACLS_FILE=DATA_DIR+'/acls.json'
 ACLS_PERMISSIONS_FILE=DATA_DIR+'/acls_permissions.json'
 LDAP_FILE=DATA_DIR+'/ldap.json'
+LDAP_IMPORT_FILE=DATA_DIR+'/ldap_import.json'
 AGENTS_FILE=DATA_DIR+'/agents.json'
+AGENTS_INVENTORY_FILE=DATA_DIR+'/agents_inventory.json'
+AGENTS_WATCH_FILE=DATA_DIR+'/agents_watch.jsonl'
+INDEXES_FILE=DATA_DIR+'/indexes.json'
+EFFECTIVE_PERMISSIONS_FILE=DATA_DIR+'/effective_permissions.json'
+SNAPSHOT_DIFF_FILE=DATA_DIR+'/snapshot_diff.jsonl'
 SERVICE_GROUPS_FILE=DATA_DIR+'/service_groups.json'
+APPS_FILE=DATA_DIR+'/apps.json'
+#one summary per operation, e.g. run_summary_get.json, so a RESTORE keeps the numbers of the GET
+RUN_SUMMARY_FILE=DATA_DIR+'/run_summary_{0}.json'
+RUN_SUMMARY_OPERATIONS=[ 'GET', 'PUT', 'MIGRATE' ]
+SERVICE_GROUPS_HASHES_FILE=DATA_DIR+'/service_groups_hashes.json'
+RESPONSE_HASHES_FILE=DATA_DIR+'/response_hashes.json'
+RESTORE_VERIFY_FILE=DATA_DIR+'/restore_verify.json'
+FLEET_SUMMARY_FILE=FLEET_DIR+'/fleet_summary.json'
+#integrity manifest saved in every configuration directory
+MANIFEST_FILE_NAME='manifest.json'
+
+#resource files in the local buffer, indexed by resource type
+buffer_files = {
+'users':			USERS_FILE,
+'users_groups':		USERS_GROUPS_FILE,
+'groups':			GROUPS_FILE,
+'groups_users':		GROUPS_USERS_FILE,
+'acls':				ACLS_FILE,
+'acls_permissions':	ACLS_PERMISSIONS_FILE,
+'ldap':				LDAP_FILE,
+'agents':			AGENTS_FILE,
+'service_groups':	SERVICE_GROUPS_FILE,
+'apps':				APPS_FILE
+}
+
+#all the files of the local buffer saved with a configuration
+snapshot_files = list( buffer_files.values() ) + [
+	AGENTS_INVENTORY_FILE,
+	SERVICE_GROUPS_HASHES_FILE,
+	RESPONSE_HASHES_FILE
+] + [ RUN_SUMMARY_FILE.format( operation.lower() ) for operation in RUN_SUMMARY_OPERATIONS ]
+
+#how configurations are loaded and saved, in order of preference: copy-on-write clone,
+#hard link, copy. Buffer files are always replaced, never modified in place, so links are safe.
+MATERIALIZE_METHODS=[ 'reflink', 'link', 'copy' ]
+
+#Maximum number of tasks or requests run concurrently
+MAX_WORKERS=8
+#Read-back verification after a restore: small GETs, many more can be in flight at once
+VERIFY_MAX_WORKERS=32
+#Fleet mode: concurrent requests per cluster (unless set in the fleet file), and in total across clusters
+FLEET_CLUSTER_MAX_WORKERS=4
+FLEET_MAX_WORKERS=16
+#Cluster to cluster migration: concurrent reads from the source, writes to the target, and entities read ahead of the writes
+MIGRATE_READ_WORKERS=8
+MIGRATE_WRITE_WORKERS=8
+MIGRATE_QUEUE_SIZE=1000
+
+#Marathon deployments: polling backoff and timeout, in seconds
+DEPLOYMENT_POLL_INITIAL=1
+DEPLOYMENT_POLL_MAX=30
+DEPLOYMENT_TIMEOUT=1800
+
+#fields returned by Marathon in app definitions that can't be posted back
+MARATHON_READ_ONLY_FIELDS = [
+	'version',
+	'versionInfo',
+	'tasksStaged',
+	'tasksRunning',
+	'tasksHealthy',
+	'tasksUnhealthy',
+	'deployments',
+	'tasks',
+	'lastTaskFailure',
+	'readinessCheckResults',
+	'taskStats'
+]
+
+#Buffer files are scanned in chunks of this size when streamed
+BUFFER_CHUNK_SIZE=1024*1024
+#Lines printed at a time when checking the buffer
+CHECK_PAGE_SIZE=50
+
+#Run summary report
+SUMMARY_SLOWEST_REQUESTS=10
+
+#Agent capacity report: percentiles of per-agent resource usage
+AGENT_PERCENTILES=[ 50, 90, 99 ]
+
+#Agent watch: seconds between polls
+AGENTS_WATCH_INTERVAL=10
 
 MENU_WIDTH = 80
 
@@ -61,9 +165,25 @@ MSG_ERROR_NO_USERS		=	'Error finding Users in buffer. Please GET or LOAD Users i
 MSG_ERROR_NO_ACLS		=	'Error finding ACLs in buffer. Please GET or LOAD ACLs into buffer.'
 MSG_ERROR_NO_LDAP		=	'Error finding LDAP configuration in buffer. Please GET or LOAD LDAP configuration into buffer.'
 MSG_ERROR_NO_SERVICE_GROUPS	= 'Error finding Service Groups in buffer. Please GET or LOAD Service Groups into buffer.'
+MSG_WATCH_AGENTS_STOP	=	'Watching agents. Press Ctrl+C to stop.'
+MSG_ERROR_NO_APPS		=	'Error finding Apps in buffer. Please GET or LOAD Apps into buffer.'
+MSG_ERROR_DEPLOYMENT_TIMEOUT = 'Timed out waiting for the Marathon deployment to finish.'
+MSG_ENTER_CONFIG_COMPARE	= 'Enter name of the configuration to compare the buffer against, or leave empty to compare against the cluster'
+MSG_RESTORE_CHANGES		= 'Restore these changes? (y/n)'
+MSG_NO_CHANGES			= 'No changes found.'
+MSG_NEXT_PAGE = 'Press ENTER for more, q to stop'
+MSG_ENTER_SNAPSHOT_FROM = 'Enter name of the configuration to compare from'
+MSG_ENTER_SNAPSHOT_TO = 'Enter name of the configuration to compare to'
+MSG_ENTER_PERMISSIONS_QUERY = 'Enter a rid (e.g. dcos:adminrouter:service:marathon), user:<uid> or group:<gid>'
+MSG_ENTER_SERVICE_GROUPS_PATTERN = 'Enter path pattern of the Service Groups to select (e.g. /prod/payments/**)'
+MSG_NO_SERVICE_GROUPS_MATCH = 'No Service Groups match the pattern.'
 
 MSG_AVAIL_CONFIGS		=	'Currently available configurations'
 MSG_ENTER_CONFIG_LOAD	=	'Enter name of the configuration to load'
+MSG_ENTER_CONFIG_VERIFY	=	'Enter name of the configuration to verify (ENTER to verify all)'
+MSG_ENTER_OTHER_DCOS_IP	=	'Enter the DC/OS IP address of the other cluster'
+MSG_ENTER_OTHER_USERNAME	=	'Enter the username on the other cluster'
+MSG_ENTER_OTHER_PASSWORD	=	'Enter the password on the other cluster'
 MSG_ENTER_CONFIG_SAVE	=	'Please note that saving under the same name as an existing config will OVERWRITE IT!.\nEnter name of the configuration to save '
 MSG_CURRENT_USERS		=	'Users currently in buffer: '
 MSG_CURRENT_GROUPS		=	'Groups currently in buffer: '
@@ -77,6 +197,7 @@ MSG_LOAD_SAVE			= 'LOAD/SAVE configuration from/to local buffer.'
 MSG_LIST_CONFIG			= 'LIST configurations available on disk.		'
 MSG_LOAD_CONFIG			= 'LOAD a configuration available on disk.		'
 MSG_SAVE_CONFIG			= 'SAVE current local buffer as configuration to disk.'
+MSG_VERIFY_CONFIG		= 'VERIFY configurations on disk against their manifest.'
 MSG_SHOW_CONFIG			= 'SHOW Configuration for this application.		'
 MSG_GET_MENU			= 'Commands to GET information from DC/OS 		'
 MSG_GET_USERS			= 'GET Users from DC/OS cluster.				'
@@ -84,7 +205,10 @@ MSG_GET_GROUPS			= 'GET Groups from DC/OS cluster.				'
 MSG_GET_ACLS			= 'GET ACLs from DC/OS cluster.					'
 MSG_GET_LDAP			= 'GET LDAP configuration from DC/OS cluster.	'
 MSG_GET_AGENTS			= 'GET AGENT status from DC/OS cluster			'
+MSG_WATCH_AGENTS		= 'WATCH AGENTS joining, leaving or changing state.	'
 MSG_GET_SERVICE_GROUPS	= 'GET Service Groups from DC/OS cluster		'
+MSG_GET_SERVICE_GROUPS_SELECTION = 'GET selected Service Groups (path pattern) from DC/OS cluster.'
+MSG_GET_APPS			= 'GET Apps and Pods from DC/OS cluster.			'
 MSG_GET_ALL				= 'GET ALL config from DC/OS cluster.			'
 MSG_PUT_MENU			= 'Commands to RESTORE information to DC/OS 	'
 MSG_PUT_USERS			= 'RESTORE Users to DC/OS cluster.				'
@@ -92,13 +216,23 @@ MSG_PUT_GROUPS			= 'RESTORE Groups to DC/OS cluster.				'
 MSG_PUT_ACLS			= 'RESTORE ACLs to DC/OS cluster.				'
 MSG_PUT_LDAP			= 'RESTORE LDAP configuration to DC/OS cluster. '
 MSG_PUT_SERVICE_GROUPS	= 'RESTORE Service Groups to DC/OS cluster. 	'
+MSG_PUT_SERVICE_GROUPS_TREE = 'RESTORE Service Groups and apps to DC/OS cluster as a single deployment.'
+MSG_PUT_SERVICE_GROUPS_CHANGES = 'RESTORE only the changed Service Groups and apps to DC/OS cluster.'
+MSG_PUT_SERVICE_GROUPS_SELECTION = 'RESTORE selected Service Groups (path pattern) to DC/OS cluster.'
+MSG_PUT_APPS			= 'RESTORE Apps and Pods to DC/OS cluster.		'
 MSG_PUT_ALL				= 'RESTORE ALL config to DC/OS cluster.			'
+MSG_VERIFY_RESTORE		= 'VERIFY the DC/OS cluster matches the config in the buffer.'
+MSG_MIGRATE_CLUSTER		= 'MIGRATE users, groups and ACLs straight to another DC/OS cluster.'
+MSG_COMPARE_CLUSTERS	= 'COMPARE the config of the DC/OS cluster with another one.'
 MSG_CHECK_MENU			= 'CHECK current local buffer configuration.	'
 MSG_CHECK_USERS			= 'CHECK Users in local buffer.					'
 MSG_CHECK_GROUPS		= 'CHECK Groups in local buffer.				'
 MSG_CHECK_ACLS			= 'CHECK ACLs in local buffer.					'
 MSG_CHECK_LDAP			= 'CHECK LDAP configuration in local buffer.	'
 MSG_CHECK_SERVICE_GROUPS = 'CHECK Service Groups in local buffer.	'
+MSG_DIFF_SNAPSHOTS		= 'DIFF two configurations saved to disk.		'
+MSG_QUERY_PERMISSIONS	= 'QUERY who can do what in local buffer.		'
+MSG_EXPORT_EFFECTIVE_PERMISSIONS = 'EXPORT effective permissions of every user in local buffer.'
 MSG_EXIT				= 'EXIT this application.						'
 #Error messages
 ERROR_CONFIG_NOT_FOUND 	= 'Configuration not found.						'
@@ -120,25 +254,39 @@ hotkeys_main = {
 'd' : 'list_configs',
 's'	: 'save_configs',
 'l' : 'load_configs',
+'y'	: 'verify_configs',
 '0' : 'show_config',
 '1' : 'get_users',
 '2' : 'get_groups',
 '3' : 'get_acls',
 'z'	: 'get_ldap',
 'a' : 'get_agents',
+'w'	: 'watch_agents',
 'b'	: 'get_service_groups',
+'c'	: 'get_service_groups_selection',
+'n'	: 'get_apps',
 'g' : 'get_all',
 '4' : 'post_users',
 '5' : 'post_groups',
 '6' : 'post_acls',
 'k'	: 'post_ldap',
 'e'	: 'post_service_groups',
+'f'	: 'post_service_groups_tree',
+'h'	: 'post_service_groups_changes',
+'m'	: 'post_service_groups_selection',
+'o'	: 'post_apps',
 'p' : 'post_all',
+'r'	: 'verify_restore',
+'i'	: 'migrate_cluster',
+'C'	: 'compare_clusters',
 '7' : 'check_users',
 '8' : 'check_groups',
 '9' : 'check_acls',
 'j'	: 'check_ldap',
 'v'	: 'check_service_groups',
+'t'	: 'diff_snapshots',
+'q'	: 'query_permissions',
+'u'	: 'export_effective_permissions',
 'x' : 'exit',
 '~' : 'noop'
 }
@@ -155,6 +303,28 @@ secondary_functions = {
 'noop'			:'noop'	
 }
 
+#primary functions run by "get_all", in parallel, each followed by its secondary
+get_all_functions = [
+'get_users',
+'get_groups',
+'get_acls',
+'get_ldap',
+'get_service_groups',
+'get_apps',
+'get_agents'
+]
+
+#waves of functions run by "post_all": each wave in parallel, once the previous one succeeded.
+#entities first, then the memberships, grants and apps that refer to them.
+#memberships are only written from the groups side (PUT /groups/{gid}/users/{uid}).
+post_all_waves = [
+	[ 'post_users', 'post_groups', 'post_acls', 'post_ldap', 'post_service_groups' ],
+	[ 'post_groups_users', 'post_acls_permissions', 'post_apps' ]
+]
+
+#set while running several functions at once, so that they don't wait for the user
+UNATTENDED = False
+
 # y/n input options
 yYnN = ['y','Y','n','N']
 
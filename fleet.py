@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+# fleet.py: back up several DC/OS clusters at once, unattended
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Usage:
+#	fleet.py [fleet file]		back up every cluster listed in the fleet file
+#								(by default $PWD/fleet.json) to its own snapshot
+#
+# Each cluster is backed up by this same script, run as
+# "fleet.py --cluster <name> ..." from the cluster's working directory.
+# See src/fleet_backup.py for the format of the fleet file.
+
+import sys
+import os
+import argparse
+
+#the project directory, as the processes for each cluster run from their own working directory
+PROJECT_DIR = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path[:0] = [ PROJECT_DIR, os.path.join( PROJECT_DIR, 'src' ) ]
+import env								#environment variables and constants, messages, etc.
+import log_pipeline						#log sinks
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser( description='Back up several DC/OS clusters at once.' )
+	parser.add_argument( 'fleet_file', nargs='?', default=env.FLEET_FILE )
+	parser.add_argument( '--fleet-file', dest='cluster_fleet_file' )
+	parser.add_argument( '--cluster' )
+	parser.add_argument( '--snapshot' )
+	parser.add_argument( '--workers', type=int )
+	parser.add_argument( '--backup-dir' )
+	args = parser.parse_args()
+	log_pipeline.configure_default_sinks()
+
+	if args.cluster:
+		#backup of a single cluster: limits and destination must be set before the rest is imported
+		env.MAX_WORKERS = args.workers or env.FLEET_CLUSTER_MAX_WORKERS
+		env.VERIFY_MAX_WORKERS = env.MAX_WORKERS
+		env.BACKUP_DIR = args.backup_dir or env.BACKUP_DIR
+		import fleet_backup
+		sys.exit( 0 if fleet_backup.backup_cluster( args.cluster, args.snapshot, args.cluster_fleet_file ) else 1 )
+
+	import fleet_backup
+	sys.exit( 0 if fleet_backup.run_fleet( args.fleet_file ) else 1 )
@@ -25,10 +25,14 @@ import json
 sys.path.append(os.getcwd()+'/src') 	#Add the ./src directory to path for importing
 from env import *						#environment variables and constants, messages, etc.
 from helpers import *					#helper functions in separate module helpers.py
+import metrics							#run metrics and metrics endpoint
+import log_pipeline						#log sinks
 
 
 if __name__ == "__main__":
 
+	log_pipeline.configure_default_sinks()
+
 	config = get_config( env.CONFIG_FILE )
 	if not config:
 		log(
@@ -81,6 +85,9 @@ if __name__ == "__main__":
 			content=env.MSG_ERROR_LOGIN
 			)
 		sys.exit(3)
+
+	#expose live metrics on a local listener if a port is configured
+	metrics.start_metrics_server( config.get( 'METRICS_PORT', env.METRICS_PORT ) )
 	
 	#main menu loop
 	option = '1' 						#initialize to anything different than 'EXIT'
@@ -97,8 +104,10 @@ if __name__ == "__main__":
 		#result will be a dictionary of the users, groups, acls, etc.
 		func_result = globals()[func]( DCOS_IP=config['DCOS_IP'] )
 		#execute secondary function associated with the primary if it exists
-		#(get_users_groups, get_groups_users, get_permissions_actions)
-		if func in env.secondary_functions.keys():
+		#(get_users_groups, get_groups_users, get_permissions_actions), unless the primary failed
+		if func_result is False:
+			pass
+		elif func in env.secondary_functions.keys():
 			sec_func = env.secondary_functions.get( func, 'noop' )
 			sec_result = globals()[sec_func]( config['DCOS_IP'], func_result )
 		else:
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+#
+# agent_inventory.py: compact columnar inventory of the agents of a DC/OS cluster
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Convert the agent records received from "/mesos/slaves" into columns (one
+# array per attribute instead of one dictionary per agent), so that capacity
+# totals and percentiles per resource and per role can be computed with a single
+# pass over each column. The inventory is saved as a small file next to
+# agents.json, and is all that's needed to report on the cluster's capacity.
+
+from array import array
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import buffer_store		#atomic writes of buffer files
+
+#resources tracked per agent
+RESOURCES = ( 'cpus', 'mem', 'disk', 'gpus' )
+
+def build_agent_inventory( agents ):
+	"""
+	Convert the agents state received as a dictionary (as returned by "get_agents")
+	into columns. Returns a dictionary with:
+	- 'id', 'hostname': lists of strings
+	- 'active': array of 0/1
+	- 'total', 'used', 'reserved': dictionaries of resource : array of floats
+	- 'roles': dictionary of role : resource : array of floats reserved for that role
+	"""
+
+	agents_list = agents.get( 'slaves', [] )
+	count = len( agents_list )
+	inventory = {
+		'id':		[ agent['id'] for agent in agents_list ],
+		'hostname':	[ agent['hostname'] for agent in agents_list ],
+		'active':	array( 'b', ( 1 if agent['active'] else 0 for agent in agents_list ) ),
+		'roles':	{}
+	}
+	for kind in ( 'total', 'used', 'reserved' ):
+		inventory[kind] = { resource: array( 'd' ) for resource in RESOURCES }
+	for index, agent in enumerate( agents_list ):
+		for resource in RESOURCES:
+			inventory['total'][resource].append( agent.get( 'resources', {} ).get( resource, 0 ) )
+			inventory['used'][resource].append( agent.get( 'used_resources', {} ).get( resource, 0 ) )
+		#reservations come per role: reserved is their sum, and each role keeps its own column
+		reserved = dict.fromkeys( RESOURCES, 0 )
+		for role, resources in agent.get( 'reserved_resources', {} ).items():
+			columns = inventory['roles'].setdefault( role, { resource: array( 'd', bytes( 8*count ) ) for resource in RESOURCES } )
+			for resource in RESOURCES:
+				columns[resource][index] = resources.get( resource, 0 )
+				reserved[resource] += resources.get( resource, 0 )
+		for resource in RESOURCES:
+			inventory['reserved'][resource].append( reserved[resource] )
+
+	return inventory
+
+def percentile( values, percent ):
+	"""
+	Returns the nearest-rank percentile of the values received, or 0 if there are none.
+	"""
+
+	if not values:
+		return 0
+	ordered = sorted( values )
+	rank = max( 0, -( -percent*len( ordered ) // 100 ) - 1 )
+
+	return ordered[ int( rank ) ]
+
+def capacity_summary( inventory ):
+	"""
+	Aggregate the inventory received into capacity figures. Returns a dictionary with:
+	- 'agents', 'active', 'inactive': agent counts
+	- 'resources': resource : { 'total', 'used', 'reserved', 'free', 'used_pct' and
+	  the env.AGENT_PERCENTILES of the per-agent used fraction under 'p<N>' }
+	- 'roles': role : resource : { 'reserved' for that role in total, and the env.AGENT_PERCENTILES
+	  of the per-agent fraction reserved for it under 'p<N>' }
+	"""
+
+	active = sum( inventory['active'] )
+	summary = {
+		'agents':	len( inventory['id'] ),
+		'active':	active,
+		'inactive':	len( inventory['id'] )-active,
+		'resources':	{},
+		'roles':	{}
+	}
+	for resource in RESOURCES:
+		total = inventory['total'][resource]
+		used = inventory['used'][resource]
+		entry = {
+			'total':	sum( total ),
+			'used':		sum( used ),
+			'reserved':	sum( inventory['reserved'][resource] ),
+		}
+		entry['free'] = entry['total']-entry['used']
+		entry['used_pct'] = round( 100*entry['used']/entry['total'], 2 ) if entry['total'] else 0
+		#usage of every agent that has the resource at all (e.g. only GPU agents for gpus)
+		usage = [ u/t for u, t in zip( used, total ) if t ]
+		for percent in env.AGENT_PERCENTILES:
+			entry['p{0}'.format( percent )] = round( 100*percentile( usage, percent ), 2 )
+		summary['resources'][resource] = entry
+	for role, columns in sorted( inventory['roles'].items() ):
+		summary['roles'][role] = {}
+		for resource in RESOURCES:
+			entry = { 'reserved': sum( columns[resource] ) }
+			share = [ r/t for r, t in zip( columns[resource], inventory['total'][resource] ) if t ]
+			for percent in env.AGENT_PERCENTILES:
+				entry['p{0}'.format( percent )] = round( 100*percentile( share, percent ), 2 )
+			summary['roles'][role][resource] = entry
+
+	return summary
+
+def to_json( inventory ):
+	"""
+	Convert the inventory received to a JSON-serializable dictionary (arrays to lists).
+	"""
+
+	def plain( value ):
+		if isinstance( value, dict ):
+			return { key: plain( column ) for key, column in value.items() }
+		if isinstance( value, array ):
+			return value.tolist()
+		return value
+
+	return plain( inventory )
+
+def save_agent_inventory( agents, path=env.AGENTS_INVENTORY_FILE ):
+	"""
+	Build the inventory and capacity summary of the agents state received and save them
+	to the path received, by default next to agents.json in the buffer.
+	Returns the capacity summary as a dictionary.
+	"""
+
+	inventory = build_agent_inventory( agents )
+	summary = capacity_summary( inventory )
+	buffer_store.write_buffer_file( path, codec.dumps( { 'summary': summary, 'columns': to_json( inventory ) } ) )
+
+	return summary
+
+def print_capacity_summary( summary ):
+	"""
+	Print the capacity summary received as a table, with one line per resource and per role.
+	"""
+
+	print( "Total agents: 				{0}".format( summary['agents'] ) )
+	print( "Active agents: 				{0}".format( summary['active'] ) )
+	print( "Inactive agents: 			{0}".format( summary['inactive'] ) )
+	percentiles = [ 'p{0}'.format( percent ) for percent in env.AGENT_PERCENTILES ]
+	print( '{0:<8}{1:>12}{2:>12}{3:>12}{4:>12}{5:>8}'.format( 'resource', 'total', 'used', 'reserved', 'free', 'used%' )
+		+''.join( '{0:>8}'.format( p ) for p in percentiles ) )
+	for resource, entry in summary['resources'].items():
+		print( '{0:<8}{1:>12.1f}{2:>12.1f}{3:>12.1f}{4:>12.1f}{5:>8}'.format(
+			resource, entry['total'], entry['used'], entry['reserved'], entry['free'], entry['used_pct'] )
+			+''.join( '{0:>8}'.format( entry[p] ) for p in percentiles ) )
+	for role, resources in summary['roles'].items():
+		#same columns, with the percentiles of the share of each agent reserved for the role
+		print( 'Reserved for role {0}: '.format( role ) )
+		for resource, entry in resources.items():
+			print( '{0:<8}{1:>12}{2:>12}{3:>12.1f}{4:>12}{5:>8}'.format( resource, '', '', entry['reserved'], '', '' )
+				+''.join( '{0:>8}'.format( entry[p] ) for p in percentiles ) )
+
+	return True
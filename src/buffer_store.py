@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+#
+# buffer_store.py: write buffer files and move them between the buffer and saved configurations
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Loading or saving a configuration doesn't need to duplicate its files: when
+# the filesystem allows it, they are cloned (copy-on-write reflink) or hard-linked,
+# which is near-instant regardless of their size. Otherwise they are copied in
+# parallel. As the buffer may share files with saved configurations, buffer
+# files are never modified in place: they are written to a temporary file that
+# then replaces the previous one.
+#
+# Responses from the cluster are streamed to their buffer file in chunks while
+# being hashed, and parsed once from the file written, so the body is never held
+# in memory as text and bytes at the same time. The hash and size of every file
+# saved this way are recorded, for incremental backups and integrity checks.
+
+import os
+import mmap
+import fcntl
+import hashlib
+import tempfile
+import threading
+from shutil import copy2
+from concurrent.futures import ThreadPoolExecutor
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import metrics			#run metrics
+
+#ioctl to clone a file into another on copy-on-write filesystems (Linux: btrfs, xfs...)
+FICLONE = 0x40049409
+
+def write_buffer_file( path, content ):
+	"""
+	Write the content received (text or bytes) to the file at path by replacing the file,
+	so that other links to the previous file (e.g. in a saved configuration) keep their content.
+	"""
+
+	if isinstance( content, str ):
+		content = content.encode( 'utf-8' )
+	directory = os.path.dirname( path ) or '.'
+	descriptor, temp_path = tempfile.mkstemp( dir=directory, prefix='.'+os.path.basename( path )+'.' )
+	try:
+		with os.fdopen( descriptor, 'wb' ) as temp_file:
+			temp_file.write( content )
+		os.replace( temp_path, path )
+	except BaseException:
+		os.unlink( temp_path )
+		raise
+
+	return True
+
+#the response hashes file is updated by several GETs at once
+_hashes_lock = threading.Lock()
+
+def record_response_hash( path, digest, size ):
+	"""
+	Record the sha256 digest and size of the buffer file at path in env.RESPONSE_HASHES_FILE.
+	"""
+
+	with _hashes_lock:
+		try:
+			with open( env.RESPONSE_HASHES_FILE, 'rb' ) as hashes_file:
+				hashes = codec.loads( hashes_file.read() )
+		except ( IOError, ValueError ):
+			hashes = {}
+		hashes[ os.path.basename( path ) ] = { 'sha256': digest, 'size': size }
+		write_buffer_file( env.RESPONSE_HASHES_FILE, codec.dumps( hashes, indent=True ) )
+
+	return True
+
+def save_response( response, path, resource=None, chunk_size=env.BUFFER_CHUNK_SIZE ):
+	"""
+	Stream the body of the response received (sent with stream=True) to the buffer file at path
+	in chunks, hashing it on the way, then parse it once from the file written.
+	The sha256 digest and size of the body are recorded with record_response_hash, and the bytes
+	written are accounted for in the run metrics under the resource type received, if any.
+	Returns the parsed body.
+	"""
+
+	digest = hashlib.sha256()
+	size = 0
+	directory = os.path.dirname( path ) or '.'
+	descriptor, temp_path = tempfile.mkstemp( dir=directory, prefix='.'+os.path.basename( path )+'.' )
+	try:
+		with os.fdopen( descriptor, 'wb' ) as temp_file:
+			for chunk in response.iter_content( chunk_size=chunk_size ):
+				temp_file.write( chunk )
+				digest.update( chunk )
+				size += len( chunk )
+		os.replace( temp_path, path )
+	except BaseException:
+		os.unlink( temp_path )
+		raise
+	record_response_hash( path, digest.hexdigest(), size )
+	if resource:
+		metrics.bytes_received( resource, size )
+
+	#parse straight from the page cache instead of from a copy of the body
+	with open( path, 'rb' ) as body_file:
+		if not size:
+			return codec.loads( body_file.read() )
+		with mmap.mmap( body_file.fileno(), 0, access=mmap.ACCESS_READ ) as body:
+			with memoryview( body ) as view:
+				return codec.loads( view )
+
+def reflink( source, destination ):
+	"""
+	Clone the source file into destination, sharing their blocks until either is modified.
+	Raises OSError if the filesystem doesn't support it.
+	"""
+
+	with open( source, 'rb' ) as source_file, open( destination, 'wb' ) as destination_file:
+		try:
+			fcntl.ioctl( destination_file.fileno(), FICLONE, source_file.fileno() )
+		except OSError:
+			destination_file.close()
+			os.unlink( destination )
+			raise
+
+	return True
+
+def materialize_file( source, destination, methods ):
+	"""
+	Make destination a copy of source with the first of the methods received ('reflink', 'link',
+	'copy') that the filesystem supports.
+	Returns the method used.
+	"""
+
+	if os.path.lexists( destination ):
+		os.unlink( destination )
+	for method in methods:
+		try:
+			if method == 'reflink':
+				reflink( source, destination )
+			elif method == 'link':
+				os.link( source, destination )
+			else:
+				copy2( source, destination )
+			return method
+		except OSError:
+			if method == methods[-1]:
+				raise
+
+def materialize( source_dir, destination_dir, files, max_workers=env.MAX_WORKERS ):
+	"""
+	Make the destination directory hold the same version of the files received (paths, of which only
+	the name is used) as the source directory, as fast as the filesystem allows: reflinks, then hard
+	links, then parallel copies. Files that are not in the source directory are removed from the destination.
+	Returns a dictionary of file name : method used ('reflink', 'link', 'copy' or 'removed').
+	"""
+
+	if not os.path.isdir( destination_dir ):
+		os.makedirs( destination_dir )
+	names = sorted( set( os.path.basename( path ) for path in files ) )
+	present = [ name for name in names if os.path.exists( os.path.join( source_dir, name ) ) ]
+	results = {}
+	for name in names:
+		if name not in present and os.path.lexists( os.path.join( destination_dir, name ) ):
+			os.unlink( os.path.join( destination_dir, name ) )
+			results[name] = 'removed'
+
+	def run( name ):
+		return name, materialize_file( os.path.join( source_dir, name ), os.path.join( destination_dir, name ), env.MATERIALIZE_METHODS )
+
+	with ThreadPoolExecutor( max_workers=max_workers ) as executor:
+		results.update( executor.map( run, present ) )
+
+	return results
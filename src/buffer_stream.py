@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+#
+# buffer_stream.py: stream the records of a buffer file one at a time
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Buffer files hold their entities in a list under a top-level key, e.g.
+# { "array": [ {...}, {...} ] } or { "apps": [...], "pods": [...] }. Instead of
+# parsing the whole file, scan it in chunks for the byte span of every record
+# in that list, and parse only one record at a time. Memory stays proportional
+# to the largest record, not to the file.
+# Files are read through a memory map, and the byte spans found are cached per
+# file, so that records can be listed, paged or read again by position
+# without parsing the rest of the file.
+
+import os
+import re
+import mmap
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+
+#characters that change the structure outside and inside of strings
+_STRUCTURE = re.compile( rb'[{}\[\]"]' )
+_STRING = re.compile( rb'["\\]' )
+
+class RecordScanner( object ):
+	"""
+	Incremental scanner of a JSON document, fed in consecutive chunks of bytes.
+	Finds the byte span of every object or list in the list under 'key' of the top-level object.
+	"""
+
+	def __init__( self, key='array' ):
+		self.key = key.encode( 'utf-8' )
+		self.depth = 0				#nesting of objects and lists
+		self.in_string = False
+		self.skip = 0				#bytes to skip at the start of the next chunk (escaped character)
+		self.string = bytearray()	#current string of the top-level object (i.e. a key)
+		self.last_key = None
+		self.in_target = False		#inside the list under 'key'
+		self.record_start = None
+
+	@property
+	def record_open( self ):
+		"""
+		True if a record started and hasn't finished in the chunks fed so far.
+		"""
+		return self.in_target and self.depth > 2
+
+	def _capture( self, data, start, end ):
+		if self.depth == 1:
+			self.string += data[start:end]
+
+	def feed( self, data, offset=0 ):
+		"""
+		Scan the next chunk of the document, that starts at byte 'offset' of the document.
+		Returns the list of ( start, end ) byte spans of the records that finished in this chunk.
+		"""
+
+		spans = []
+		end = len( data )
+		pos = self.skip
+		while pos < end:
+			if self.in_string:
+				match = _STRING.search( data, pos )
+				if match is None:
+					self._capture( data, pos, end )
+					pos = end
+					break
+				if match.group() == b'\\':
+					#escaped character: skip it, even if it's in the next chunk
+					self._capture( data, pos, min( match.start()+2, end ) )
+					pos = match.start()+2
+					continue
+				self._capture( data, pos, match.start() )
+				self.in_string = False
+				if self.depth == 1:
+					self.last_key = bytes( self.string )
+					self.string = bytearray()
+				pos = match.end()
+				continue
+			match = _STRUCTURE.search( data, pos )
+			if match is None:
+				pos = end
+				break
+			char = match.group()
+			pos = match.end()
+			if char == b'"':
+				self.in_string = True
+			elif char in ( b'{', b'[' ):
+				if self.in_target and self.depth == 2:
+					self.record_start = offset+match.start()
+				if self.depth == 1 and char == b'[' and self.last_key == self.key:
+					self.in_target = True
+				self.depth += 1
+			else:
+				self.depth -= 1
+				if self.in_target and self.depth == 2:
+					spans.append( ( self.record_start, offset+match.end() ) )
+				elif self.in_target and self.depth == 1:
+					self.in_target = False
+		self.skip = pos-end
+
+		return spans
+
+#byte spans of the records of the files completely scanned, reused while the file doesn't change.
+#( path, key ) : ( ( inode, mtime, size ), [ ( start, end ) ] )
+_spans_cache = {}
+
+class BufferReader( object ):
+	"""
+	Lazy reader of the records of the list under 'key' in a buffer file, over a read-only memory map.
+	The file is scanned chunk by chunk only as far as the records requested, and the byte spans
+	found are kept, so records can be read again, by index, without scanning or parsing anything else.
+	Use as a context manager, or call close().
+	"""
+
+	def __init__( self, path, key='array', chunk_size=env.BUFFER_CHUNK_SIZE ):
+		self.path, self.key, self.chunk_size = path, key, chunk_size
+		self.file = open( path, 'rb' )
+		stat = os.fstat( self.file.fileno() )
+		self.signature = ( stat.st_ino, stat.st_mtime_ns, stat.st_size )
+		#empty files can't be mapped
+		self.map = mmap.mmap( self.file.fileno(), 0, access=mmap.ACCESS_READ ) if stat.st_size else b''
+		cached = _spans_cache.get( ( path, key ) )
+		if cached and cached[0] == self.signature:
+			self.spans, self.scanned = list( cached[1] ), stat.st_size
+		else:
+			self.spans, self.scanned = [], 0
+		self.scanner = RecordScanner( key )
+
+	def __enter__( self ):
+		return self
+
+	def __exit__( self, *exc_info ):
+		self.close()
+
+	def close( self ):
+		"""
+		Release the memory map and the file.
+		"""
+		if isinstance( self.map, mmap.mmap ):
+			self.map.close()
+		self.file.close()
+
+	def _scan( self ):
+		"""
+		Scan the next chunk of the file for records. Returns False if the whole file was already scanned.
+		"""
+		if self.scanned >= len( self.map ):
+			return False
+		chunk = self.map[ self.scanned:self.scanned+self.chunk_size ]
+		self.spans.extend( self.scanner.feed( chunk, self.scanned ) )
+		self.scanned += len( chunk )
+		if self.scanned >= len( self.map ):
+			_spans_cache[ ( self.path, self.key ) ] = ( self.signature, list( self.spans ) )
+		return True
+
+	def __getitem__( self, index ):
+		"""
+		Returns the record at position index as a dictionary. Raises IndexError if there are fewer records.
+		"""
+		while index >= len( self.spans ):
+			if not self._scan():
+				raise IndexError( index )
+		start, end = self.spans[index]
+		return codec.loads( self.map[start:end] )
+
+	def __iter__( self ):
+		index = 0
+		while True:
+			try:
+				yield self[index]
+			except IndexError:
+				return
+			index += 1
+
+	def __len__( self ):
+		while self._scan():
+			pass
+		return len( self.spans )
+
+	def page( self, start, count ):
+		"""
+		Returns the list of at most count records starting at position start.
+		"""
+		records = []
+		for index in range( start, start+count ):
+			try:
+				records.append( self[index] )
+			except IndexError:
+				break
+		return records
+
+def iter_records( path, key='array', chunk_size=env.BUFFER_CHUNK_SIZE ):
+	"""
+	Iterate over the records of the list under 'key' in the buffer file at path, parsing one at a time.
+	Yields every record as a dictionary.
+	"""
+
+	with BufferReader( path, key, chunk_size ) as reader:
+		for record in reader:
+			yield record
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+#
+# cluster_state.py: read back the configuration of running DC/OS clusters to verify or compare them
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# After a RESTORE, read back from the cluster the users, groups, memberships,
+# ACLs, grants and service groups that were posted, and compare them with the
+# buffer through their normalized digests (see "normalize"). Memberships and
+# grants need a request per user and per ACL: they are all sent through a single
+# pool of VERIFY_MAX_WORKERS concurrent requests, and no response is saved to
+# disk, so the check is fast enough to run after every restore.
+#
+# Two live clusters (e.g. production and its standby) are compared the same way,
+# crawling both at once and printing their differences as they are found.
+
+#reference:
+#https://docs.mesosphere.com/1.8/administration/id-and-access-mgt/iam-api/
+
+import os
+import getpass
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import helpers			#helper functions in separate module helpers.py
+import metrics			#run metrics
+import scheduler		#run independent functions concurrently
+import buffer_store		#atomic writes of buffer files
+import normalize		#normalized form of a configuration, for comparisons
+import service_group_hashes	#Merkle hashes of a Marathon service group tree
+from get_service_groups import fetch_service_groups
+
+def fetch( config, api_endpoint, resource='verify' ):
+	"""
+	GET api_endpoint from the DC/OS cluster in 'config' without saving it to the buffer,
+	accounted for in the run metrics under the resource type received.
+	Returns the parsed body, None if it is not found (404, e.g. a missing user), or False if it couldn't
+	be read (any other error status, e.g. 403 or 503). Raises if the request couldn't be sent.
+	"""
+
+	url = 'http://'+config['DCOS_IP']+api_endpoint
+	headers = {
+		'Content-type': 'application/json',
+		'Authorization': 'token='+config['TOKEN']
+	}
+	request = helpers.send_request(
+		'GET',
+		url,
+		resource,
+		headers=headers,
+		)
+	try:
+		request.raise_for_status()
+	except requests.exceptions.HTTPError as error:
+		return None if request.status_code == 404 else False
+
+	return codec.loads( request.content )
+
+def fetch_lists( config, max_workers=env.VERIFY_MAX_WORKERS, apps=True ):
+	"""
+	Read the users, groups, ACLs and service groups (with their apps unless apps is False) of the
+	DC/OS cluster in 'config' in normalized form (see normalize.buffer_state), with at most max_workers requests at once.
+	Resources whose lists couldn't be retrieved are left out of the state.
+	"""
+
+	lists = [
+		( 'users', '/acs/api/v1/users' ),
+		( 'groups', '/acs/api/v1/groups' ),
+		( 'acls', '/acs/api/v1/acls' ),
+		( 'service_groups', None )
+	]
+
+	def fetch_list( index, item ):
+		resource, api_endpoint = item
+		if api_endpoint is None:
+			return fetch_service_groups( config )
+		return fetch( config, api_endpoint )
+
+	state = {}
+	bodies = dict( zip( [ resource for resource, api_endpoint in lists ], scheduler.run_concurrently( fetch_list, lists, max_workers ) ) )
+	for resource in ( 'users', 'groups', 'acls' ):
+		if bodies[resource]:
+			state[resource] = getattr( normalize, resource )( bodies[resource].get( 'array', [] ) )
+	if bodies['service_groups']:
+		state['service_groups'] = normalize.service_groups( service_group_hashes.hash_service_groups( bodies['service_groups'] ), apps )
+
+	return state
+
+def fetch_details( config, uids, rids, max_workers=env.VERIFY_MAX_WORKERS ):
+	"""
+	Read the memberships of the uids and the grants of the rids received from the DC/OS cluster in 'config'
+	in normalized form, one request per user and per ACL, all of them through the same pool of max_workers.
+	Users and ACLs that couldn't be read are left out of their resource, and listed as ( resource, id )
+	under 'unreadable' unless they were not found (404).
+	"""
+
+	requests_list = [ ( 'memberships', uid, '/acs/api/v1/users/'+helpers.escape( uid )+'/groups' ) for uid in uids ]
+	requests_list += [ ( 'grants', rid, '/acs/api/v1/acls/'+helpers.escape( rid )+'/permissions' ) for rid in rids ]
+	bodies = scheduler.run_concurrently( lambda index, item: fetch( config, item[2] ), requests_list, max_workers )
+	state = { 'memberships': {}, 'grants': {}, 'unreadable': [] }
+	for ( resource, entity_id, api_endpoint ), body in zip( requests_list, bodies ):
+		if body is False:
+			#refused, failed or raised (e.g. timed out): not the same as missing
+			state['unreadable'].append( ( resource, entity_id ) )
+		if not body:
+			continue
+		if resource == 'memberships':
+			state[resource][entity_id] = normalize.memberships( body.get( 'array', [] ) )
+		else:
+			state[resource][entity_id] = normalize.grants( body )
+
+	return state
+
+def fetch_state( config, uids=None, rids=None, max_workers=env.VERIFY_MAX_WORKERS, apps=True ):
+	"""
+	Read back the configuration of the DC/OS cluster in 'config' in normalized form (see normalize.buffer_state).
+	Memberships are read for the uids received and grants for the rids received, or for every
+	user and ACL in the cluster if not given. All requests are sent with at most max_workers at once.
+	Resources whose lists couldn't be retrieved are left out of the state, and apps if apps is False.
+	"""
+
+	state = fetch_lists( config, max_workers, apps )
+	if uids is None:
+		uids = state.get( 'users', {} )
+	if rids is None:
+		rids = state.get( 'acls', {} )
+	state.update( fetch_details( config, uids, rids, max_workers ) )
+
+	return state
+
+def other_cluster ():
+	"""
+	Ask for the address and credentials of another DC/OS cluster and log into it.
+	Returns a config with its 'DCOS_IP' and 'TOKEN', or None if the login failed.
+	"""
+
+	other = { 'DCOS_IP': helpers.get_input( message=env.MSG_ENTER_OTHER_DCOS_IP ).strip() }
+	username = helpers.get_input( message=env.MSG_ENTER_OTHER_USERNAME ).strip()
+	other['TOKEN'] = helpers.get_token( other['DCOS_IP'], username, getpass.getpass( env.MSG_ENTER_OTHER_PASSWORD+': ' ) )
+	if other['TOKEN'] is None:
+		helpers.log(
+			log_level='ERROR',
+			operation='LOGIN',
+			objects=[other['DCOS_IP']],
+			indx=0,
+			content=env.MSG_ERROR_LOGIN
+			)
+		return None
+
+	return other
+
+def verify_restore ( DCOS_IP ):
+	"""
+	Read back from the DC/OS cluster the users, groups, memberships, ACLs, grants and service groups
+	in the buffer, and compare them by normalized digest. Mismatches ('missing' or 'different') are logged
+	and saved to env.RESTORE_VERIFY_FILE, as are the memberships and grants that couldn't be read back.
+	Apps are only verified if they are in the buffer, as otherwise post_all doesn't restore them.
+	Returns True if the cluster matches the buffer.
+	"""
+
+	config = helpers.get_config( env.CONFIG_FILE )
+	apps = os.path.exists( env.APPS_FILE )
+	expected = normalize.buffer_state( apps )
+	actual = fetch_state( config, uids=expected.get( 'memberships' ), rids=expected.get( 'grants' ), apps=apps )
+	unreadable = actual.pop( 'unreadable' )
+	for resource in normalize.RESOURCES:
+		if resource in expected and resource not in actual:
+			helpers.log(
+				log_level='ERROR',
+				operation='VERIFY',
+				objects=[resource],
+				indx=0,
+				content='Could not be read back from the cluster'
+				)
+	for resource, entity_id in unreadable:
+		helpers.log(
+			log_level='ERROR',
+			operation='VERIFY',
+			objects=[resource, entity_id],
+			indx=0,
+			content='Could not be read back from the cluster'
+			)
+		#not checked, rather than missing
+		expected[resource].pop( entity_id, None )
+	mismatches = list( normalize.compare_states( expected, actual ) )
+	for index, mismatch in enumerate( mismatches ):
+		helpers.log(
+			log_level='ERROR',
+			operation='VERIFY',
+			objects=[mismatch['resource'], mismatch['id']],
+			indx=index,
+			content=mismatch['problem']
+			)
+	checked = { resource: len( expected[resource] ) for resource in expected if resource in actual }
+	buffer_store.write_buffer_file( env.RESTORE_VERIFY_FILE, codec.dumps( { 'checked': checked, 'mismatches': mismatches, 'unreadable': unreadable }, indent=True ) )
+	verified = not mismatches and not unreadable and set( checked ) == set( expected )
+	helpers.log(
+		log_level='INFO' if verified else 'ERROR',
+		operation='VERIFY',
+		objects=['Restore'],
+		indx=len( mismatches ),
+		content='{0} checked, {1} mismatches: {2}'.format( sum( checked.values() ), len( mismatches ), env.RESTORE_VERIFY_FILE )
+		)
+	helpers.pause()
+
+	return verified
+
+def diff_clusters( first, second, max_workers=env.VERIFY_MAX_WORKERS ):
+	"""
+	Crawl the two DC/OS clusters received (configs with 'DCOS_IP' and 'TOKEN') at once and yield their
+	differences as found by normalize.compare_states: 'missing' from the second, 'extra' in the second or 'different'.
+	Users, groups, ACLs and service groups are compared as soon as their lists are read, then the
+	memberships and grants of the users and ACLs in both clusters.
+	What couldn't be read from either cluster (refused, failed or timed out: anything but a 404) is yielded
+	as 'unreadable', with the 'cluster' it couldn't be read from (and an id of None for a whole resource),
+	instead of being reported as a difference.
+	"""
+
+	configs = ( first, second )
+	with ThreadPoolExecutor( max_workers=2 ) as executor:
+		lists = list( executor.map( lambda config: fetch_lists( config, max_workers ), configs ) )
+	for resource in ( 'users', 'groups', 'acls', 'service_groups' ):
+		for config, state in zip( configs, lists ):
+			if resource not in state:
+				yield { 'resource': resource, 'id': None, 'problem': 'unreadable', 'cluster': config['DCOS_IP'] }
+	for difference in normalize.compare_states( lists[0], lists[1], only_expected=False ):
+		yield difference
+
+	uids = sorted( set( lists[0].get( 'users', {} ) ) & set( lists[1].get( 'users', {} ) ) )
+	rids = sorted( set( lists[0].get( 'acls', {} ) ) & set( lists[1].get( 'acls', {} ) ) )
+	with ThreadPoolExecutor( max_workers=2 ) as executor:
+		details = list( executor.map( lambda config: fetch_details( config, uids, rids, max_workers ), configs ) )
+	#an entity that couldn't be read on one side is not compared on either
+	for config, state in zip( configs, details ):
+		for resource, entity_id in state['unreadable']:
+			yield { 'resource': resource, 'id': entity_id, 'problem': 'unreadable', 'cluster': config['DCOS_IP'] }
+			for other in details:
+				other[resource].pop( entity_id, None )
+	for difference in normalize.compare_states( details[0], details[1], only_expected=False ):
+		yield difference
+
+def compare_clusters ( DCOS_IP ):
+	"""
+	Compare the users, groups, memberships, ACLs, grants and service groups of the DC/OS cluster at DCOS_IP
+	with those of another cluster, printing the differences as they are found. Nothing is saved to disk.
+	Returns True if both clusters could be read completely and have the same configuration.
+	"""
+
+	first = helpers.get_config( env.CONFIG_FILE )
+	second = other_cluster()
+	if second is None:
+		helpers.pause()
+		return False
+
+	metrics.reset()
+	labels = {
+		'missing':		'only in '+first['DCOS_IP'],
+		'extra':		'only in '+second['DCOS_IP'],
+		'different':	'different',
+		'unreadable':	'unreadable'
+	}
+	counts = {}
+
+	def lines():
+		for difference in diff_clusters( first, second ):
+			counts[ difference['problem'] ] = counts.get( difference['problem'], 0 ) + 1
+			if difference['problem'] == 'unreadable' and difference['id'] is None:
+				helpers.log(
+					log_level='ERROR',
+					operation='COMPARE',
+					objects=[difference['resource'], difference['cluster']],
+					indx=0,
+					content='Could not be read from the cluster'
+					)
+				continue
+			label = labels[ difference['problem'] ]
+			if difference['problem'] == 'unreadable':
+				label = 'unreadable in '+difference['cluster']
+			yield '{0:<15} {1:<30} {2}'.format( difference['resource'], label, difference['id'] )
+
+	helpers.print_pages( lines() )
+	helpers.log(
+		log_level='INFO' if not counts else 'ERROR',
+		operation='COMPARE',
+		objects=[first['DCOS_IP'], second['DCOS_IP']],
+		indx=sum( counts.values() ),
+		content=', '.join( '{0} {1}'.format( count, labels[problem] ) for problem, count in sorted( counts.items() ) ) or '** IN SYNC **'
+		)
+	helpers.pause()
+
+	return not counts
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+#
+# codec.py: JSON encoding and decoding for the whole project
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# All JSON going to and coming from the cluster and the buffer goes through
+# these functions, which use orjson when it's installed and the standard
+# library otherwise. Both produce the same (compact) JSON, and parse str or
+# bytes, so HTTP responses can be parsed straight from their body bytes.
+
+#reference:
+#https://github.com/ijl/orjson
+
+import json
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+#name of the backend in use, for the logs
+BACKEND = 'orjson' if orjson else 'json'
+
+def loads( data ):
+	"""
+	Parse the JSON document received as str, bytes, bytearray or memoryview.
+	Returns the parsed object.
+	"""
+
+	if orjson:
+		return orjson.loads( data )
+	if isinstance( data, memoryview ):
+		data = data.tobytes()
+
+	return json.loads( data )
+
+def dumps( obj, indent=False, default=None ):
+	"""
+	Serialize the object received to compact JSON, or indented by 2 spaces if indent is True.
+	'default' is called for objects that can't be serialized otherwise and must return something that can.
+	Returns the JSON document as a str.
+	"""
+
+	if orjson:
+		option = orjson.OPT_INDENT_2 if indent else 0
+		return orjson.dumps( obj, default=default, option=option ).decode( 'utf-8' )
+
+	return json.dumps( obj, indent=2 if indent else None, separators=None if indent else ( ',', ':' ),
+		ensure_ascii=False, default=default )
+
+def canonical( obj ):
+	"""
+	Serialize the object received to its canonical JSON form for hashing: sorted keys, no whitespace.
+	Always uses the standard library, so that hashes saved with one backend match those computed with the other.
+	Returns the JSON document as bytes.
+	"""
+
+	return json.dumps( obj, sort_keys=True, separators=( ',', ':' ) ).encode( 'utf-8' )
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+#
+# conftest.py: make the project modules importable from the tests next to them
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Modules import each other by name (e.g. "import env", "import helpers"),
+# as run.py puts the project directory and ./src in the path: do the same here.
+
+import os
+import sys
+
+SRC_DIR = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path[:0] = [ os.path.dirname( SRC_DIR ), SRC_DIR ]
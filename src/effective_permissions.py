@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+# effective_permissions.py: effective permissions of every user in the buffer
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Users are granted actions on rids directly and through the groups they are
+# members of. Encode the grants of every principal as a row of bits, with one
+# field of action bits per rid, so that the effective permissions of a user are
+# the OR of its own row and the rows of its groups: a single operation on
+# (arbitrarily long) integers per group instead of a loop over every grant.
+
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import helpers			#helper functions in separate module helpers.py
+import indexes			#inverted indexes over the ACLs, users and groups in the buffer
+
+#one bit per action, 'full' grants all of them
+ACTIONS = { 'create': 1, 'read': 2, 'update': 4, 'delete': 8, 'full': 16 }
+ACTION_BITS = len( ACTIONS )
+ALL_ACTIONS = sum( ACTIONS.values() )
+
+def action_mask( actions ):
+	"""
+	Returns the bitmask of the list of action names received. Unknown actions are ignored.
+	"""
+
+	mask = 0
+	for action in actions:
+		mask |= ALL_ACTIONS if action == 'full' else ACTIONS.get( action, 0 )
+
+	return mask
+
+def build_matrix( indexes_dict ):
+	"""
+	Build the principals x resources matrix of the indexes received (as returned by indexes.load_indexes).
+	Returns a tuple ( rids, rows ): the sorted list of rids, i.e. the columns, and a dictionary
+	of principal : row, where each row is an integer with the action mask of column N at bit N*ACTION_BITS.
+	"""
+
+	rids = sorted( indexes_dict['rid_principals'] )
+	columns = { rid: index*ACTION_BITS for index, rid in enumerate( rids ) }
+	rows = {}
+	for principal, grants in indexes_dict['principal_rids'].items():
+		row = 0
+		for rid, actions in grants.items():
+			row |= action_mask( actions ) << columns[rid]
+		rows[principal] = row
+
+	return rids, rows
+
+def effective_rows( indexes_dict, rows ):
+	"""
+	Compute the effective permissions of every user: the OR of its own row and those of its groups.
+	Returns a dictionary of uid : row.
+	"""
+
+	users = { principal[len( 'user:' ):] for principal in rows if principal.startswith( 'user:' ) }
+	users.update( indexes_dict['user_groups'] )
+	effective = {}
+	for uid in users:
+		row = rows.get( 'user:'+uid, 0 )
+		for gid in indexes_dict['user_groups'].get( uid, [] ):
+			row |= rows.get( 'group:'+gid, 0 )
+		effective[uid] = row
+
+	return effective
+
+def decode_row( row, rids ):
+	"""
+	Decode a row of the matrix into a dictionary of rid : [ action names ], visiting only the
+	rids with some action granted.
+	"""
+
+	names = sorted( ACTIONS, key=ACTIONS.get )
+	field = ( 1 << ACTION_BITS ) - 1
+	decoded = {}
+	while row:
+		#jump straight to the lowest column with any bit set
+		column = ( ( row & -row ).bit_length() - 1 ) // ACTION_BITS
+		mask = ( row >> column*ACTION_BITS ) & field
+		decoded[ rids[column] ] = [ name for name in names if mask & ACTIONS[name] ]
+		row &= ~( field << column*ACTION_BITS )
+
+	return decoded
+
+def export_effective_permissions ( DCOS_IP=None ):
+	"""
+	Compute the effective permissions of every user in the buffer, combining direct and group grants,
+	and export them to env.EFFECTIVE_PERMISSIONS_FILE as { 'array': [ { 'uid', 'permissions': { rid: [ actions ] } } ] }.
+	Takes no parameters but DCOS_IP is left to use the same interface on all options.
+	"""
+
+	indexes_dict = indexes.load_indexes()
+	rids, rows = build_matrix( indexes_dict )
+	effective = effective_rows( indexes_dict, rows )
+	export = { 'array': [
+		{ 'uid': uid, 'permissions': decode_row( row, rids ) }
+		for uid, row in sorted( effective.items() )
+	] }
+	with open( env.EFFECTIVE_PERMISSIONS_FILE, 'w' ) as export_file:
+		export_file.write( codec.dumps( export ) )
+	helpers.log(
+		log_level='INFO',
+		operation='EXPORT',
+		objects=['Users', 'Effective permissions'],
+		indx=len( export['array'] ),
+		content='{0} users, {1} rids: {2}'.format( len( export['array'] ), len( rids ), env.EFFECTIVE_PERMISSIONS_FILE )
+		)
+	helpers.get_input( message=env.MSG_PRESS_ENTER )
+
+	return export
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+#
+# fleet_backup.py: full backup of several DC/OS clusters at once
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Read the clusters to back up, with their credentials, from env.FLEET_FILE:
+#
+#	{ "clusters": [ { "name": "prod", "DCOS_IP": "10.0.0.1", "DCOS_USERNAME": "...",
+#	                  "DCOS_PASSWORD": "...", "max_workers": 8 }, ... ] }
+#
+# The configuration, buffer and log of the program are per working directory,
+# so every cluster is backed up by its own process ("fleet.py --cluster <name>")
+# in its own working directory under env.FLEET_DIR. Each one runs a full GET with
+# at most "max_workers" concurrent requests (env.FLEET_CLUSTER_MAX_WORKERS by
+# default) and saves it to env.BACKUP_DIR as "<name>_<date>". Clusters start as
+# soon as their workers fit in the global budget of env.FLEET_MAX_WORKERS, and
+# their run summaries are combined in env.FLEET_SUMMARY_FILE.
+
+import os
+import sys
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import helpers			#helper functions in separate module helpers.py
+import buffer_store		#atomic writes of buffer files
+import run_summary		#per-run summary report
+
+def load_fleet( path=env.FLEET_FILE ):
+	"""
+	Load the list of clusters from the fleet file at path. Every cluster needs a unique 'name'
+	(used for its working directory and snapshot) and a 'DCOS_IP'.
+	Returns the list of clusters, or None if the file is missing or invalid.
+	"""
+
+	try:
+		with open( path, 'rb' ) as fleet_file:
+			clusters = codec.loads( fleet_file.read() )['clusters']
+	except ( IOError, ValueError, KeyError ) as error:
+		helpers.log(
+			log_level='ERROR',
+			operation='LOAD',
+			objects=['Fleet'],
+			indx=0,
+			content='{0}: {1}'.format( path, repr( error ) )
+			)
+		return None
+	names = [ cluster.get( 'name', '' ) for cluster in clusters ]
+	for index, cluster in enumerate( clusters ):
+		name = names[index]
+		if not name or '/' in name or names.count( name ) > 1 or not cluster.get( 'DCOS_IP' ):
+			helpers.log(
+				log_level='ERROR',
+				operation='LOAD',
+				objects=['Fleet', name],
+				indx=index,
+				content='Every cluster needs a unique name (without "/") and a DCOS_IP'
+				)
+			return None
+
+	return clusters
+
+def cluster_workers( cluster ):
+	"""
+	Returns the maximum number of concurrent requests to the cluster received, within the global budget.
+	"""
+
+	return max( 1, min( int( cluster.get( 'max_workers', env.FLEET_CLUSTER_MAX_WORKERS ) ), env.FLEET_MAX_WORKERS ) )
+
+def backup_cluster( name, snapshot, fleet_path=env.FLEET_FILE ):
+	"""
+	Full backup of the cluster with the name received from the fleet file, run unattended from its
+	working directory: log in with the credentials in the fleet file, GET everything and save the
+	buffer to disk as the snapshot received.
+	Returns True if every GET succeeded.
+	"""
+
+	clusters = load_fleet( fleet_path )
+	if clusters is None:
+		return False
+	matching = [ cluster for cluster in clusters if cluster['name'] == name ]
+	if not matching:
+		helpers.log(
+			log_level='ERROR',
+			operation='LOAD',
+			objects=['Fleet', name],
+			indx=0,
+			content='Cluster not found in '+fleet_path
+			)
+		return False
+	cluster = matching[0]
+	env.UNATTENDED = True
+	if os.path.exists( env.CONFIG_FILE ):
+		config = helpers.get_config( env.CONFIG_FILE )
+	else:
+		config = helpers.create_config( env.CONFIG_FILE )
+	for key in ( 'DCOS_IP', 'DCOS_USERNAME', 'DCOS_PASSWORD' ):
+		config[key] = cluster.get( key, config[key] )
+	helpers.update_config( env.CONFIG_FILE, config )
+	helpers.create_new_local_buffer( env.DATA_DIR )
+
+	if not helpers.login_to_cluster( config ):
+		helpers.log(
+			log_level='ERROR',
+			operation='LOGIN',
+			objects=['Fleet', name],
+			indx=0,
+			content=env.MSG_ERROR_LOGIN
+			)
+		return False
+	backed_up = helpers.get_all( config['DCOS_IP'] )
+	helpers.save_snapshot( snapshot )
+
+	return backed_up
+
+def run_fleet( fleet_path=env.FLEET_FILE ):
+	"""
+	Back up every cluster in the fleet file concurrently, each in its own process, with at most
+	env.FLEET_MAX_WORKERS concurrent requests across all of them. Writes and prints the combined summary.
+	Returns True if every cluster was backed up.
+	"""
+
+	clusters = load_fleet( fleet_path )
+	if clusters is None:
+		return False
+	stamp = time.strftime( '%Y-%m-%d_%H-%M-%S' )
+	if not os.path.isdir( env.FLEET_DIR ):
+		os.makedirs( env.FLEET_DIR )
+
+	#workers available across all clusters: a cluster starts once it can take all of its own
+	budget = threading.Semaphore( env.FLEET_MAX_WORKERS )
+	budget_lock = threading.Lock()
+
+	def run( cluster ):
+		workers = cluster_workers( cluster )
+		snapshot = cluster['name']+'_'+stamp
+		directory = os.path.join( env.FLEET_DIR, cluster['name'] )
+		if not os.path.isdir( directory ):
+			os.makedirs( directory )
+		with budget_lock:
+			for _ in range( workers ):
+				budget.acquire()
+		try:
+			helpers.log(
+				log_level='INFO',
+				operation='FLEET',
+				objects=[cluster['name'], cluster['DCOS_IP']],
+				indx=workers,
+				content='Backing up to '+snapshot
+				)
+			start = time.time()
+			with open( os.path.join( directory, 'fleet.log' ), 'w' ) as output:
+				returncode = subprocess.call(
+					[ sys.executable, os.path.join( env.PROJECT_DIR, 'fleet.py' ), '--cluster', cluster['name'],
+						'--snapshot', snapshot, '--workers', str( workers ),
+						'--fleet-file', os.path.abspath( fleet_path ), '--backup-dir', env.BACKUP_DIR ],
+					cwd=directory,
+					stdin=subprocess.DEVNULL,
+					stdout=output,
+					stderr=subprocess.STDOUT
+					)
+			elapsed = time.time() - start
+		finally:
+			for _ in range( workers ):
+				budget.release()
+
+		return cluster_summary( cluster, snapshot, workers, returncode, elapsed )
+
+	with ThreadPoolExecutor( max_workers=len( clusters ) or 1 ) as executor:
+		results = list( executor.map( run, clusters ) )
+	summary = {
+		'started':		stamp,
+		'clusters':		results,
+		'succeeded':	sum( 1 for result in results if result['status'] == 'OK' ),
+		'failed':		sum( 1 for result in results if result['status'] != 'OK' ),
+		'requests':		sum( result['requests'] for result in results ),
+		'bytes':		sum( result['bytes'] for result in results )
+	}
+	buffer_store.write_buffer_file( env.FLEET_SUMMARY_FILE, codec.dumps( summary, indent=True ) )
+	print_fleet_summary( summary )
+
+	return not summary['failed']
+
+def cluster_summary( cluster, snapshot, workers, returncode, elapsed ):
+	"""
+	Summarize the backup of a cluster from the exit code of its process and the run summary saved in its snapshot.
+	Returns the summary as a dictionary.
+	"""
+
+	try:
+		with open( os.path.join( env.BACKUP_DIR, snapshot, os.path.basename( run_summary.run_summary_path( 'GET' ) ) ), 'rb' ) as summary_file:
+			run = codec.loads( summary_file.read() )
+	except ( IOError, ValueError ):
+		run = {}
+
+	return {
+		'name':			cluster['name'],
+		'DCOS_IP':		cluster['DCOS_IP'],
+		'snapshot':		snapshot if run else None,
+		'status':		'OK' if returncode == 0 else 'FAILED ({0})'.format( returncode ),
+		'workers':		workers,
+		'seconds':		round( elapsed, 3 ),
+		'requests':		run.get( 'requests', 0 ),
+		'failed':		run.get( 'failed', 0 ),
+		'bytes':		run.get( 'bytes', 0 )
+	}
+
+def print_fleet_summary( summary ):
+	"""
+	Print the combined summary of a fleet backup, one line per cluster.
+	"""
+
+	print( '{0} Fleet backup {1}: {2} clusters OK, {3} failed.'.format( env.MARK, summary['started'], summary['succeeded'], summary['failed'] ) )
+	for result in summary['clusters']:
+		print( '{0:<20} {1:<16} {2:<12} {3:>9}s {4:>7} requests {5:>5} failed {6:>12} bytes  {7}'.format(
+			result['name'], result['DCOS_IP'], result['status'], result['seconds'], result['requests'],
+			result['failed'], result['bytes'], result['snapshot'] or '-' ) )
+	print( '{0} {1} requests, {2} bytes: {3}'.format( env.MARK, summary['requests'], summary['bytes'], env.FLEET_SUMMARY_FILE ) )
+
+	return True
@@ -14,15 +14,18 @@
 import sys
 import os
 import requests
-import json
 import env				#environment variables and constants
+import codec				#JSON encoding and decoding
 import helpers			#helper functions in separate module helpers.py
+import buffer_store		#atomic writes of buffer files
+import metrics			#run metrics
 
 def get_acls ( DCOS_IP ):
 	"""	
 	Get the list of acls from a DC/OS cluster as a JSON blob.
 	Save the acls to the text file in the save_path provided.
-	Return the list of acls as a dictionary.
+	Return the list of acls as a dictionary, or False if it couldn't be retrieved
+	(nothing is saved to the buffer then).
 	"""	
 
 	api_endpoint = '/acs/api/v1/acls'
@@ -33,9 +36,12 @@ def get_acls ( DCOS_IP ):
 		'Authorization': 'token='+config['TOKEN'],
 	}
 	try:
-		request = requests.get(
+		request = helpers.send_request(
+			'GET',
 			url,
+			'acls',
 			headers=headers,
+			stream=True,
 			)
 		request.raise_for_status()
 		helpers.log(
@@ -53,12 +59,10 @@ def get_acls ( DCOS_IP ):
 			indx=0,
 			content=request.text
 			)
+		return False
 
-	acls = request.text
-	#save to ACLs file
-	acls_file = open( env.ACLS_FILE, 'w' )
-	acls_file.write( acls )			
-	acls_file.close()					
+	#stream to ACLs file in same raw JSON as obtained from DC/OS, and parse it once
+	acls_dict = buffer_store.save_response( request, env.ACLS_FILE, 'acls' )
 	helpers.log(
 		log_level='INFO',
 		operation='GET',
@@ -67,7 +71,6 @@ def get_acls ( DCOS_IP ):
 		content=env.MSG_DONE
 		)
 
-	acls_dict = dict( json.loads( acls ) )
 
 	return acls_dict
 
@@ -84,6 +87,7 @@ def get_acls_permissions ( DCOS_IP, acls ):
 
 	#loop through the list of ACLs received and get the permissions
 	# /acls/{rid}/permissions
+	metrics.expect( len( acls['array'] ) )
 	for index, acl in ( enumerate( acls['array'] ) ):
 		
 		#append this acl as a dictionary to the list 
@@ -107,8 +111,10 @@ def get_acls_permissions ( DCOS_IP, acls ):
 			'Authorization': 'token='+config['TOKEN'],
 		}	
 		try:
-			request = requests.get(
+			request = helpers.send_request(
+				'GET',
 				url,
+				'acls_permissions',
 				headers=headers,
 				)
 			request.raise_for_status()
@@ -128,7 +134,7 @@ def get_acls_permissions ( DCOS_IP, acls ):
 				content=request.text
 				)	
 
-		permissions = request.json() 	#get memberships from the JSON
+		permissions = codec.loads( request.content ) 	#get memberships from the JSON
 
 		#Loop through the list of user permissions and get their associated actions
 		for index2, user in ( enumerate( permissions['users'] ) ):
@@ -149,8 +155,10 @@ def get_acls_permissions ( DCOS_IP, acls ):
 					'Authorization': 'token='+config['TOKEN'],
 				}	
 				try:
-					request = requests.get(
+					request = helpers.send_request(
+						'GET',
 						url,
+						'acls_permissions',
 						headers=headers,
 						)
 					request.raise_for_status()
@@ -169,7 +177,7 @@ def get_acls_permissions ( DCOS_IP, acls ):
 						indx=index3,
 						content=request.text
 						)	
-				action_value = request.json()
+				action_value = codec.loads( request.content )
 				#add the value as another field of the action alongside name and url
 				acls_permissions['array'][index]['users'][index2]['actions'][index3]['value'] = action_value	
 
@@ -191,8 +199,10 @@ def get_acls_permissions ( DCOS_IP, acls ):
 					'Authorization': 'token='+config['TOKEN'],
 				}
 				try:
-					request = requests.get(
+					request = helpers.send_request(
+						'GET',
 						url,
+						'acls_permissions',
 						headers=headers,
 						)
 					request.raise_for_status()
@@ -211,16 +221,14 @@ def get_acls_permissions ( DCOS_IP, acls ):
 						indx=index3,
 						content=request.text
 						)	
-				action_value = request.json()
+				action_value = codec.loads( request.content )
 				#add the value as another field of the action alongside name and url
 				acls_permissions['array'][index]['groups'][index2]['actions'][index3]['value'] = action_value	
 	#done.
 
 	#write dictionary as a JSON object to file
-	acls_permissions_json = json.dumps( acls_permissions ) 		#convert to JSON
-	acls_permissions_file = open( env.ACLS_PERMISSIONS_FILE, 'w' )
-	acls_permissions_file.write( acls_permissions_json )		#write to file in raw JSON
-	acls_permissions_file.close()		
+	acls_permissions_json = codec.dumps( acls_permissions ) 		#convert to JSON
+	buffer_store.write_buffer_file( env.ACLS_PERMISSIONS_FILE, acls_permissions_json )		#write to file in raw JSON
 
 	helpers.log(
 		log_level='INFO',
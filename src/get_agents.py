@@ -6,23 +6,29 @@
 #
 # Get the agent state from a DC/OS cluster. Save to file and provide a list of
 # the Total, Active and Inactive agents.
+# Watch the agents of a DC/OS cluster, recording only the agents that join,
+# leave or change their active state between polls.
 
 #reference:
 #http://mesos.apache.org/documentation/latest/endpoints/master/slaves/
 
 import sys
 import os
+import time
 import requests
-import json
 import env				#environment variables and constants
+import codec				#JSON encoding and decoding
 import helpers			#helper functions in separate module helpers.py
+import buffer_store		#atomic writes of buffer files
+import agent_inventory	#columnar agent inventory and capacity
 
 
 def get_agents ( DCOS_IP ):
 	"""
 	Get the agent status configuration from a DC/OS cluster as a JSON blob.
 	Save it to the text file in the save_path provided.
-	Return the cluster's agent state as a dictionary.
+	Return the cluster's agent state as a dictionary, or False if it couldn't be retrieved
+	(nothing is saved to the buffer then).
 	"""
 
 	api_endpoint = '/mesos/slaves'
@@ -33,9 +39,12 @@ def get_agents ( DCOS_IP ):
 		'Authorization': 'token='+config['TOKEN'],
 	}
 	try:
-		request = requests.get(
+		request = helpers.send_request(
+			'GET',
 			url,
+			'agents',
 			headers=headers,
+			stream=True,
 			)
 		request.raise_for_status()
 		helpers.log(
@@ -52,15 +61,14 @@ def get_agents ( DCOS_IP ):
 			objects=['AGENTS'],
 			indx=0,
 			content=request.text
-			)		
+			)
+		return False
 
-	#save to AGENTS file
-	agents_file = open( config['AGENTS_FILE'], 'w' )
-	agents_file.write( request.text )			#write to file in same raw JSON as obtained from DC/OS
-	agents_file.close()				
+	#stream to AGENTS file in same raw JSON as obtained from DC/OS, and parse it once
+	agents_dict = buffer_store.save_response( request, config['AGENTS_FILE'], 'agents' )
 
-	#Create a list of agents
-	agents_dict = dict( json.loads( request.text ) )
+	#save the compact inventory and capacity next to the AGENTS file
+	agent_inventory.save_agent_inventory( agents_dict )
 
 	helpers.log(
 		log_level='INFO',
@@ -75,32 +83,120 @@ def get_agents ( DCOS_IP ):
 
 def display_agents( DCOS_IP, agents ):
 	"""
-	Display the status of active and inactive agents, received as a dictionary.
+	Display the agent counts and the capacity of the cluster per resource and role,
+	from the agents state received as a dictionary.
 	"""
-	agents_list = agents['slaves']
 
-	#Display Agents - Total
-	print( "Total agents: 				{0}".format( len( agents_list ) ) )
-	#Display Agents - Active
-	active_agents = [ agent for agent in agents_list if agent['active'] ]
-	print( "Active agents: 				{0}".format( len( active_agents ) ) )
-	for index, agent in ( enumerate( active_agents ) ):
-		print ( "Agent #{0}: {1}".format( index, agent['hostname'] ) )
-	#Display Agents - Inactive
-	inactive_agents = [ agent for agent in agents_list if not agent['active'] ]
-	print("Inactive agents: 			{0}".format( len( inactive_agents ) ) )
-	for index, agent in ( enumerate( inactive_agents ) ):
-		print ( "Agent #{0}: {1}".format( index, agent['hostname'] ) )
+	inventory = agent_inventory.build_agent_inventory( agents )
+	agent_inventory.print_capacity_summary( agent_inventory.capacity_summary( inventory ) )
 
-	input("Press ENTER to continue...")
+	helpers.pause()
 
-	return True	
+	return True
 
+def fetch_agents ( config ):
+	"""
+	Get the agent state from the DC/OS cluster in 'config' without saving it to the buffer.
+	Return the agent state as a dictionary, or None if it couldn't be retrieved.
+	"""
 
+	api_endpoint = '/mesos/slaves'
+	url = 'http://'+config['DCOS_IP']+api_endpoint
+	headers = {
+		'Content-type': 'application/json',
+		'Authorization': 'token='+config['TOKEN'],
+	}
+	try:
+		request = helpers.send_request(
+			'GET',
+			url,
+			'agents',
+			headers=headers,
+			)
+		request.raise_for_status()
+	except requests.exceptions.RequestException as error:
+		helpers.log(
+			log_level='ERROR',
+			operation='GET',
+			objects=['AGENTS'],
+			indx=0,
+			content=repr( error )
+			)
+		return None
 
+	return codec.loads( request.content )
 
+def agents_state( agents ):
+	"""
+	Reduce the agent state received as a dictionary to what the watch compares.
+	Returns a dictionary of agent id : [ hostname, active ].
+	"""
+
+	return { agent['id']: [ agent['hostname'], agent['active'] ] for agent in agents.get( 'slaves', [] ) }
+
+def diff_agents( previous, current ):
+	"""
+	Compare two agent states (as returned by agents_state) by agent id.
+	Returns a dictionary with the agents that 'joined' (id : [ hostname, active ]), 'left',
+	were 'activated' and 'deactivated' (lists of ids). Only non-empty keys are included.
+	"""
 
+	delta = {
+		'joined':		{ id: state for id, state in current.items() if id not in previous },
+		'left':			sorted( id for id in previous if id not in current ),
+		'activated':	sorted( id for id, state in current.items() if id in previous and state[1] and not previous[id][1] ),
+		'deactivated':	sorted( id for id, state in current.items() if id in previous and not state[1] and previous[id][1] ),
+	}
 
+	return { key: value for key, value in delta.items() if value }
 
+def watch_agents ( DCOS_IP ):
+	"""
+	Poll the agent state of a DC/OS cluster every env.AGENTS_WATCH_INTERVAL seconds until
+	interrupted with Ctrl+C. Only the agents that joined, left or changed their active state
+	since the previous poll are logged and appended as one JSON line to env.AGENTS_WATCH_FILE.
+	The first poll records all agents as joined, so the file can be replayed from the start.
+	"""
 
+	config = helpers.get_config( env.CONFIG_FILE )
+	previous = {}
+	helpers.log(
+		log_level='INFO',
+		operation='WATCH',
+		objects=['AGENTS'],
+		indx=0,
+		content=env.MSG_WATCH_AGENTS_STOP
+		)
+	try:
+		with open( env.AGENTS_WATCH_FILE, 'a' ) as watch_file:
+			while True:
+				agents = fetch_agents( config )
+				if agents is not None:
+					current = agents_state( agents )
+					delta = diff_agents( previous, current )
+					previous = current
+					if delta:
+						delta['time'] = time.strftime( '%Y-%m-%dT%H:%M:%S' )
+						watch_file.write( codec.dumps( delta )+'\n' )
+						watch_file.flush()
+						helpers.log(
+							log_level='INFO',
+							operation='WATCH',
+							objects=['AGENTS'],
+							indx=len( current ),
+							content=', '.join( '{0}: {1}'.format( key, len( delta[key] ) ) for key in ( 'joined', 'left', 'activated', 'deactivated' ) if key in delta )
+							)
+				time.sleep( env.AGENTS_WATCH_INTERVAL )
+	except KeyboardInterrupt:
+		pass
+
+	helpers.log(
+		log_level='INFO',
+		operation='WATCH',
+		objects=['AGENTS'],
+		indx=0,
+		content=env.MSG_DONE
+		)
+	helpers.pause()
 
+	return True
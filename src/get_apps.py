@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+#
+# get_apps.py: retrieve and save Marathon app and pod definitions from a DC/OS cluster
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Get the definitions of all Marathon apps and pods in a running DC/OS cluster
+# in bulk, and save them to a file in raw JSON format for backup and restore purposes.
+# These can be restored into a cluster with the accompanying 
+# "post_apps.py" script, once the service groups exist.
+
+#reference:
+#https://mesosphere.github.io/marathon/docs/rest-api.html#get-v2-groups
+#https://mesosphere.github.io/marathon/docs/generated/api.html#v2_groups_get
+
+import sys
+import os
+import requests
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import helpers			#helper functions in separate module helpers.py
+import buffer_store		#atomic writes of buffer files
+import service_group_tree	#iterative traversal of the service group tree
+
+def get_apps ( DCOS_IP ):
+	"""
+	Get the definitions of all apps and pods from a DC/OS cluster in a single request,
+	embedding them in the service group tree instead of requesting each app.
+	Save them to the apps file in the buffer as { 'apps': [...], 'pods': [...] }.
+	Return the apps and pods as a dictionary.
+	"""
+
+	api_endpoint = '/marathon/v2/groups?embed=group.groups&embed=group.apps&embed=group.pods'
+	config = helpers.get_config( env.CONFIG_FILE )
+	url = 'http://'+config['DCOS_IP']+api_endpoint
+	headers = {
+		'Content-type': 'application/json',
+		'Authorization': 'token='+config['TOKEN']
+	}
+	try:
+		request = helpers.send_request(
+			'GET',
+			url,
+			'apps',
+			headers=headers,
+			)
+		request.raise_for_status()
+		helpers.log(
+			log_level='INFO',
+			operation='GET',
+			objects=['Apps'],
+			indx=0,
+			content=request.status_code
+			)
+	except requests.exceptions.HTTPError as error:
+		helpers.log(
+			log_level='ERROR',
+			operation='GET',
+			objects=['Apps'],
+			indx=0,
+			content=request.text
+			)
+		return False
+
+	#flatten the apps and pods of every group in the tree
+	apps = { 'apps': [], 'pods': [] }
+	for path, group in service_group_tree.walk_pre_order( codec.loads( request.content ) ):
+		apps['apps'].extend( group.get( 'apps', [] ) )
+		apps['pods'].extend( group.get( 'pods', [] ) )
+
+	buffer_store.write_buffer_file( env.APPS_FILE, codec.dumps( apps ) )
+	helpers.log(
+		log_level='INFO',
+		operation='GET',
+		objects=['Apps'],
+		indx=0,
+		content=env.MSG_DONE
+		)
+
+	return apps
@@ -16,16 +16,19 @@
 import sys
 import os
 import requests
-import json
 import env				#environment variables and constants
+import codec				#JSON encoding and decoding
 import helpers			#helper functions in separate module helpers.py
+import buffer_store		#atomic writes of buffer files
+import metrics			#run metrics
 
 def get_groups ( DCOS_IP ):
 
 	"""	
 	Get the list of groups from a DC/OS cluster as a JSON blob.
 	Save the groups to the text file in the save_path provided.
-	Return the list of groups as a dictionary.
+	Return the list of groups as a dictionary, or False if it couldn't be retrieved
+	(nothing is saved to the buffer then).
 	"""
 
 	api_endpoint = '/acs/api/v1/groups'
@@ -36,9 +39,12 @@ def get_groups ( DCOS_IP ):
 		'Authorization': 'token='+config['TOKEN']
 	}
 	try:
-		request = requests.get(
+		request = helpers.send_request(
+			'GET',
 			url,
+			'groups',
 			headers=headers,
+			stream=True,
 			)
 		request.raise_for_status()
 		helpers.log(
@@ -56,12 +62,10 @@ def get_groups ( DCOS_IP ):
 			indx=0,
 			content=request.text
 			)
+		return False
 
-	groups = request.text
-	#save to GROUPS file
-	groups_file = open( env.GROUPS_FILE, 'w' )
-	groups_file.write( groups )			
-	groups_file.close()					
+	#stream to GROUPS file in same raw JSON as obtained from DC/OS, and parse it once
+	groups_dict = buffer_store.save_response( request, env.GROUPS_FILE, 'groups' )
 	helpers.log(
 		log_level='INFO',
 		operation='GET',
@@ -69,7 +73,6 @@ def get_groups ( DCOS_IP ):
 		indx=0,
 		content=env.MSG_DONE
 		)	
-	groups_dict = dict( json.loads( groups ) )
 	
 	return groups_dict
 
@@ -83,6 +86,7 @@ def get_groups_users ( DCOS_IP, groups ):
 	#create a dictionary object that will hold all group-to-user memberships
 	groups_users = { 'array' : [] }
 
+	metrics.expect( len( groups['array'] ) )
 	for index, group in ( enumerate( groups['array'] ) ):
 		
 		#append this group as a dictionary to the list 
@@ -105,8 +109,10 @@ def get_groups_users ( DCOS_IP, groups ):
 			'Authorization': 'token='+config['TOKEN'],
 		}		
 		try:
-			request = requests.get(
+			request = helpers.send_request(
+				'GET',
 				url,
+				'groups_users',
 				headers=headers,
 				)
 			request.raise_for_status()
@@ -126,7 +132,7 @@ def get_groups_users ( DCOS_IP, groups ):
 				content=request.text
 				)	
 
-		memberships = request.json() 	#get memberships from the JSON
+		memberships = codec.loads( request.content ) 	#get memberships from the JSON
 
 		#Loop through the list of groups and get their associated actions
 		for index2, membership in ( enumerate( memberships['array'] ) ):
@@ -144,8 +150,10 @@ def get_groups_users ( DCOS_IP, groups ):
 				'Authorization': 'token='+config['TOKEN'],
 			}
 			try:
-				request = requests.get(
+				request = helpers.send_request(
+					'GET',
 					url,
+					'groups_permissions',
 					headers=headers,
 					)
 				request.raise_for_status()
@@ -164,16 +172,14 @@ def get_groups_users ( DCOS_IP, groups ):
 					indx=index2,
 					content=request.text
 					)			
-			permissions = request.json() 	#get memberships from the JSON	
+			permissions = codec.loads( request.content ) 	#get memberships from the JSON	
 			for index2, permission in ( enumerate( memberships['array'] ) ):
 				#get each group membership for this user
 				groups_users['array'][index]['permissions'].append( permission )
 
 	#write dictionary as a JSON object to file
-	groups_users_json = json.dumps( groups_users ) 		#convert to JSON
-	groups_users_file = open( env.GROUPS_USERS_FILE, 'w' )
-	groups_users_file.write( groups_users_json )		#write to file in raw JSON
-	groups_users_file.close()									#flush
+	groups_users_json = codec.dumps( groups_users ) 		#convert to JSON
+	buffer_store.write_buffer_file( env.GROUPS_USERS_FILE, groups_users_json )		#write to file in raw JSON
 
 	helpers.log(
 		log_level='INFO',
@@ -15,15 +15,15 @@
 import sys
 import os
 import requests
-import json
 import env				#environment variables and constants
 import helpers			#helper functions in separate module helpers.py
+import buffer_store		#atomic writes of buffer files
 
 def get_ldap ( DCOS_IP ):
 	"""
 	Get the LDAP configuration from a DC/OS cluster as a JSON blob.
 	Save it to the text file in the save_path provided.
-	Return the LDAP config as a dictionary.
+	Return the LDAP config as a dictionary, or None if the cluster has none.
 	"""
 
 	api_endpoint = '/acs/api/v1/ldap/config'
@@ -34,15 +34,18 @@ def get_ldap ( DCOS_IP ):
 		'Authorization': 'token='+config['TOKEN'],
 	}
 	try:
-		request = requests.get(
+		request = helpers.send_request(
+			'GET',
 			url,
+			'ldap',
 			headers=headers,
+			stream=True,
 			)
 		request.raise_for_status()
 		helpers.log(
 			log_level='INFO',
 			operation='GET',
-			object=['LDAP'],
+			objects=['LDAP'],
 			indx=0,
 			content=request.status_code
 			)
@@ -53,13 +56,15 @@ def get_ldap ( DCOS_IP ):
 			objects=['LDAP'],
 			indx=0,
 			content=request.text
-			)		
+			)
+		#LDAP is optional (e.g. 404 when not configured): leave no LDAP file in the buffer,
+		#so that post_all doesn't try to restore the error received
+		if os.path.exists( env.LDAP_FILE ):
+			os.remove( env.LDAP_FILE )
+		return None
 
-	ldap_config = request.text
-	#save to LDAP file
-	ldap_file = open( env.LDAP_FILE, 'w' )
-	ldap_file.write( ldap_config )			#write to file in same raw JSON as obtained from DC/OS
-	ldap_file.close()					
+	#stream to LDAP file in same raw JSON as obtained from DC/OS, and parse it once
+	ldap_dict = buffer_store.save_response( request, env.LDAP_FILE, 'ldap' )
 	helpers.log(
 		log_level='INFO',
 		operation='GET',
@@ -67,7 +72,6 @@ def get_ldap ( DCOS_IP ):
 		indx=0,
 		content='* DONE. *'
 		)	
-	ldap_dict = dict( json.loads( ldap_config ) )
 
 	return ldap_dict
 
@@ -15,16 +15,20 @@
 import sys
 import os
 import requests
-import json
 import env				#environment variables and constants
+import codec				#JSON encoding and decoding
 import helpers			#helper functions in separate module helpers.py
+import buffer_store		#atomic writes of buffer files
+import service_group_hashes	#Merkle hashes of the service group tree
+import service_group_tree	#iterative traversal and selection of the service group tree
 
 def get_service_groups ( DCOS_IP ):
 
 	"""	
 	Get the list of service groups from a DC/OS cluster as a JSON blob.
 	Save the service groups to the text file in the save_path provided.
-	Return the list of service groups as a dictionary.
+	Return the list of service groups as a dictionary, or False if it couldn't be retrieved
+	(nothing is saved to the buffer then).
 	"""
 
 	api_endpoint = '/marathon/v2/groups'
@@ -35,9 +39,12 @@ def get_service_groups ( DCOS_IP ):
 		'Authorization': 'token='+config['TOKEN']
 	}
 	try:
-		request = requests.get(
+		request = helpers.send_request(
+			'GET',
 			url,
+			'service_groups',
 			headers=headers,
+			stream=True,
 			)
 		request.raise_for_status()
 		helpers.log(
@@ -55,11 +62,10 @@ def get_service_groups ( DCOS_IP ):
 			indx=0,
 			content=request.text
 			)
+		return False
 
-	service_groups = request.text
-	service_groups_file = open( env.SERVICE_GROUPS_FILE, 'w' )
-	service_groups_file.write( service_groups )			
-	service_groups_file.close()					
+	#stream to SERVICE_GROUPS file in same raw JSON as obtained from DC/OS, and parse it once
+	service_groups_dict = buffer_store.save_response( request, env.SERVICE_GROUPS_FILE, 'service_groups' )
 	helpers.log(
 		log_level='INFO',
 		operation='GET',
@@ -67,6 +73,73 @@ def get_service_groups ( DCOS_IP ):
 		indx=0,
 		content='* DONE *'
 		)	
-	service_groups_dict = dict( json.loads( service_groups ) )
+	#save the subtree hashes alongside, for incremental diff and restore
+	service_group_hashes.save_service_groups_hashes( service_groups_dict )
 	
 	return service_groups_dict
+
+def get_service_groups_selection ( DCOS_IP ):
+	"""
+	Get only the service groups matching a path pattern (e.g. /prod/payments/**) from a DC/OS cluster.
+	Only the subtree under the literal prefix of the pattern (e.g. /prod/payments) is requested.
+	It is pruned to the matching subtrees and the groups leading to them, still rooted at '/'
+	like a full GET, before saving it to the buffer.
+	Return the selected service groups as a dictionary.
+	"""
+
+	config = helpers.get_config( env.CONFIG_FILE )
+	pattern = helpers.get_input( message=env.MSG_ENTER_SERVICE_GROUPS_PATTERN )
+	subtree = fetch_service_groups( config, service_group_tree.literal_prefix( pattern ) )
+	selection = service_group_tree.prune_to_selection( subtree, pattern ) if subtree else None
+	if selection:
+		selection = service_group_tree.graft( selection )
+	if not selection:
+		print( env.MSG_NO_SERVICE_GROUPS_MATCH )
+		helpers.pause()
+		return False
+
+	buffer_store.write_buffer_file( env.SERVICE_GROUPS_FILE, codec.dumps( selection ) )
+	service_group_hashes.save_service_groups_hashes( selection )
+	helpers.log(
+		log_level='INFO',
+		operation='GET',
+		objects=['Service Groups: '+pattern],
+		indx=0,
+		content=env.MSG_DONE
+		)
+	helpers.pause()
+
+	return selection
+
+def fetch_service_groups ( config, group_id='/' ):
+	"""
+	Get the tree of service groups under group_id (by default, all of them) from the DC/OS cluster
+	in 'config' without saving it to the buffer.
+	Return the tree of service groups as a dictionary, or None if it couldn't be retrieved.
+	"""
+
+	api_endpoint = '/marathon/v2/groups'+group_id.rstrip( '/' )
+	url = 'http://'+config['DCOS_IP']+api_endpoint
+	headers = {
+		'Content-type': 'application/json',
+		'Authorization': 'token='+config['TOKEN']
+	}
+	try:
+		request = helpers.send_request(
+			'GET',
+			url,
+			'service_groups',
+			headers=headers,
+			)
+		request.raise_for_status()
+	except requests.exceptions.HTTPError as error:
+		helpers.log(
+			log_level='ERROR',
+			operation='GET',
+			objects=['Service Groups'],
+			indx=0,
+			content=request.text
+			)
+		return None
+
+	return codec.loads( request.content )
@@ -15,15 +15,18 @@
 import sys
 import os
 import requests
-import json
 import env				#environment variables and constants
+import codec				#JSON encoding and decoding
 import helpers			#helper functions in separate module helpers.py
+import buffer_store		#atomic writes of buffer files
+import metrics			#run metrics
 
 def get_users ( DCOS_IP ):
 	"""
 	Get the list of users from a DC/OS cluster as a JSON blob.
 	Save the users to the text file in the save_path provided.
-	Return users as a dictionary.
+	Return users as a dictionary, or False if they couldn't be retrieved
+	(nothing is saved to the buffer then).
 	"""
 
 	api_endpoint = '/acs/api/v1/users'
@@ -34,9 +37,12 @@ def get_users ( DCOS_IP ):
 		'Authorization': 'token='+config['TOKEN']
 	}
 	try:
-		request = requests.get(
+		request = helpers.send_request(
+			'GET',
 			url,
+			'users',
 			headers=headers,
+			stream=True,
 			)
 		request.raise_for_status()
 		helpers.log(
@@ -53,14 +59,11 @@ def get_users ( DCOS_IP ):
 			objects=['Users'],
 			indx=0,
 			content=request.text
-			)		
-
-	users = request.text
-	#save to USERS file
-	users_file = open( env.USERS_FILE, 'w' )
-	#write to file in same raw JSON as obtained from DC/OS
-	users_file.write( users )			
-	users_file.close()	
+			)
+		return False
+
+	#stream to USERS file in same raw JSON as obtained from DC/OS, and parse it once
+	users_dict = buffer_store.save_response( request, env.USERS_FILE, 'users' )
 	helpers.log(
 		log_level='INFO',
 		operation='GET',
@@ -68,7 +71,6 @@ def get_users ( DCOS_IP ):
 		indx=0,
 		content='* DONE. *'
 		)
-	users_dict = dict( json.loads( users ) )
 	
 	return users_dict				
 
@@ -83,6 +85,7 @@ def get_users_groups ( DCOS_IP, users ):
 	#create a dictionary object that will hold all user-to-group memberships
 	users_groups = { 'array' : [] }	
 
+	metrics.expect( len( users['array'] ) )
 	for index, user in ( enumerate( users['array'] ) ):
 		
 		#append this user as a dictionary to the list 
@@ -109,8 +112,10 @@ def get_users_groups ( DCOS_IP, users ):
 			'Authorization': 'token='+config['TOKEN'],
 		}
 		try:
-			request = requests.get(
+			request = helpers.send_request(
+				'GET',
 				url,
+				'users_groups',
 				headers=headers,
 				)
 			request.raise_for_status()
@@ -130,7 +135,7 @@ def get_users_groups ( DCOS_IP, users ):
 				content=request.text
 				)	
 
-		memberships = request.json() 	#get memberships from the JSON
+		memberships = codec.loads( request.content ) 	#get memberships from the JSON
 
 		for index2, membership in ( enumerate( memberships['array'] ) ):
 
@@ -157,8 +162,10 @@ def get_users_groups ( DCOS_IP, users ):
 				'Authorization': 'token='+config['TOKEN'],
 			}
 			try:
-				request = requests.get(
+				request = helpers.send_request(
+					'GET',
 					url,
+					'users_permissions',
 					headers=headers,
 					)
 				request.raise_for_status()
@@ -177,16 +184,14 @@ def get_users_groups ( DCOS_IP, users ):
 					indx=index2,
 					content=request.text
 					)			
-			permissions = request.json() 	#get memberships from the JSON	
+			permissions = codec.loads( request.content ) 	#get memberships from the JSON	
 			for index2, permission in ( enumerate( memberships['array'] ) ):
 				#get each group membership for this user
 				users_groups['array'][index]['permissions'].append( permission )
 
 	#write dictionary as a JSON object to file
-	users_groups_json = json.dumps( users_groups ) 		#convert to JSON
-	users_groups_file = open( env.USERS_GROUPS_FILE, 'w' )
-	users_groups_file.write( users_groups_json )		#write to file in raw JSON
-	users_groups_file.close()									#flush
+	users_groups_json = codec.dumps( users_groups ) 		#convert to JSON
+	buffer_store.write_buffer_file( env.USERS_GROUPS_FILE, users_groups_json )		#write to file in raw JSON
 
 	helpers.log(
 		log_level='INFO',
@@ -8,14 +8,26 @@
 # Put on a separate module for clarity and readability.
 
 import os
-import json
 import sys
+import time
+import functools
+import itertools
 from shutil import copy2
 from ntpath import basename
 import requests
 import getpass
 #sub-modules
 import env
+import codec
+import metrics
+import log_pipeline
+import run_summary
+import scheduler
+import service_group_tree
+import buffer_store
+import buffer_stream
+import indexes
+import snapshot_manifest
 from get_users import *
 from get_groups import *
 from get_acls import *
@@ -27,11 +39,20 @@ from post_groups import *
 from post_acls import *
 from post_ldap import *
 from post_service_groups import *
+from get_apps import *
+from post_apps import *
+from indexes import *
+from effective_permissions import *
+from snapshot_diff import *
+from snapshot_manifest import *
+from cluster_state import *
+from migrate import *
 
 def clear_screen():
 	"""
 	Clear the screen.
 	"""
+	log_pipeline.flush()
 	os.system('clear')
 
 	return True
@@ -39,40 +60,39 @@ def clear_screen():
 
 def log ( log_level, operation, objects, indx, content ):
 	"""
-	Log to stdout (and potentially any other log sink) a message with the right format.
+	Queue a log message for the log pipeline, which writes it to stdout and any other configured log sink
+	from a background thread. Never blocks on the sinks.
 	Returns True.
 	"""
 
 	if not ( log_level in env.log_levels ):
-		log( 'ERROR', 0, env.ERROR_UNKNOWN_LOG_LEVEL )
+		log( 'ERROR', operation, objects, indx, env.ERROR_UNKNOWN_LOG_LEVEL )
 		return False
 
-	#INFO messages do not create a new line
-	if not ( log_level == 'INFO'):
-		line_start = '\n'
-	else:
-		line_start = ''
-
-	if not ( log_level == 'INFO'):
-		line_end = '\n'
-	else:
-		line_end = '\r'
-	#print log message with the right format. Fixed field lengths for justification
-	print( '{0}{1:<3} {2:<5}: {3:<4} {4:<3}: {5}: {6}'.format(
-			line_start,		#0
-			env.MARK,		#1
-			log_level,		#2
-			operation,		#3
-			indx,			#4
-			', '.join( str(x) for x in objects ),			#5
-			content			#6
-			),
-		end=line_end,
-		flush=not bool( log_level=='INFO' )
-		)
+	log_pipeline.emit( log_level, operation, objects, indx, content )
 
 	return True
 
+def send_request ( method, url, resource, **kwargs ):
+	"""
+	Send a request to the cluster and account for it in the run metrics under the resource type received.
+	Any other keyword arguments (headers, data...) are passed on to `requests`.
+	Returns the response received.
+	"""
+
+	metrics.request_started( resource )
+	start = time.time()
+	try:
+		request = requests.request( method, url, **kwargs )
+	except requests.exceptions.RequestException:
+		metrics.request_finished( resource, None, time.time()-start, 0, method+' '+url )
+		raise
+	#streamed bodies are read later by the caller, who accounts for their size (see buffer_store.save_response)
+	size = 0 if kwargs.get( 'stream' ) else len( request.content )
+	metrics.request_finished( resource, request.status_code, time.time()-start, size, method+' '+url )
+
+	return request
+
 def get_input ( message, valid_options=[] ):
 	"""
 	Ask the user to enter an option, validate is a valid option from the valid_options. Loops until a valid option is entered.
@@ -80,6 +100,7 @@ def get_input ( message, valid_options=[] ):
 	If valid_options is not passed, this is used to enter a value and not an option (any value is valid).
 	"""
 
+	log_pipeline.flush()
 	while True:
 		print('{0} {1}: '.format( env.MARK_INPUT, message ) )
 		user_input = input( env.MSG_ENTER_NEW_VALUE )
@@ -94,6 +115,17 @@ def get_input ( message, valid_options=[] ):
 				content=env.ERROR_INVALID_OPTION
 				)
 
+def pause ():
+	"""
+	Wait for the user to press ENTER before going back to the menu, unless running
+	unattended (e.g. several functions at once as part of post_all).
+	"""
+
+	if not env.UNATTENDED:
+		get_input( message=env.MSG_PRESS_ENTER )
+
+	return True
+
 def create_config ( config_path ) :
 	"""
 	Create a new full program configuration from defaults and return a dictionary with 
@@ -128,13 +160,14 @@ def create_config ( config_path ) :
 		'ACLS_PERMISSIONS_FILE': env.ACLS_PERMISSIONS_FILE, 
 		'AGENTS_FILE': env.AGENTS_FILE,
 		'SERVICE_GROUPS_FILE': env.SERVICE_GROUPS_FILE,
+		'METRICS_PORT': env.METRICS_PORT,
 		'TOKEN': ''
 	}
 	config_file = open( config_path, 'w' )  	#open the config file for writing
-	config_file.write( json.dumps( config ) )	#read the entire file into a dict with JSON format
+	config_file.write( codec.dumps( config ) )	#read the entire file into a dict with JSON format
 	config_file.close()
 
-	get_input( message=env.MSG_PRESS_ENTER )
+	pause()
 	
 	return config
 
@@ -158,7 +191,7 @@ def get_config ( config_path ) :
 	config_file = open( config_path, 'r' )  	#open the config file for reading
 	read_config = config_file.read()			#read the entire file into a dict with JSON format
 	config_file.close()
-	config = dict( json.loads( read_config ) )	#parse read config as JSON into readable dictionary
+	config = dict( codec.loads( read_config ) )	#parse read config as JSON into readable dictionary
 	
 	return config
 
@@ -198,7 +231,7 @@ def update_config ( config_path, config ) :
 	old_config = get_config( config_path )
 	old_config.update( config )
 	config_file = open( config_path, 'w' )  	#open the config file for writing
-	config_file.write( json.dumps( config ) )			#read the entire file into a dict with JSON format
+	config_file.write( codec.dumps( config ) )			#read the entire file into a dict with JSON format
 	config_file.close()
 	
 	return config
@@ -227,14 +260,15 @@ def load_configs ( DCOS_IP=None ):
 	list_configs()
 	name = get_input( message=env.MSG_ENTER_CONFIG_LOAD )
 	if os.path.exists( env.BACKUP_DIR+'/'+name ):
-		copy2( env.BACKUP_DIR+'/'+name+'/'+basename( env.USERS_FILE ), 			env.DATA_DIR+'/'+basename( env.USERS_FILE )  )
-		copy2( env.BACKUP_DIR+'/'+name+'/'+basename( env.USERS_GROUPS_FILE ), 		env.DATA_DIR+'/'+basename( env.USERS_GROUPS_FILE )  )
-		copy2( env.BACKUP_DIR+'/'+name+'/'+basename( env.GROUPS_FILE ), 		env.DATA_DIR+'/'+basename( env.GROUPS_FILE )  )
-		copy2( env.BACKUP_DIR+'/'+name+'/'+basename( env.GROUPS_USERS_FILE ), 		env.DATA_DIR+'/'+basename( env.GROUPS_USERS_FILE )  )
-		copy2( env.BACKUP_DIR+'/'+name+'/'+basename( env.ACLS_FILE ), 			env.DATA_DIR+'/'+basename( env.ACLS_FILE )  )
-		copy2( env.BACKUP_DIR+'/'+name+'/'+basename( env.ACLS_PERMISSIONS_FILE ),	env.DATA_DIR+'/'+basename( env.ACLS_PERMISSIONS_FILE )  )
-		copy2( env.BACKUP_DIR+'/'+name+'/'+basename( env.AGENTS_FILE ),	env.DATA_DIR+'/'+basename( env.AGENTS_FILE )  )
-		copy2( env.BACKUP_DIR+'/'+name+'/'+basename( env.SERVICE_GROUPS_FILE ),	env.DATA_DIR+'/'+basename( env.SERVICE_GROUPS_FILE )  )
+		materialized = buffer_store.materialize( env.BACKUP_DIR+'/'+name, env.DATA_DIR, env.snapshot_files )
+		log(
+			log_level='INFO',
+			operation='LOAD',
+			objects=['Config: '+name],
+			indx=len( materialized ),
+			content=', '.join( '{0} ({1})'.format( file_name, method ) for file_name, method in sorted( materialized.items() ) )
+			)
+		indexes.save_indexes()
 
 		get_input( message=env.MSG_PRESS_ENTER )
 		return True
@@ -252,35 +286,61 @@ def save_configs ( DCOS_IP=None ):
 	"""
 	Save the running DC/OS configuration to disk from local buffer.
 	"""
-	list_configs( config )
+	list_configs()
 	name = get_input( message=env.MSG_ENTER_CONFIG_SAVE )
-	if not os.path.exists( env.BACKUP_DIR+'/'+name ):
-		os.makedirs( env.BACKUP_DIR+'/'+name)
-	copy2( env.DATA_DIR+'/'+basename( env.USERS_FILE ), 		env.BACKUP_DIR+'/'+name+'/'+basename( env.USERS_FILE ) )
-	copy2( env.DATA_DIR+'/'+basename( env.USERS_GROUPS_FILE ), 	env.BACKUP_DIR+'/'+name+'/'+basename( env.USERS_GROUPS_FILE ) )
-	copy2( env.DATA_DIR+'/'+basename( env.GROUPS_FILE ), 		env.BACKUP_DIR+'/'+name+'/'+basename( env.GROUPS_FILE ) )
-	copy2( env.DATA_DIR+'/'+basename( env.GROUPS_USERS_FILE ),  	env.BACKUP_DIR+'/'+name+'/'+basename( env.GROUPS_USERS_FILE ) )
-	copy2( env.DATA_DIR+'/'+basename( env.ACLS_FILE ), 		env.BACKUP_DIR+'/'+name+'/'+basename( env.ACLS_FILE ) )
-	copy2( env.DATA_DIR+'/'+basename( env.ACLS_PERMISSIONS_FILE ),	env.BACKUP_DIR+'/'+name+'/'+basename( env.ACLS_PERMISSIONS_FILE ) )
-	copy2( env.DATA_DIR+'/'+basename( env.AGENTS_FILE ),	env.BACKUP_DIR+'/'+name+'/'+basename( env.AGENTS_FILE ) )
-	copy2( env.DATA_DIR+'/'+basename( env.SERVICE_GROUPS_FILE ),	env.BACKUP_DIR+'/'+name+'/'+basename( env.SERVICE_GROUPS_FILE ) )
+	save_snapshot( name )
 
 	get_input( message=env.MSG_PRESS_ENTER )
 
 	return True
 
+def save_snapshot ( name ):
+	"""
+	Save the local buffer to disk as the configuration with the name received, along with its manifest.
+	Returns the manifest as a dictionary.
+	"""
+
+	materialized = buffer_store.materialize( env.DATA_DIR, env.BACKUP_DIR+'/'+name, env.snapshot_files )
+	log(
+		log_level='INFO',
+		operation='SAVE',
+		objects=['Config: '+name],
+		indx=len( materialized ),
+		content=', '.join( '{0} ({1})'.format( file_name, method ) for file_name, method in sorted( materialized.items() ) )
+		)
+	#record what was saved, so the configuration can be verified before it's restored
+	return snapshot_manifest.write_manifest( env.BACKUP_DIR+'/'+name )
+
+def print_pages ( lines ):
+	"""
+	Print the lines received (any iterable) env.CHECK_PAGE_SIZE at a time, asking before each new page.
+	Returns False if the user stopped before the end.
+	"""
+
+	for index, line in enumerate( lines ):
+		if index and not index % env.CHECK_PAGE_SIZE:
+			if get_input( message=env.MSG_NEXT_PAGE ) in ( 'q', 'Q' ):
+				return False
+		print( line )
+
+	return True
+
 def check_users ( DCOS_IP=None ):
 	"""
 	List all the users currently in the application's buffer.
 	Takes no parameters but DCOS_IP is left to use the same interface on all options.
 	"""
 
-	config = helpers.get_config( env.CONFIG_FILE )  
 	print('{0}'.format( env.MSG_CURRENT_USERS ) )
-	#Open users file
+	#Open users and users_groups files, records are read lazily as they are printed
+	users = None
 	try:  
-		users_file = open( env.USERS_FILE, 'r' )  
+		users = buffer_stream.BufferReader( env.USERS_FILE )
+		users_groups = buffer_stream.BufferReader( env.USERS_GROUPS_FILE )
 	except IOError as error:
+		#don't leak the first file if the second one can't be opened
+		if users is not None:
+			users.close()
 		helpers.log(
 			log_level='ERROR',
 			operation='LOAD',
@@ -290,37 +350,14 @@ def check_users ( DCOS_IP=None ):
 			)
 		get_input( message=env.MSG_PRESS_ENTER )
 		return False #return Error if file isn't available
-    #load entire text file and convert to JSON - dictionary
-	users = json.loads( users_file.read() )
-	users_file.close()
-
-	for index, user in ( enumerate( users['array'] ) ):
-		print( 'User #{0}: {1}'.format(index, user['uid'] ) )
-
-	#open up the users_groups file and print the groups each user is a member of
-	try:  
-		users_groups_file = open( env.USERS_GROUPS_FILE, 'r' ) 
-	except IOError as error:
-		helpers.log(
-			log_level='ERROR',
-			operation='LOAD',
-			objects=['Users', 'Groups'],
-			indx=0,
-			content=request.text
-			)
-		get_input( message=env.MSG_PRESS_ENTER )
-		return False #return Error if file isn't available
-    #load entire text file and convert to JSON - dictionary
-	users_groups = json.loads( users_groups_file.read() )
-	users_groups_file.close()	
-
-	for index, user_group in ( enumerate( users_groups['array'] ) ):
 
-		groups = user_group['groups']
-
-		for group in groups:
-
-			print( 'User {0} belongs to Group: {1}'.format(user_group['uid'], group['group']['gid'] ) )
+	with users, users_groups:
+		print_pages( itertools.chain(
+			( 'User #{0}: {1}'.format( index, user['uid'] ) for index, user in enumerate( users ) ),
+			#the groups each user is a member of
+			( 'User {0} belongs to Group: {1}'.format( user_group['uid'], group['group']['gid'] )
+				for user_group in users_groups for group in user_group['groups'] )
+		) )
 
 	get_input( message=env.MSG_PRESS_ENTER )
 
@@ -332,12 +369,16 @@ def check_groups ( DCOS_IP=None ):
 	Takes no parameters but DCOS_IP is left to use the same interface on all options.
 	"""
 
-	config = helpers.get_config( env.CONFIG_FILE )  
 	print('{0}'.format( env.MSG_CURRENT_GROUPS ) )
-	#Open groups file
+	#Open groups and groups_users files, records are read lazily as they are printed
+	groups = None
 	try:  
-		groups_file = open( env.GROUPS_FILE, 'r' ) 
+		groups = buffer_stream.BufferReader( env.GROUPS_FILE )
+		groups_users = buffer_stream.BufferReader( env.GROUPS_USERS_FILE )
 	except IOError as error:
+		#don't leak the first file if the second one can't be opened
+		if groups is not None:
+			groups.close()
 		helpers.log(
 			log_level='ERROR',
 			operation='LOAD',
@@ -347,39 +388,14 @@ def check_groups ( DCOS_IP=None ):
 			)
 		get_input( message=env.MSG_PRESS_ENTER )
 		return False #return Error if file isn't available
-    #load entire text file and convert to JSON - dictionary
-	groups = json.loads( groups_file.read() )
-	groups_file.close()
-
-	for index, group in ( enumerate( groups['array'] ) ):
-		print( 'Group #{0}: {1}'.format(index, group['gid'] ) )
-
-	#open up the groups_users file and print the users each group has as members
-	try:  
-		groups_users_file = open( env.GROUPS_USERS_FILE, 'r' ) 
-	except IOError as error:
-		helpers.log(
-			log_level='ERROR',
-			operation='LOAD',
-			objects=['Groups', 'Users'],
-			indx=0,
-			content=request.text
-			)
-		get_input( message=env.MSG_PRESS_ENTER )
-		return False #return Error if file isn't available
-    #load entire text file and convert to JSON - dictionary
-	groups_users = json.loads( groups_users_file.read() )
-	groups_users_file.close()	
-
-	#loop through the list of users_groups and print them
-	for index, group_user in ( enumerate( groups_users['array'] ) ):
-
-		users = group_user['users']
-
-		for user in users:
-
-			print( 'Group {0} has as a member User: {1}'.format(group_user['gid'], user['user']['uid'] ) )
 
+	with groups, groups_users:
+		print_pages( itertools.chain(
+			( 'Group #{0}: {1}'.format( index, group['gid'] ) for index, group in enumerate( groups ) ),
+			#the users each group has as members
+			( 'Group {0} has as a member User: {1}'.format( group_user['gid'], user['user']['uid'] )
+				for group_user in groups_users for user in group_user['users'] )
+		) )
 
 	get_input( message=env.MSG_PRESS_ENTER )
 
@@ -391,12 +407,10 @@ def check_acls ( DCOS_IP=None ):
 	Takes no parameters but DCOS_IP is left to use the same interface on all options.
 	"""
 
-	config = helpers.get_config( env.CONFIG_FILE )  
 	print('{0}'.format( env.MSG_CURRENT_ACLS ) )
-	#Open users file
+	#Open ACLs file, records are read lazily as they are printed
 	try:  
-		#open the groups file and load the LIST of Groups from JSON
-		acls_file = open( env.ACLS_FILE, 'r' )   
+		acls = buffer_stream.BufferReader( env.ACLS_FILE )
 	except IOError as error:
 		helpers.log(
 			log_level='ERROR',
@@ -407,13 +421,9 @@ def check_acls ( DCOS_IP=None ):
 			)
 		get_input( message=env.MSG_PRESS_ENTER )
 		return False #return Error if file isn't available
-    #load entire text file and convert to JSON - dictionary
-	acls = json.loads( acls_file.read() )
-	acls_file.close()
 
-	#loop through the list of groups and
-	for index, acl in ( enumerate( acls['array'] ) ):
-		print( 'ACL #{0}: {1}'.format(index, acl['rid'] ) )
+	with acls:
+		print_pages( 'ACL #{0}: {1}'.format( index, acl['rid'] ) for index, acl in enumerate( acls ) )
 
 	get_input( message=env.MSG_PRESS_ENTER )
 
@@ -442,7 +452,7 @@ def check_ldap ( DCOS_IP=None ):
 		get_input( message=env.MSG_PRESS_ENTER )
 		return False #return Error if file isn't available
     #load entire text file and convert to JSON - dictionary
-	ldap = json.loads( ldap_file.read() )
+	ldap = codec.loads( ldap_file.read() )
 	ldap_file.close()
 
 	print( 'LDAP Configuration: {1}'.format(ldap ) )
@@ -473,7 +483,7 @@ def check_service_groups ( DCOS_IP=None ):
 		get_input( message=env.MSG_PRESS_ENTER )
 		return False #return Error if file isn't available
     #load entire text file and convert to JSON - dictionary
-	service_groups = json.loads( service_groups_file.read() )
+	service_groups = codec.loads( service_groups_file.read() )
 	service_groups_file.close()
 
 	walk_and_print ( service_groups, "Service Groups" )
@@ -602,6 +612,7 @@ def display_main_menu( config, state ):
 	menu_line( hotkey=hk['list_configs'], message=env.MSG_LIST_CONFIG )
 	menu_line( hotkey=hk['load_configs'], message=env.MSG_LOAD_CONFIG )
 	menu_line( hotkey=hk['save_configs'], message=env.MSG_SAVE_CONFIG )
+	menu_line( hotkey=hk['verify_configs'], message=env.MSG_VERIFY_CONFIG )
 	menu_line( hotkey=hk['show_config'], message=env.MSG_SHOW_CONFIG )	
 	menu_line()
 	menu_line( message=env.MSG_GET_MENU )
@@ -610,7 +621,10 @@ def display_main_menu( config, state ):
 	menu_line( hotkey=hk['get_acls'], message=env.MSG_GET_ACLS )
 	menu_line( hotkey=hk['get_ldap'], message=env.MSG_GET_LDAP )
 	menu_line( hotkey=hk['get_agents'], message=env.MSG_GET_AGENTS )
+	menu_line( hotkey=hk['watch_agents'], message=env.MSG_WATCH_AGENTS )
 	menu_line( hotkey=hk['get_service_groups'], message=env.MSG_GET_SERVICE_GROUPS )
+	menu_line( hotkey=hk['get_service_groups_selection'], message=env.MSG_GET_SERVICE_GROUPS_SELECTION )
+	menu_line( hotkey=hk['get_apps'], message=env.MSG_GET_APPS )
 	menu_line( hotkey=hk['get_all'], message=env.MSG_GET_ALL )
 	menu_line()
 	menu_line( message=env.MSG_PUT_MENU )
@@ -619,7 +633,14 @@ def display_main_menu( config, state ):
 	menu_line( hotkey=hk['post_acls'], message=env.MSG_PUT_ACLS )
 	menu_line( hotkey=hk['post_ldap'], message=env.MSG_PUT_LDAP )
 	menu_line( hotkey=hk['post_service_groups'], message=env.MSG_PUT_SERVICE_GROUPS )
+	menu_line( hotkey=hk['post_service_groups_tree'], message=env.MSG_PUT_SERVICE_GROUPS_TREE )
+	menu_line( hotkey=hk['post_service_groups_changes'], message=env.MSG_PUT_SERVICE_GROUPS_CHANGES )
+	menu_line( hotkey=hk['post_service_groups_selection'], message=env.MSG_PUT_SERVICE_GROUPS_SELECTION )
+	menu_line( hotkey=hk['post_apps'], message=env.MSG_PUT_APPS )
 	menu_line( hotkey=hk['post_all'], message=env.MSG_PUT_ALL )
+	menu_line( hotkey=hk['verify_restore'], message=env.MSG_VERIFY_RESTORE )
+	menu_line( hotkey=hk['migrate_cluster'], message=env.MSG_MIGRATE_CLUSTER )
+	menu_line( hotkey=hk['compare_clusters'], message=env.MSG_COMPARE_CLUSTERS )
 	menu_line()
 	menu_line( message=env.MSG_CHECK_MENU )
 	menu_line( hotkey=hk['check_users'], message=env.MSG_CHECK_USERS )
@@ -627,6 +648,9 @@ def display_main_menu( config, state ):
 	menu_line( hotkey=hk['check_acls'], message=env.MSG_CHECK_ACLS )
 	menu_line( hotkey=hk['check_ldap'], message=env.MSG_CHECK_LDAP )
 	menu_line( hotkey=hk['check_service_groups'], message=env.MSG_CHECK_SERVICE_GROUPS )	
+	menu_line( hotkey=hk['query_permissions'], message=env.MSG_QUERY_PERMISSIONS )
+	menu_line( hotkey=hk['export_effective_permissions'], message=env.MSG_EXPORT_EFFECTIVE_PERMISSIONS )
+	menu_line( hotkey=hk['diff_snapshots'], message=env.MSG_DIFF_SNAPSHOTS )
 	menu_line()
 	menu_line( hotkey=hk['exit'], message=env.MSG_EXIT )		
 	menu_line()
@@ -650,25 +674,36 @@ def escape ( a_string ) :
 
 	return escaped
 
-def login_to_cluster ( config ):
+def is_remote ( entity ) :
 	"""
-	Log into the cluster whose DCOS_IP is specified in 'config' in order to get a valid token, using the username and password in 'config'. Also save the updated token to the config file.
+	Returns True if the user or group received comes from an external directory (LDAP),
+	in which case it is imported from the directory rather than created in the cluster.
+	"""
+
+	return bool( entity.get( 'is_remote' ) ) or entity.get( 'provider_type' ) == 'ldap'
+
+def get_token ( DCOS_IP, username, password ):
+	"""
+	Log into the cluster at DCOS_IP with the username and password received.
+	Returns a valid token, or None if the login failed.
 	"""
 
 	api_endpoint = '/acs/api/v1/auth/login'
-	url = 'http://'+config['DCOS_IP']+api_endpoint
+	url = 'http://'+DCOS_IP+api_endpoint
 	headers = {
 		'Content-type': 'application/json'
 	}
 	data = { 
-		"uid":		config['DCOS_USERNAME'],
-		"password":	config['DCOS_PASSWORD']
+		"uid":		username,
+		"password":	password
 		}
 
 	try:
-		request = requests.post(
+		request = send_request(
+			'POST',
 			url,
-			data = json.dumps( data ),
+			'auth',
+			data = codec.dumps( data ),
 			headers=headers
 			)
 		request.raise_for_status()
@@ -679,56 +714,86 @@ def login_to_cluster ( config ):
 			indx=0,
 			content=request.status_code
 			)
-	except ( requests.exceptions.HTTPError, requests.exceptions.ConnectionError ) as error:
+	except requests.exceptions.HTTPError as error:
 		log(
 			log_level='ERROR',
 			operation='GET',
-			objects=[config],
+			objects=[DCOS_IP, username],
 			indx=0,
 			content=request.text
 			)
+		return None
+	except requests.exceptions.RequestException as error:
+		#no response at all, e.g. the cluster is unreachable
+		log(
+			log_level='ERROR',
+			operation='GET',
+			objects=[DCOS_IP],
+			indx=0,
+			content=repr( error )
+			)
+		return None
+
+	return codec.loads( request.content )['token']
+
+def login_to_cluster ( config ):
+	"""
+	Log into the cluster whose DCOS_IP is specified in 'config' in order to get a valid token, using the username and password in 'config'. Also save the updated token to the config file.
+	"""
+
+	token = get_token( config['DCOS_IP'], config['DCOS_USERNAME'], config['DCOS_PASSWORD'] )
+	if token is None:
 		return False
 
 	#update the configuration with the newly acquired Token
-	config['TOKEN'] = request.json()['token']
+	config['TOKEN'] = token
+	metrics.token_refreshed()
 	update_config( env.CONFIG_FILE, config )
 
 	return True
 
 def walk_and_print( item, name ):
 	"""
-	Walks a recursive tree-like structure for items printing them.
-	Structure is assumed to have children under 'groups' and name under 'id'
-	Receives the tree item and an 'id' as a name to identify each node.
+	Walks a tree-like structure of service groups, printing the id of the groups with no children.
+	Receives the tree item and a name to identify each node in the output.
 	"""
-	if item['groups']:
-		for i in item['groups']:
-			walk_and_print( i, name )
-	else:
-		print( "{0}: {1}".format( name, item['id'] ) )
+
+	for path, group in service_group_tree.walk_pre_order( item ):
+		if not group['groups']:
+			print( "{0}: {1}".format( name, group['id'] ) )
 
 	return True
 
-def format_service_group( service_group ):
+def format_service_group( service_group, keep_apps=False ):
 	"""
-	Walks a (potentially recursive tree-like structure of) service group in a dict that potentially include apps.
-	Removes fields that can't be posted initially from the service group:
-	- apps (empty it)
-	- version (remove it)
-	Changes the format of the "id" field to remove "/"
-	Modifies the object passed as a parameter, does NOT return.
+	Walks a (potentially deeply nested) service group tree and builds a copy of it that can be posted,
+	without the fields that can't be posted initially:
+	- apps (empty it, unless keep_apps is set: then only remove the read-only fields of each app)
+	- version (remove it, if present)
+	Does NOT modify the object passed as a parameter.
+	Returns the formatted copy of the service group.
 	"""
 
-	#remove my children's apps
-	for index,group in enumerate( service_group['groups'] ):
-		#if isinstance( group, list ):
-		format_service_group( group )
-	
-	#remove my own apps
-	service_group['apps'] = [] #apps is an empty list
-	del service_group['version']
+	def format_group( path, group, children ):
+		formatted = { key: value for key, value in group.items() if key not in ( 'apps', 'groups', 'version' ) }
+		formatted['groups'] = children
+		formatted['apps'] = [ format_app( app ) for app in group['apps'] ] if keep_apps else []
+		return formatted
 
-	return True
+	return service_group_tree.map_post_order( service_group, format_group )
+
+def format_app( app ):
+	"""
+	Builds a copy of an app definition returned by Marathon without its read-only fields, so that it can be posted.
+	Returns the formatted copy of the app.
+	"""
+
+	formatted = { key: value for key, value in app.items() if key not in env.MARATHON_READ_ONLY_FIELDS }
+	#Marathon returns both, but only accepts one of them. "ports" is the deprecated one.
+	if 'portDefinitions' in formatted:
+		formatted.pop( 'ports', None )
+
+	return formatted
 
 def exit( DCOS_IP ):
 	"""
@@ -744,33 +809,71 @@ def exit( DCOS_IP ):
 		indx=0,
 		content=env.MSG_DONE
 		)
+	log_pipeline.close()
 	sys.exit(1)
 
 	return None
 
 def get_all( DCOS_IP ):
 	"""
-	Do a full GET of all parameters supported. Simply calls other functions."
+	Do a full GET of all parameters supported, including the secondary crawls (users_groups,
+	groups_users, acls_permissions). Primary GETs run in parallel and each secondary starts
+	as soon as its primary finishes.
+	Returns True if all of them succeeded.
 	"""
 
-	get_users( DCOS_IP )
-	get_groups( DCOS_IP )
-	get_acls( DCOS_IP )
-	get_ldap( DCOS_IP )
-	get_service_groups( DCOS_IP )
-	get_agents( DCOS_IP )
+	metrics.reset()
 
-	return True
+	tasks = {}
+	for primary in env.get_all_functions:
+		tasks[primary] = ( functools.partial( globals()[primary], DCOS_IP ), [] )
+		#only secondaries that GET more information; display functions are interactive
+		secondary = env.secondary_functions.get( primary, 'noop' )
+		if secondary.startswith( 'get_' ):
+			tasks[secondary] = ( functools.partial( globals()[secondary], DCOS_IP ), [primary] )
+	results = scheduler.run_dag( tasks )
+	indexes.save_indexes()
+
+	run_summary.write_run_summary( 'GET' )
+	pause()
+
+	return len( results ) == len( tasks )
 
 def post_all( DCOS_IP ):
 	"""
-	Do a full GET of all parameters supported. Simply calls other functions."
-	"""
+	Do a full RESTORE of all parameters supported, in waves: first users, groups, ACLs, LDAP and
+	service groups in parallel, then user-group memberships, ACL grants and apps in parallel.
+	Stops if any function in a wave fails. Once restored, reads the configuration back from the
+	cluster to verify it matches the buffer.
+	"""
+
+	metrics.reset()
+
+	waves = []
+	for wave in env.post_all_waves:
+		functions = {}
+		for name in wave:
+			if name == 'post_ldap' and not os.path.exists( env.LDAP_FILE ):
+				#LDAP is optional: clusters without LDAP have no LDAP configuration to restore
+				continue
+			if name == 'post_apps' and not os.path.exists( env.APPS_FILE ):
+				#snapshots taken before apps were backed up separately have no apps file
+				continue
+			if name in env.secondary_functions.values():
+				#secondary functions read from the buffer, their second parameter is not used
+				functions[name] = functools.partial( globals()[name], DCOS_IP, None )
+			else:
+				functions[name] = functools.partial( globals()[name], DCOS_IP )
+		waves.append( functions )
+	env.UNATTENDED = True
+	try:
+		restored = scheduler.run_waves( waves )
+		if restored:
+			restored = verify_restore( DCOS_IP )
+	finally:
+		env.UNATTENDED = False
 
-	post_users( DCOS_IP )
-	post_groups( DCOS_IP )
-	post_acls( DCOS_IP )
-	post_service_groups( DCOS_IP )
-	post_ldap( DCOS_IP )
+	run_summary.write_run_summary( 'PUT' )
+	get_input( message=env.MSG_PRESS_ENTER )
 
-	return True
+	return restored
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+#
+# indexes.py: inverted indexes over the ACLs, users and groups in the buffer
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Build, from acls_permissions.json, users_groups.json and groups_users.json,
+# the maps needed to answer "who can do what" questions directly:
+# - rid to the users and groups granted actions on it
+# - principal (user or group) to the rids it has been granted actions on
+# - group to its members, and user to the groups it's a member of
+# The indexes are saved in the buffer after a GET or LOAD, and rebuilt
+# whenever any of the files they were built from is newer.
+
+import os
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import helpers			#helper functions in separate module helpers.py
+
+#files the indexes are built from
+INDEX_SOURCES = [ env.ACLS_PERMISSIONS_FILE, env.USERS_GROUPS_FILE, env.GROUPS_USERS_FILE ]
+
+def unescape( a_string ):
+	"""
+	Revert helpers.escape, as ids are saved escaped for URLs in the buffer.
+	"""
+
+	return a_string.replace( '%252F', '/' )
+
+def principal_key( kind, name ):
+	"""
+	Returns the key of a principal in the indexes, e.g. 'user:bob' or 'group:admins'.
+	"""
+
+	return kind+':'+unescape( name )
+
+def load_buffer_file( path ):
+	"""
+	Load a buffer file in the { 'array': [...] } format. Returns the list, or an empty list
+	if the file isn't in the buffer.
+	"""
+
+	try:
+		with open( path, 'r' ) as buffer_file:
+			return codec.loads( buffer_file.read() ).get( 'array', [] )
+	except IOError:
+		return []
+
+def build_indexes():
+	"""
+	Build the indexes from the files in the buffer, in a single pass over each of them.
+	Returns a dictionary with:
+	- 'rid_principals': rid : principal : [ actions ]
+	- 'principal_rids': principal : rid : [ actions ]
+	- 'group_members': gid : [ uids ]
+	- 'user_groups': uid : [ gids ]
+	"""
+
+	rid_principals, principal_rids = {}, {}
+	for acl in load_buffer_file( env.ACLS_PERMISSIONS_FILE ):
+		rid = unescape( acl['rid'] )
+		grants = rid_principals.setdefault( rid, {} )
+		for kind, id_key in ( ( 'users', 'uid' ), ( 'groups', 'gid' ) ):
+			for principal in acl.get( kind, [] ):
+				key = principal_key( kind[:-1], principal[id_key] )
+				actions = sorted( action['name'] for action in principal.get( 'actions', [] ) )
+				grants[key] = actions
+				principal_rids.setdefault( key, {} )[rid] = actions
+
+	#memberships are saved from both sides: merge them in case only one was retrieved
+	members = {}
+	for user in load_buffer_file( env.USERS_GROUPS_FILE ):
+		for membership in user.get( 'groups', [] ):
+			members.setdefault( unescape( membership['group']['gid'] ), set() ).add( unescape( user['uid'] ) )
+	for group in load_buffer_file( env.GROUPS_USERS_FILE ):
+		gid_members = members.setdefault( unescape( group['gid'] ), set() )
+		for membership in group.get( 'users', [] ):
+			gid_members.add( unescape( membership['user']['uid'] ) )
+	group_members, user_groups = {}, {}
+	for gid, uids in sorted( members.items() ):
+		group_members[gid] = sorted( uids )
+		for uid in group_members[gid]:
+			user_groups.setdefault( uid, [] ).append( gid )
+
+	return {
+		'rid_principals':	rid_principals,
+		'principal_rids':	principal_rids,
+		'group_members':	group_members,
+		'user_groups':		user_groups
+	}
+
+def save_indexes( path=env.INDEXES_FILE ):
+	"""
+	Build the indexes from the buffer and save them to the path received, by default in the buffer.
+	Returns the indexes as a dictionary.
+	"""
+
+	indexes = build_indexes()
+	with open( path, 'w' ) as indexes_file:
+		indexes_file.write( codec.dumps( indexes ) )
+	helpers.log(
+		log_level='INFO',
+		operation='INDEX',
+		objects=['ACLs', 'Principals'],
+		indx=len( indexes['rid_principals'] ),
+		content='{0} rids, {1} principals, {2} groups indexed'.format(
+			len( indexes['rid_principals'] ), len( indexes['principal_rids'] ), len( indexes['group_members'] ) )
+		)
+
+	return indexes
+
+def load_indexes( path=env.INDEXES_FILE ):
+	"""
+	Load the indexes saved in the buffer, rebuilding them first if they are missing or
+	older than any of the files they are built from.
+	Returns the indexes as a dictionary.
+	"""
+
+	sources = [ os.path.getmtime( source ) for source in INDEX_SOURCES if os.path.exists( source ) ]
+	if not os.path.exists( path ) or any( mtime > os.path.getmtime( path ) for mtime in sources ):
+		return save_indexes( path )
+	with open( path, 'r' ) as indexes_file:
+		return codec.loads( indexes_file.read() )
+
+def add_grant( result, key, actions, source ):
+	"""
+	Merge a grant of actions from a source ('direct' or a group) into result[key],
+	a dictionary of { 'actions': [...], 'via': [ sources ] }.
+	"""
+
+	grant = result.setdefault( key, { 'actions': [], 'via': [] } )
+	grant['actions'] = sorted( set( grant['actions'] ) | set( actions ) )
+	if source not in grant['via']:
+		grant['via'].append( source )
+
+	return grant
+
+def who_can( indexes, rid ):
+	"""
+	Returns the principals granted actions on the rid received, directly or as members of granted
+	groups, as a dictionary of principal : { 'actions': [...], 'via': [ 'direct' and/or groups ] },
+	with the actions of all of its grants merged.
+	"""
+
+	result = {}
+	for principal, actions in sorted( indexes['rid_principals'].get( rid, {} ).items() ):
+		add_grant( result, principal, actions, 'direct' )
+		if principal.startswith( 'group:' ):
+			for uid in indexes['group_members'].get( principal[len( 'group:' ):], [] ):
+				add_grant( result, 'user:'+uid, actions, principal )
+
+	return result
+
+def what_can( indexes, principal ):
+	"""
+	Returns the rids the principal received ('user:<uid>' or 'group:<gid>') has been granted actions on,
+	directly or through its groups, as a dictionary of rid : { 'actions': [...], 'via': [ 'direct' and/or groups ] },
+	with the actions of all of its grants merged.
+	"""
+
+	result = {}
+	for rid, actions in indexes['principal_rids'].get( principal, {} ).items():
+		add_grant( result, rid, actions, 'direct' )
+	if principal.startswith( 'user:' ):
+		for gid in indexes['user_groups'].get( principal[len( 'user:' ):], [] ):
+			for rid, actions in indexes['principal_rids'].get( 'group:'+gid, {} ).items():
+				add_grant( result, rid, actions, 'group:'+gid )
+
+	return result
+
+def query_permissions ( DCOS_IP=None ):
+	"""
+	Answer "who can do what" questions from the indexes of the buffer: for a rid, list the
+	principals that can act on it; for 'user:<uid>' or 'group:<gid>', list the rids they can act on.
+	Takes no parameters but DCOS_IP is left to use the same interface on all options.
+	"""
+
+	indexes = load_indexes()
+	query = helpers.get_input( message=env.MSG_ENTER_PERMISSIONS_QUERY ).strip()
+	if query.startswith( ( 'user:', 'group:' ) ):
+		result = what_can( indexes, query )
+		if query.startswith( 'group:' ):
+			print( 'Members: {0}'.format( ', '.join( indexes['group_members'].get( query[len( 'group:' ):], [] ) ) ) )
+	else:
+		result = who_can( indexes, query )
+	for key, grant in sorted( result.items() ):
+		print( '{0}: {1} (via {2})'.format( key, ', '.join( grant['actions'] ), ', '.join( grant['via'] ) ) )
+	print( '{0} {1} results.'.format( env.MARK, len( result ) ) )
+	helpers.get_input( message=env.MSG_PRESS_ENTER )
+
+	return True
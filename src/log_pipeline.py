@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+#
+# log_pipeline.py: buffered, asynchronous log pipeline with pluggable sinks
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Log records are queued by `helpers.log` without ever touching stdout, and a
+# background writer thread drains the queue in batches and hands each batch to
+# the configured sinks:
+# - ProgressConsoleSink: a compact progress bar on the console, with ERROR
+#   and DEBUG records printed in full on their own line.
+# - JsonLinesFileSink: every record as a line of JSON in a rotating file.
+#
+# No sink is set up on import: the programs (run.py, fleet.py) call
+# configure_default_sinks() on startup, so that importing a module never
+# creates the log directory or starts the writer on its own.
+
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import metrics			#run metrics, used to draw the progress bar
+
+_queue = queue.Queue()
+_sinks = []
+_lock = threading.Lock()
+_writer = None
+
+def format_record( record ):
+	"""
+	Format a log record with fixed field lengths for justification.
+	Returns the formatted line, without line start or end.
+	"""
+
+	return '{0:<3} {1:<5}: {2:<4} {3:<3}: {4}: {5}'.format(
+		env.MARK,												#0
+		record['log_level'],									#1
+		record['operation'],									#2
+		record['indx'],											#3
+		', '.join( str(x) for x in record['objects'] ),			#4
+		record['content']										#5
+		)
+
+class ProgressConsoleSink():
+	"""
+	Console sink that condenses INFO records into a single progress line,
+	redrawn once per batch, and prints any other record in full.
+	"""
+
+	def __init__( self, stream=None, width=env.MENU_WIDTH ):
+		self.stream = stream or sys.stdout
+		self.width = width
+		self.pending_line = False
+
+	def progress_bar( self ):
+		completed, expected = metrics.progress()
+		if not expected:
+			return '[{0:>6} req]'.format( completed )
+		done = int( env.LOG_PROGRESS_BAR_WIDTH * min( completed, expected ) / expected )
+		return '[{0}{1}] {2}/{3}'.format( '#'*done, '-'*( env.LOG_PROGRESS_BAR_WIDTH-done ), completed, expected )
+
+	def write( self, batch ):
+		last_info = None
+		for record in batch:
+			if record['log_level'] == 'INFO':
+				last_info = record
+				continue
+			if self.pending_line:
+				self.stream.write( '\n' )
+				self.pending_line = False
+			self.stream.write( format_record( record )+'\n' )
+		if last_info:
+			line = '{0} {1}'.format( self.progress_bar(), format_record( last_info ) )
+			self.stream.write( '\r'+line[:self.width].ljust( self.width ) )
+			self.pending_line = True
+		self.stream.flush()
+
+	def close( self ):
+		if self.pending_line:
+			self.stream.write( '\n' )
+			self.stream.flush()
+			self.pending_line = False
+
+class JsonLinesFileSink():
+	"""
+	File sink that appends every record as a line of JSON, rotating the file
+	when it grows over max_bytes and keeping `backups` older files (.1, .2...).
+	"""
+
+	def __init__( self, path, max_bytes=env.LOG_MAX_BYTES, backups=env.LOG_BACKUPS ):
+		self.path = path
+		self.max_bytes = max_bytes
+		self.backups = backups
+		log_dir = os.path.dirname( path )
+		if log_dir and not os.path.isdir( log_dir ):
+			os.makedirs( log_dir )
+		self.file = open( path, 'a' )
+
+	def rotate( self ):
+		self.file.close()
+		for index in range( self.backups-1, 0, -1 ):
+			if os.path.exists( '{0}.{1}'.format( self.path, index ) ):
+				os.replace( '{0}.{1}'.format( self.path, index ), '{0}.{1}'.format( self.path, index+1 ) )
+		if self.backups:
+			os.replace( self.path, self.path+'.1' )
+		self.file = open( self.path, 'w' )
+
+	def write( self, batch ):
+		#objects and content may hold anything printable, not only JSON types
+		self.file.write( ''.join( codec.dumps( record, default=str )+'\n' for record in batch ) )
+		self.file.flush()
+		if self.max_bytes and self.file.tell() >= self.max_bytes:
+			self.rotate()
+
+	def close( self ):
+		self.file.close()
+
+def _write_batches():
+	"""
+	Writer thread: wait for a record, drain whatever else is queued (up to a batch)
+	and hand the whole batch to every sink.
+	"""
+
+	while True:
+		batch = [ _queue.get() ]
+		while len( batch ) < env.LOG_BATCH_SIZE:
+			try:
+				batch.append( _queue.get_nowait() )
+			except queue.Empty:
+				break
+		with _lock:
+			sinks = list( _sinks )
+		for sink in sinks:
+			try:
+				sink.write( batch )
+			except Exception as error:
+				#a broken sink must never take the writer (or the program) down
+				sys.stderr.write( 'Log sink {0} failed: {1}\n'.format( type( sink ).__name__, error ) )
+		for record in batch:
+			_queue.task_done()
+
+def _start_writer():
+	"""
+	Start the background writer thread if it is not running yet.
+	"""
+
+	global _writer
+
+	with _lock:
+		if _writer is None:
+			_writer = threading.Thread( target=_write_batches, name='log-writer', daemon=True )
+			_writer.start()
+
+	return True
+
+def emit( log_level, operation, objects, indx, content ):
+	"""
+	Queue a log record for the writer thread. Never blocks on the sinks.
+	"""
+
+	if _writer is None:
+		_start_writer()
+	_queue.put( {
+		'time':			time.time(),
+		'log_level':	log_level,
+		'operation':	operation,
+		'indx':			indx,
+		'objects':		objects,
+		'content':		content
+		} )
+
+	return True
+
+def flush():
+	"""
+	Wait until every queued record has been written by all sinks.
+	Used before prompting the user so that output is not interleaved.
+	"""
+
+	if _writer is not None:
+		_queue.join()
+	with _lock:
+		sinks = list( _sinks )
+	for sink in sinks:
+		if isinstance( sink, ProgressConsoleSink ):
+			sink.close()
+
+	return True
+
+def add_sink( sink ):
+	"""
+	Add a sink to the pipeline. A sink is any object with write( batch ) and close() methods.
+	"""
+
+	with _lock:
+		_sinks.append( sink )
+
+	return True
+
+def remove_sink( sink ):
+	"""
+	Flush and remove a sink from the pipeline.
+	"""
+
+	flush()
+	with _lock:
+		_sinks.remove( sink )
+	sink.close()
+
+	return True
+
+def configure_default_sinks():
+	"""
+	Set up the default pipeline: progress bar on the console and, if a log file
+	is configured, a rotating JSON-lines file.
+	"""
+
+	add_sink( ProgressConsoleSink() )
+	if env.LOG_FILE:
+		add_sink( JsonLinesFileSink( env.LOG_FILE ) )
+
+	return True
+
+def close():
+	"""
+	Flush and close all sinks. Registered to run on exit.
+	"""
+
+	flush()
+	with _lock:
+		sinks = list( _sinks )
+		del _sinks[:]
+	for sink in sinks:
+		sink.close()
+
+	return True
+
+atexit.register( close )
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+#
+# metrics.py: live run metrics and an optional Prometheus-style metrics endpoint
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Keep a set of counters and gauges about the requests sent to the cluster
+# (in flight, completed per resource type, errors, token refreshes...) and
+# optionally expose them in Prometheus text format on a local HTTP listener,
+# so that long backups and restores can be watched by existing scrapers.
+
+#reference:
+#https://prometheus.io/docs/instrumenting/exposition_formats/
+
+import time
+import heapq
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import env				#environment variables and constants
+
+#all counters are kept in a single dictionary protected by a lock,
+#as requests may be accounted for from several threads at once.
+_lock = threading.Lock()
+_metrics = {}
+_server = None
+
+def reset():
+	"""
+	Reset all counters and gauges, marking the start of a new run.
+	Returns True.
+	"""
+
+	with _lock:
+		_metrics.clear()
+		_metrics.update( {
+			'start_time':		time.time(),
+			'in_flight':		0,
+			'completed':		{},		#( resource, status ) : count
+			'errors':			{},		#resource : count
+			'bytes':			{},		#resource : bytes received
+			'slowest':			[],		#heap of ( seconds, description, resource, status )
+			'expected':			0,
+			'concurrency':		1,
+			'token_refreshes':	0
+		} )
+
+	return True
+
+def request_started( resource ):
+	"""
+	Account for a request to the cluster about to be sent for the resource type received.
+	"""
+
+	with _lock:
+		_metrics['in_flight'] += 1
+
+	return True
+
+def request_finished( resource, status, seconds=0, size=0, description='' ):
+	"""
+	Account for a request to the cluster that finished with the HTTP status received,
+	taking `seconds` and returning `size` bytes. A status of None means that the request
+	never got a response (e.g. connection error).
+	"""
+
+	with _lock:
+		_metrics['in_flight'] -= 1
+		key = ( resource, str( status ) )
+		_metrics['completed'][key] = _metrics['completed'].get( key, 0 ) + 1
+		if status is None or status >= 400:
+			_metrics['errors'][resource] = _metrics['errors'].get( resource, 0 ) + 1
+		_metrics['bytes'][resource] = _metrics['bytes'].get( resource, 0 ) + size
+		#keep only the slowest requests: a min-heap of fixed size
+		entry = ( seconds, description, resource, str( status ) )
+		if len( _metrics['slowest'] ) < env.SUMMARY_SLOWEST_REQUESTS:
+			heapq.heappush( _metrics['slowest'], entry )
+		elif entry > _metrics['slowest'][0]:
+			heapq.heapreplace( _metrics['slowest'], entry )
+
+	return True
+
+def bytes_received( resource, size ):
+	"""
+	Account for size more bytes received for the resource type received, e.g. from a streamed
+	body read after its request was accounted for.
+	"""
+
+	with _lock:
+		_metrics['bytes'][resource] = _metrics['bytes'].get( resource, 0 ) + size
+
+	return True
+
+def expect( count ):
+	"""
+	Add the number of requests received to the total expected in this run. Used to calculate the ETA.
+	"""
+
+	with _lock:
+		_metrics['expected'] += count
+
+	return True
+
+def set_concurrency( workers ):
+	"""
+	Set the number of workers currently sending requests to the cluster.
+	"""
+
+	with _lock:
+		_metrics['concurrency'] = workers
+
+	return True
+
+def token_refreshed():
+	"""
+	Account for a new authentication token obtained from the cluster.
+	"""
+
+	with _lock:
+		_metrics['token_refreshes'] += 1
+
+	return True
+
+def progress():
+	"""
+	Returns a tuple with the number of requests completed and expected in this run.
+	"""
+
+	with _lock:
+		return ( sum( _metrics['completed'].values() ), _metrics['expected'] )
+
+def snapshot():
+	"""
+	Returns a copy of all the counters and gauges as a dictionary, with the elapsed time
+	of the run under 'elapsed' and the slowest requests sorted from slowest to fastest.
+	"""
+
+	with _lock:
+		copy = {
+			key: ( dict( value ) if isinstance( value, dict ) else value )
+			for key, value in _metrics.items()
+		}
+		copy['slowest'] = sorted( _metrics['slowest'], reverse=True )
+	copy['elapsed'] = time.time() - copy['start_time']
+
+	return copy
+
+def render():
+	"""
+	Render the current metrics in Prometheus text exposition format.
+	Returns the metrics as a string.
+	"""
+
+	with _lock:
+		elapsed = time.time() - _metrics['start_time']
+		completed = dict( _metrics['completed'] )
+		errors = dict( _metrics['errors'] )
+		in_flight = _metrics['in_flight']
+		expected = _metrics['expected']
+		concurrency = _metrics['concurrency']
+		token_refreshes = _metrics['token_refreshes']
+
+	total = sum( completed.values() )
+	#ETA is only known once the number of expected requests has been announced
+	if expected > total and total > 0:
+		eta = ( expected - total ) * elapsed / total
+	else:
+		eta = 0
+
+	lines = [
+		'# HELP dcos_saver_requests_in_flight Requests sent to the cluster and not yet answered.',
+		'# TYPE dcos_saver_requests_in_flight gauge',
+		'dcos_saver_requests_in_flight {0}'.format( in_flight ),
+		'# HELP dcos_saver_requests_completed_total Requests answered by the cluster, per resource type and HTTP status.',
+		'# TYPE dcos_saver_requests_completed_total counter'
+	]
+	for ( resource, status ), count in sorted( completed.items() ):
+		lines.append( 'dcos_saver_requests_completed_total{{resource="{0}",status="{1}"}} {2}'.format( resource, status, count ) )
+	lines.extend( [
+		'# HELP dcos_saver_request_errors_total Requests that failed, per resource type.',
+		'# TYPE dcos_saver_request_errors_total counter'
+	] )
+	for resource, count in sorted( errors.items() ):
+		lines.append( 'dcos_saver_request_errors_total{{resource="{0}"}} {1}'.format( resource, count ) )
+	lines.extend( [
+		'# HELP dcos_saver_concurrency Workers currently sending requests to the cluster.',
+		'# TYPE dcos_saver_concurrency gauge',
+		'dcos_saver_concurrency {0}'.format( concurrency ),
+		'# HELP dcos_saver_token_refreshes_total Authentication tokens obtained from the cluster.',
+		'# TYPE dcos_saver_token_refreshes_total counter',
+		'dcos_saver_token_refreshes_total {0}'.format( token_refreshes ),
+		'# HELP dcos_saver_requests_expected Requests expected in this run.',
+		'# TYPE dcos_saver_requests_expected gauge',
+		'dcos_saver_requests_expected {0}'.format( expected ),
+		'# HELP dcos_saver_elapsed_seconds Seconds since the start of this run.',
+		'# TYPE dcos_saver_elapsed_seconds gauge',
+		'dcos_saver_elapsed_seconds {0:.3f}'.format( elapsed ),
+		'# HELP dcos_saver_eta_seconds Estimated seconds until the expected requests are completed.',
+		'# TYPE dcos_saver_eta_seconds gauge',
+		'dcos_saver_eta_seconds {0:.3f}'.format( eta )
+	] )
+
+	return '\n'.join( lines )+'\n'
+
+class _MetricsHandler( BaseHTTPRequestHandler ):
+	"""
+	Answer GET requests on the metrics path with the current metrics.
+	"""
+
+	def do_GET( self ):
+		if self.path.split( '?' )[0] != env.METRICS_PATH:
+			self.send_error( 404 )
+			return
+		body = render().encode( 'utf-8' )
+		self.send_response( 200 )
+		self.send_header( 'Content-Type', 'text/plain; version=0.0.4; charset=utf-8' )
+		self.send_header( 'Content-Length', str( len( body ) ) )
+		self.end_headers()
+		self.wfile.write( body )
+
+	def log_message( self, format, *args ):
+		#scrapes must not interfere with the program output
+		pass
+
+class _MetricsServer( ThreadingMixIn, HTTPServer ):
+	daemon_threads = True
+
+def start_metrics_server( port ):
+	"""
+	Start a local HTTP listener exposing the metrics on the port received, in a background thread.
+	A port of 0 (or None) leaves the listener disabled.
+	Returns True if the listener is running.
+	"""
+
+	global _server
+
+	if not port or _server:
+		return bool( _server )
+	_server = _MetricsServer( ( env.METRICS_ADDRESS, int( port ) ), _MetricsHandler )
+	thread = threading.Thread( target=_server.serve_forever, name='metrics', daemon=True )
+	thread.start()
+
+	return True
+
+def stop_metrics_server():
+	"""
+	Stop the local HTTP listener if it is running.
+	"""
+
+	global _server
+
+	if _server:
+		_server.shutdown()
+		_server.server_close()
+		_server = None
+
+	return True
+
+reset()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+#
+# migrate.py: copy the IAM configuration of a DC/OS cluster straight into another one
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Instead of a full GET into the buffer followed by a full RESTORE, entities are
+# piped from the source cluster to the target cluster through a bounded queue:
+# a pool of readers crawls the source (users, groups and ACLs first, then the
+# members of every group and the grants of every ACL) while a pool of writers
+# PUTs what has been read to the target, so reads and writes overlap and nothing
+# is written to disk. Memberships and grants need their users, groups and ACLs:
+# writers hold them back until every user, group and ACL has been written.
+# The queue being bounded, readers never get more than MIGRATE_QUEUE_SIZE
+# entities ahead of the writers.
+#
+# LDAP users and groups are not created, as they are imported from the directory.
+
+#reference:
+#https://docs.mesosphere.com/1.8/administration/id-and-access-mgt/iam-api/
+
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import helpers			#helper functions in separate module helpers.py
+import metrics			#run metrics
+import run_summary		#per-run summary report
+import cluster_state	#read the configuration of a running cluster
+
+#entities written first, and the list each of them is read from
+FIRST_WAVE = [
+	( 'users', '/acs/api/v1/users', 'uid' ),
+	( 'groups', '/acs/api/v1/groups', 'gid' ),
+	( 'acls', '/acs/api/v1/acls', 'rid' )
+]
+
+class Wave( object ):
+	"""
+	Count the entities of the first wave still to be written, and release the second
+	wave once the first one is complete, i.e. sealed and with nothing pending.
+	"""
+
+	def __init__( self ):
+		self.lock = threading.Lock()
+		self.pending = 0
+		self.sealed = False
+		self.done = threading.Event()
+
+	def queued( self ):
+		with self.lock:
+			self.pending += 1
+
+	def written( self ):
+		with self.lock:
+			self.pending -= 1
+			self._check()
+
+	def seal( self ):
+		with self.lock:
+			self.sealed = True
+			self._check()
+
+	def _check( self ):
+		if self.sealed and not self.pending:
+			self.done.set()
+
+def entity_request( item, default_password ):
+	"""
+	Build the PUT that creates the entity received (a tuple as read by read_source) in the target cluster.
+	Returns a tuple ( api_endpoint, data or None ).
+	"""
+
+	kind = item[0]
+	if kind == 'users':
+		return '/acs/api/v1/users/'+helpers.escape( item[1]['uid'] ), { 'description': item[1]['description'], 'password': default_password }
+	if kind == 'groups':
+		return '/acs/api/v1/groups/'+helpers.escape( item[1]['gid'] ), { 'description': item[1]['description'] }
+	if kind == 'acls':
+		return '/acs/api/v1/acls/'+helpers.escape( item[1]['rid'] ), { 'description': item[1]['description'] }
+	if kind == 'memberships':
+		#PUT /groups/{gid}/users/{uid}
+		return '/acs/api/v1/groups/'+helpers.escape( item[1] )+'/users/'+helpers.escape( item[2] ), None
+	#grants: PUT /acls/{rid}/<users|groups>/{id}/{action}
+	return '/acs/api/v1/acls/'+helpers.escape( item[1] )+'/'+item[2]+'/'+helpers.escape( item[3] )+'/'+item[4], None
+
+def write_entity( target, item, default_password ):
+	"""
+	PUT the entity received to the target cluster. An entity that already exists (409) is not a failure.
+	Returns True if the entity is in the target cluster.
+	"""
+
+	api_endpoint, data = entity_request( item, default_password )
+	headers = {
+		'Content-type': 'application/json',
+		'Authorization': 'token='+target['TOKEN'],
+	}
+	try:
+		request = helpers.send_request(
+			'PUT',
+			'http://'+target['DCOS_IP']+api_endpoint,
+			item[0],
+			headers=headers,
+			data=codec.dumps( data ) if data is not None else None
+			)
+		request.raise_for_status()
+	except requests.exceptions.HTTPError as error:
+		if request.status_code == 409:
+			return True
+		helpers.log(
+			log_level='ERROR',
+			operation='PUT',
+			objects=[item[0], api_endpoint],
+			indx=0,
+			content=request.text
+			)
+		return False
+
+	return True
+
+def read_source( source, entities, wave, max_workers ):
+	"""
+	Crawl the IAM configuration of the source cluster and put every entity in the queue received:
+	first users, groups and ACLs, then, with max_workers requests at once, the members of every group
+	and the grants of every ACL. Remote (LDAP) users and groups, their memberships and grants are skipped.
+	Returns the number of entities read by kind, and under 'unreadable' the number of lists that couldn't be read.
+	"""
+
+	counts = { 'unreadable': 0 }
+	counts_lock = threading.Lock()
+
+	def fetch( api_endpoint, resource ):
+		#a request that couldn't even be sent (e.g. ConnectionError) is as unreadable as an error status
+		try:
+			return cluster_state.fetch( source, api_endpoint, resource )
+		except requests.exceptions.RequestException as error:
+			helpers.log(
+				log_level='ERROR',
+				operation='GET',
+				objects=[resource, api_endpoint],
+				indx=0,
+				content=repr( error )
+				)
+			return False
+
+	def put( item ):
+		if item[0] in ( 'users', 'groups', 'acls' ):
+			wave.queued()
+		with counts_lock:
+			counts[ item[0] ] = counts.get( item[0], 0 ) + 1
+		entities.put( item )
+
+	gids, rids, remote = [], [], set()
+	try:
+		with ThreadPoolExecutor( max_workers=max_workers ) as executor:
+			lists = executor.map( lambda first: fetch( first[1], first[0] ), FIRST_WAVE )
+			for ( kind, api_endpoint, id_key ), body in zip( FIRST_WAVE, lists ):
+				if not body:
+					helpers.log(
+						log_level='ERROR',
+						operation='GET',
+						objects=[kind],
+						indx=0,
+						content='Could not be read from the source cluster'
+						)
+					counts['unreadable'] += 1
+					continue
+				for entity in body.get( 'array', [] ):
+					if helpers.is_remote( entity ):
+						remote.add( ( kind, entity[id_key] ) )
+						continue
+					put( ( kind, entity ) )
+					if kind == 'groups':
+						gids.append( entity['gid'] )
+					elif kind == 'acls':
+						rids.append( entity['rid'] )
+		wave.seal()
+
+		def crawl( kind, entity_id ):
+			if kind == 'memberships':
+				body = fetch( '/acs/api/v1/groups/'+helpers.escape( entity_id )+'/users', 'groups_users' )
+				for membership in ( body or {} ).get( 'array', [] ):
+					if ( 'users', membership['user']['uid'] ) not in remote:
+						put( ( 'memberships', entity_id, membership['user']['uid'] ) )
+			else:
+				body = fetch( '/acs/api/v1/acls/'+helpers.escape( entity_id )+'/permissions', 'acls_permissions' )
+				for principals, id_key in ( ( 'users', 'uid' ), ( 'groups', 'gid' ) ):
+					for principal in ( body or {} ).get( principals, [] ):
+						if ( principals, principal[id_key] ) in remote:
+							continue
+						for action in principal.get( 'actions', [] ):
+							put( ( 'grants', entity_id, principals, principal[id_key], action['name'] ) )
+			return body is not False
+
+		with ThreadPoolExecutor( max_workers=max_workers ) as executor:
+			crawled = list( executor.map( crawl, [ 'memberships' ]*len( gids )+[ 'grants' ]*len( rids ), gids+rids ) )
+		counts['unreadable'] += crawled.count( False )
+	finally:
+		#never leave the writers waiting
+		wave.seal()
+
+	return counts
+
+def migrate( source, target, queue_size=env.MIGRATE_QUEUE_SIZE, readers=env.MIGRATE_READ_WORKERS, writers=env.MIGRATE_WRITE_WORKERS ):
+	"""
+	Copy the IAM configuration of the source cluster into the target cluster (both configs with 'DCOS_IP'
+	and a valid 'TOKEN'), with the readers and writers received running at once around a queue of queue_size.
+	Returns a dictionary with the entities 'read', 'written' and 'failed' by kind and the 'read_seconds' and 'seconds' taken.
+	"""
+
+	entities = queue.Queue( maxsize=queue_size )
+	wave = Wave()
+	written, failed = {}, {}
+	counts_lock = threading.Lock()
+
+	def write():
+		while True:
+			item = entities.get()
+			if item is None:
+				return
+			if item[0] not in ( 'users', 'groups', 'acls' ):
+				wave.done.wait()
+			ok = False
+			try:
+				ok = write_entity( target, item, target['DEFAULT_USER_PASSWORD'] )
+			except Exception as error:
+				#any failure (unreachable target, malformed entity...) only fails this entity
+				helpers.log(
+					log_level='ERROR',
+					operation='PUT',
+					objects=[item[0]],
+					indx=0,
+					content=repr( error )
+					)
+			finally:
+				with counts_lock:
+					totals = written if ok else failed
+					totals[ item[0] ] = totals.get( item[0], 0 ) + 1
+				#the second wave waits for every entity of the first one, written or not
+				if item[0] in ( 'users', 'groups', 'acls' ):
+					wave.written()
+
+	start = time.time()
+	metrics.set_concurrency( readers+writers )
+	writer_threads = [ threading.Thread( target=write ) for _ in range( writers ) ]
+	for thread in writer_threads:
+		thread.start()
+	try:
+		read = read_source( source, entities, wave, readers )
+	finally:
+		read_seconds = time.time() - start
+		for _ in writer_threads:
+			entities.put( None )
+		for thread in writer_threads:
+			thread.join()
+	metrics.set_concurrency( 1 )
+
+	return {
+		'read':			read,
+		'written':		written,
+		'failed':		failed,
+		'read_seconds':	round( read_seconds, 3 ),
+		'seconds':		round( time.time() - start, 3 )
+	}
+
+def migrate_cluster ( DCOS_IP ):
+	"""
+	Copy the users, groups, ACLs, memberships and grants of the DC/OS cluster at DCOS_IP straight
+	into another cluster, without going through the buffer.
+	Returns True if every entity read was written.
+	"""
+
+	source = helpers.get_config( env.CONFIG_FILE )
+	target = cluster_state.other_cluster()
+	if target is None:
+		helpers.pause()
+		return False
+	target['DEFAULT_USER_PASSWORD'] = source['DEFAULT_USER_PASSWORD']
+
+	metrics.reset()
+	result = migrate( source, target )
+	for kind in sorted( result['read'] ):
+		if kind == 'unreadable':
+			if result['read'][kind]:
+				helpers.log(
+					log_level='ERROR',
+					operation='MIGRATE',
+					objects=[kind],
+					indx=result['read'][kind],
+					content='{0} lists could not be read from the source cluster'.format( result['read'][kind] )
+					)
+			continue
+		helpers.log(
+			log_level='ERROR' if result['failed'].get( kind ) else 'INFO',
+			operation='MIGRATE',
+			objects=[kind],
+			indx=result['read'][kind],
+			content='{0} read, {1} written, {2} failed'.format( result['read'][kind], result['written'].get( kind, 0 ), result['failed'].get( kind, 0 ) )
+			)
+	helpers.log(
+		log_level='INFO',
+		operation='MIGRATE',
+		objects=[DCOS_IP, target['DCOS_IP']],
+		indx=0,
+		content='Read in {0}s, migrated in {1}s'.format( result['read_seconds'], result['seconds'] )
+		)
+	run_summary.write_run_summary( 'MIGRATE' )
+	helpers.pause()
+
+	return not result['failed'] and not result['read'].get( 'unreadable' )
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+#
+# normalize.py: normalized form of the configuration of a cluster, for comparisons
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# The same configuration looks different depending on where it comes from: ids
+# are saved escaped in the buffer, lists come in any order, and responses carry
+# URLs and other fields that are not part of the configuration. Reduce it to a
+# state of { resource: { id: value } } holding only what a restore sets, so that
+# the buffer and a live cluster (or two clusters) can be compared id by id
+# through the digests of their values.
+
+import os
+import env				#environment variables and constants
+import indexes			#inverted indexes over the ACLs, users and groups in the buffer
+import buffer_stream	#stream the records of a buffer file one at a time
+import service_group_hashes	#Merkle hashes of a Marathon service group tree
+
+#resources of a normalized state, in the order they are compared
+RESOURCES = [ 'users', 'groups', 'memberships', 'acls', 'grants', 'service_groups' ]
+
+def users( records ):
+	"""
+	Normalize a list of users: uid : description.
+	"""
+
+	return { indexes.unescape( user['uid'] ): user.get( 'description', '' ) for user in records }
+
+def groups( records ):
+	"""
+	Normalize a list of groups: gid : description.
+	"""
+
+	return { indexes.unescape( group['gid'] ): group.get( 'description', '' ) for group in records }
+
+def acls( records ):
+	"""
+	Normalize a list of ACLs: rid : description.
+	"""
+
+	return { indexes.unescape( acl['rid'] ): acl.get( 'description', '' ) for acl in records }
+
+def memberships( memberships_list ):
+	"""
+	Normalize the groups of a user (a list of { 'group': { 'gid' } }): sorted list of gids.
+	"""
+
+	return sorted( indexes.unescape( membership['group']['gid'] ) for membership in memberships_list )
+
+def grants( permissions ):
+	"""
+	Normalize the permissions of an ACL (with 'users' and 'groups' lists): sorted list of '<user|group>:<id>:<action>'.
+	"""
+
+	return sorted(
+		kind[:-1]+':'+indexes.unescape( principal[id_key] )+':'+action['name']
+		for kind, id_key in ( ( 'users', 'uid' ), ( 'groups', 'gid' ) )
+		for principal in permissions.get( kind, [] )
+		for action in principal.get( 'actions', [] )
+	)
+
+def service_groups( hashes, apps=True ):
+	"""
+	Normalize the hashes of a service group tree (as returned by service_group_hashes.hash_service_groups):
+	group id : [ hash of the group's own fields, sorted ( app id, app hash ) ], without the apps if apps is False.
+	"""
+
+	return { group_id: [ group['node'], sorted( group['apps'].items() ) if apps else [] ] for group_id, group in hashes.items() }
+
+def digest( value ):
+	"""
+	Returns the digest of a normalized value.
+	"""
+
+	return service_group_hashes.hash_object( value )
+
+def buffer_state( apps=True ):
+	"""
+	Build the normalized state of the configuration in the buffer, streaming its files.
+	Resources whose files are not in the buffer are left out, and the apps of service groups if apps is False.
+	Returns the state as a dictionary of resource : { id : value }.
+	"""
+
+	records = buffer_stream.iter_records
+	state = {}
+	for resource, path, normalize in (
+		( 'users', env.USERS_FILE, users ),
+		( 'groups', env.GROUPS_FILE, groups ),
+		( 'acls', env.ACLS_FILE, acls )
+	):
+		if os.path.exists( path ):
+			state[resource] = normalize( records( path ) )
+	if os.path.exists( env.USERS_GROUPS_FILE ):
+		state['memberships'] = {
+			indexes.unescape( user['uid'] ): memberships( user.get( 'groups', [] ) )
+			for user in records( env.USERS_GROUPS_FILE )
+		}
+	if os.path.exists( env.ACLS_PERMISSIONS_FILE ):
+		state['grants'] = { indexes.unescape( acl['rid'] ): grants( acl ) for acl in records( env.ACLS_PERMISSIONS_FILE ) }
+	hashes = service_group_hashes.load_service_groups_hashes( env.SERVICE_GROUPS_FILE, env.SERVICE_GROUPS_HASHES_FILE )
+	if hashes is not None:
+		state['service_groups'] = service_groups( hashes, apps )
+
+	return state
+
+def compare_states( expected, actual, only_expected=True ):
+	"""
+	Compare two normalized states id by id through the digests of their values.
+	Yields a dictionary { 'resource', 'id', 'problem' } for every id that is 'missing' from actual
+	or 'different', and unless only_expected is True, also those 'extra' in actual.
+	Resources missing from either state are not compared.
+	"""
+
+	for resource in RESOURCES:
+		if resource not in expected or resource not in actual:
+			continue
+		old, new = expected[resource], actual[resource]
+		for entity_id in sorted( old ):
+			if entity_id not in new:
+				yield { 'resource': resource, 'id': entity_id, 'problem': 'missing' }
+			elif digest( old[entity_id] ) != digest( new[entity_id] ):
+				yield { 'resource': resource, 'id': entity_id, 'problem': 'different' }
+		if not only_expected:
+			for entity_id in sorted( set( new )-set( old ) ):
+				yield { 'resource': resource, 'id': entity_id, 'problem': 'extra' }
@@ -16,9 +16,10 @@
 import sys
 import os
 import requests
-import json
 import env        #environment variables and constants
+import codec        #JSON encoding and decoding
 import helpers      #helper functions in separate module helpers.py
+import metrics      #run metrics
 
 def post_acls ( DCOS_IP ):
 	"""
@@ -27,6 +28,7 @@ def post_acls ( DCOS_IP ):
 	"""	
 
 	config = helpers.get_config( env.CONFIG_FILE )	
+	failed = False
 	try:  	
 		#open the ACLS file and load the LIST of acls from JSON
 		acls_file = open( env.ACLS_FILE, 'r' )
@@ -48,11 +50,12 @@ def post_acls ( DCOS_IP ):
 		return False
 
 	#load entire text file and convert to JSON - dictionary
-	acls = json.loads( acls_file.read() )
+	acls = codec.loads( acls_file.read() )
 	acls_file.close()
 
 	#loop through the list of ACL Rules and
 	#PUT /acls/{rid}
+	metrics.expect( len( acls['array'] ) )
 	for index, acl in ( enumerate( acls['array'] ) ): 
 
 		rid = helpers.escape( acl['rid'] )
@@ -68,10 +71,12 @@ def post_acls ( DCOS_IP ):
 		}
 		#send the request to PUT the new USER
 		try:
-			request = requests.put(
+			request = helpers.send_request(
+			'PUT',
 			url,
+			'acls',
 		 	headers = headers,
-		 	data = json.dumps( data )
+		 	data = codec.dumps( data )
 			)
 			request.raise_for_status()
 			#show progress after request
@@ -83,6 +88,9 @@ def post_acls ( DCOS_IP ):
 				content=request.status_code
 				)
 		except requests.exceptions.HTTPError as error:
+			#409: already exists in the cluster, not a failure
+			if request.status_code != 409:
+				failed = True
 			helpers.log(
 				log_level='ERROR',
 				operation='PUT',
@@ -91,9 +99,9 @@ def post_acls ( DCOS_IP ):
 				content=request.text
 				)
 
-	helpers.get_input( message=env.MSG_PRESS_ENTER )
+	helpers.pause()
 
-	return True
+	return not failed
 
 def post_acls_permissions( DCOS_IP, acls ):
 	"""
@@ -105,6 +113,7 @@ def post_acls_permissions( DCOS_IP, acls ):
 	#/acls/{rid}/users/{uid}/{action}
 
 	config = helpers.get_config( env.CONFIG_FILE )
+	failed = False
 	try:  	
 		#open the GROUPS file and load the LIST of groups from JSON
 		acls_permissions_file = open( env.ACLS_PERMISSIONS_FILE, 'r' )
@@ -123,13 +132,16 @@ def post_acls_permissions( DCOS_IP, acls ):
 			indx=0,
 			content=request.text
 			)
-		helpers.get_input( message=env.MSG_PRESS_ENTER )
+		helpers.pause()
 		return False
 
 	#load entire text file and convert to JSON - dictionary
-	acls_permissions = json.loads( acls_permissions_file.read() )
+	acls_permissions = codec.loads( acls_permissions_file.read() )
 	acls_permissions_file.close()
 
+	metrics.expect( sum( len( principal['actions'] )
+		for acl_permission in acls_permissions['array']
+		for principal in acl_permission.get( 'users', [] )+acl_permission.get( 'groups', [] ) ) )
 	for index, acl_permission in ( enumerate( acls_permissions['array'] ) ): 
 		rid = helpers.escape( acl_permission['rid'] )	
 
@@ -152,8 +164,10 @@ def post_acls_permissions( DCOS_IP, acls ):
 					}
 					#send the request to PUT the new USER
 					try:
-						request = requests.put(
+						request = helpers.send_request(
+						'PUT',
 						url,
+						'acls_permissions',
 						headers = headers
 						)
 						request.raise_for_status()
@@ -166,6 +180,9 @@ def post_acls_permissions( DCOS_IP, acls ):
 							content=request.status_code
 							)	
 					except requests.exceptions.HTTPError as error:
+						#409: already exists in the cluster, not a failure
+						if request.status_code != 409:
+							failed = True
 						helpers.log(
 							log_level='ERROR',
 							operation='PUT',
@@ -195,8 +212,10 @@ def post_acls_permissions( DCOS_IP, acls ):
 					}
 					#send the request to PUT the new USER
 					try:
-						request = requests.put(
+						request = helpers.send_request(
+						'PUT',
 						url,
+						'acls_permissions',
 						headers = headers
 						)
 						request.raise_for_status()
@@ -209,6 +228,9 @@ def post_acls_permissions( DCOS_IP, acls ):
 							content=request.status_code
 							)	
 					except requests.exceptions.HTTPError as error:
+						#409: already exists in the cluster, not a failure
+						if request.status_code != 409:
+							failed = True
 						helpers.log(
 							log_level='ERROR',
 							operation='PUT',
@@ -226,7 +248,7 @@ def post_acls_permissions( DCOS_IP, acls ):
 		indx=0,
 		content=env.MSG_DONE
 		)
-	helpers.get_input( message=env.MSG_PRESS_ENTER )
+	helpers.pause()
 
-	return True
+	return not failed
 
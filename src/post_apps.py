@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#
+# post_apps.py: load from file and restore Marathon apps and pods to a DC/OS cluster
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Post a set of app and pod definitions to a running DC/OS cluster, read from a file 
+# where they're stored in raw JSON format as received from the accompanying
+# "get_apps.py" script. Service groups should be restored first.
+
+#reference:
+#https://mesosphere.github.io/marathon/docs/rest-api.html#put-v2-apps-appid
+#https://mesosphere.github.io/marathon/docs/generated/api.html#v2_pods__id__put
+
+import sys
+import os
+import requests
+import env        #environment variables and constants
+import codec        #JSON encoding and decoding
+import helpers      #helper functions in separate module helpers.py
+import metrics      #run metrics
+import scheduler    #concurrent requests
+from post_service_groups import wait_for_deployments
+
+def post_apps ( DCOS_IP ):
+	""" 
+	Get the app and pod definitions from the buffer and PUT them concurrently
+	to a DC/OS cluster available at the DCOS_IP argument, then wait for the
+	deployments they triggered.
+	"""
+
+	config = helpers.get_config( env.CONFIG_FILE )
+	try:
+		apps_file = open( env.APPS_FILE, 'r' )
+	except IOError as error:
+		helpers.log(
+			log_level='ERROR',
+			operation='LOAD',
+			objects=['Apps'],
+			indx=0,
+			content=env.MSG_ERROR_NO_APPS
+			)
+		helpers.pause()
+		return False
+
+	#load entire text file and convert to JSON - dictionary
+	apps = codec.loads( apps_file.read() )
+	apps_file.close()
+
+	headers = {
+		'Content-type': 'application/json',
+		'Authorization': 'token='+config['TOKEN'],
+	}
+
+	def put_definition( index, item ):
+		"""
+		PUT /v2/apps/{id} or /v2/pods/{id}, which create or update the app/pod.
+		Returns the list of deployments triggered, or False if the request failed.
+		"""
+		api_endpoint, definition = item
+		url = 'http://'+config['DCOS_IP']+api_endpoint+definition['id']
+		try:
+			request = helpers.send_request(
+				'PUT',
+				url,
+				'apps',
+				headers = headers,
+				data = codec.dumps( helpers.format_app( definition ) )
+			)
+			request.raise_for_status()
+			helpers.log(
+				log_level='INFO',
+				operation='PUT',
+				objects=['Apps: '+definition['id']],
+				indx=index,
+				content=request.status_code
+				)
+		except requests.exceptions.HTTPError as error:
+			helpers.log(
+				log_level='ERROR',
+				operation='PUT',
+				objects=['Apps: '+definition['id']],
+				indx=index,
+				content=request.text
+				)
+			return False
+		#updates answer with a deploymentId, creations with the app and its deployments,
+		#and pods with the deployment in a header
+		response = codec.loads( request.content )
+		if 'deploymentId' in response:
+			deployments = [ response['deploymentId'] ]
+		elif request.headers.get( 'Marathon-Deployment-Id' ):
+			deployments = [ request.headers['Marathon-Deployment-Id'] ]
+		else:
+			deployments = []
+		deployments.extend( deployment['id'] for deployment in response.get( 'deployments', [] ) )
+		return deployments
+
+	items = [ ( '/marathon/v2/apps', app ) for app in apps['apps'] ]
+	items += [ ( '/marathon/v2/pods', pod ) for pod in apps['pods'] ]
+	metrics.expect( len( items ) )
+	results = scheduler.run_concurrently( put_definition, items )
+	failed = any( result is False for result in results )
+	deployments = [ deployment for result in results if result for deployment in result ]
+	if deployments and not wait_for_deployments( config, deployments ):
+		failed = True
+
+	helpers.log(
+		log_level='INFO',
+		operation='PUT',
+		objects=['Apps'],
+		indx=0,
+		content=env.MSG_DONE
+		)
+	helpers.pause()
+
+	return not failed
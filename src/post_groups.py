@@ -14,9 +14,10 @@
 import sys
 import os
 import requests
-import json
 import env        #environment variables and constants
+import codec        #JSON encoding and decoding
 import helpers      #helper functions in separate module helpers.py
+import metrics      #run metrics
 
 def post_groups ( DCOS_IP ):
 	""" 
@@ -25,6 +26,7 @@ def post_groups ( DCOS_IP ):
 	"""
 
 	config = helpers.get_config( env.CONFIG_FILE )
+	failed = False
 	try:  	
 		#open the GROUPS file and load the LIST of groups from JSON
 		groups_file = open( env.GROUPS_FILE, 'r' )
@@ -46,13 +48,17 @@ def post_groups ( DCOS_IP ):
 		return False
 
 	#load entire text file and convert to JSON - dictionary
-	groups = json.loads( groups_file.read() )
+	groups = codec.loads( groups_file.read() )
 	groups_file.close()
 
 	#loop through the list of groups and
 	#PUT /groups/{gid}
+	metrics.expect( len( groups['array'] ) )
 	for index, group in ( enumerate( groups['array'] ) ): 
 
+		#LDAP groups are imported from the directory by post_ldap
+		if helpers.is_remote( group ):
+			continue
 		gid = helpers.escape( group['gid'] )
 		#build the request
 		api_endpoint = '/acs/api/v1/groups/'+gid
@@ -66,10 +72,12 @@ def post_groups ( DCOS_IP ):
 		}
 		#send the request to PUT the new GROUP
 		try:
-			request = requests.put(
+			request = helpers.send_request(
+				'PUT',
 				url,
+				'groups',
 				headers = headers,
-				data = json.dumps( data )
+				data = codec.dumps( data )
 			)
 			request.raise_for_status()
 			#show progress after request
@@ -81,6 +89,9 @@ def post_groups ( DCOS_IP ):
 				content=request.status_code
 				)
 		except requests.exceptions.HTTPError as error:
+			#409: already exists in the cluster, not a failure
+			if request.status_code != 409:
+				failed = True
 			helpers.log(
 				log_level='ERROR',
 				operation='PUT',
@@ -89,9 +100,9 @@ def post_groups ( DCOS_IP ):
 				content=request.text
 				)
 
-	helpers.get_input( message=env.MSG_PRESS_ENTER )
+	helpers.pause()
 
-	return True
+	return not failed
 	
 
 def post_groups_users( DCOS_IP, groups ):
@@ -101,6 +112,7 @@ def post_groups_users( DCOS_IP, groups ):
 	"""
 
 	config = helpers.get_config( env.CONFIG_FILE )
+	failed = False
 	try:  	
 		#open the GROUPS file and load the LIST of groups from JSON
 		groups_users_file = open( env.GROUPS_USERS_FILE, 'r' )
@@ -119,13 +131,14 @@ def post_groups_users( DCOS_IP, groups ):
 			indx=0,
 			content=request.text
 			)
-		helpers.get_input( message=env.MSG_PRESS_ENTER )
+		helpers.pause()
 		return False
 
 	#load entire text file and convert to JSON - dictionary
-	groups_users = json.loads( groups_users_file.read() )
+	groups_users = codec.loads( groups_users_file.read() )
 	groups_users_file.close()
 
+	metrics.expect( sum( len( group_user['users'] ) for group_user in groups_users['array'] ) )
 	for index, group_user in ( enumerate( groups_users['array'] ) ): 
 		#PUT /groups/{gid}/users/{uid}
 		gid = helpers.escape( group_user['gid'] )	
@@ -143,8 +156,10 @@ def post_groups_users( DCOS_IP, groups ):
 			}
 			#send the request to PUT the new USER
 			try:
-				request = requests.put(
+				request = helpers.send_request(
+					'PUT',
 					url,
+					'groups_users',
 					headers = headers
 				)
 				request.raise_for_status()
@@ -157,6 +172,9 @@ def post_groups_users( DCOS_IP, groups ):
 					content=request.status_code
 					)	
 			except requests.exceptions.HTTPError as error:
+				#409: already exists in the cluster, not a failure
+				if request.status_code != 409:
+					failed = True
 				helpers.log(
 					log_level='ERROR',
 					operation='PUT',
@@ -173,7 +191,7 @@ def post_groups_users( DCOS_IP, groups ):
 		content=env.MSG_DONE
 		)
 
-	helpers.get_input( message=env.MSG_PRESS_ENTER )
+	helpers.pause()
 
-	return True	
+	return not failed
 
@@ -7,24 +7,32 @@
 # Post LDAP configuration to a running DC/OS cluster, read from a file 
 # where it's stored in raw JSON format as received from the accompanying
 # "get_ldap" script.
+# Then import the remote (LDAP) users and groups found in the buffer from
+# the directory, concurrently.
 
 #reference:
 #https://docs.mesosphere.com/1.8/administration/id-and-access-mgt/iam-api/#!/ldap/put_ldap_config
+#https://docs.mesosphere.com/1.8/administration/id-and-access-mgt/iam-api/#!/ldap/post_ldap_importuser
+#https://docs.mesosphere.com/1.8/administration/id-and-access-mgt/iam-api/#!/ldap/post_ldap_importgroup
 
 import sys
 import os
 import requests
-import json
 import env        #environment variables and constants
+import codec        #JSON encoding and decoding
 import helpers      #helper functions in separate module helpers.py
+import metrics      #run metrics
+import scheduler    #concurrent requests
 
 def post_ldap ( DCOS_IP ):
   """ 
   Get the LDAP configuration from the buffer,
   and post it to a DC/OS cluster available at the DCOS_IP argument.
+  Once the directory is configured, import the remote users and groups from it.
   """ 
 
   config = helpers.get_config( env.CONFIG_FILE )
+  failed = False
   try:  
     #open the LDAP file and load the LDAP configuration from JSON
     ldap_file = open( env.LDAP_FILE, 'r' )
@@ -46,7 +54,7 @@ def post_ldap ( DCOS_IP ):
     return False
 
   #load entire text file and convert to JSON - dictionary
-  ldap_config = json.loads( ldap_file.read() )
+  ldap_config = codec.loads( ldap_file.read() )
   ldap_file.close()
 
   #build the request
@@ -59,10 +67,12 @@ def post_ldap ( DCOS_IP ):
   data = ldap_config
   #send the request to PUT the LDAP configuration
   try:
-    request = requests.put(
+    request = helpers.send_request(
+      'PUT',
       url,
+      'ldap',
       headers = headers,
-      data = json.dumps( data )
+      data = codec.dumps( data )
     )
     request.raise_for_status()
     #show progress after request
@@ -74,6 +84,7 @@ def post_ldap ( DCOS_IP ):
       content=request.status_code
     )
   except requests.exceptions.HTTPError as error:
+      failed = True
       helpers.log(
         log_level='ERROR',
         operation='PUT',
@@ -82,13 +93,102 @@ def post_ldap ( DCOS_IP ):
         content=request.status_code
         )
 
+  if not failed and not import_ldap_entities( config ):
+    failed = True
+
   helpers.log(
     log_level='INFO',
     operation='PUT',
-    objects=['Users'],
+    objects=['LDAP'],
     indx=0,
     content=env.MSG_DONE
     )
 
-  helpers.get_input( message=env.MSG_PRESS_ENTER )
-  return True
+  helpers.pause()
+  return not failed
+
+def load_remote_entities ( path, key ):
+  """
+  Load the users or groups file in path from the buffer, and return the list of ids
+  (under 'key', i.e. 'uid' or 'gid') of those that are remote, or an empty list if the
+  file isn't in the buffer.
+  """
+
+  try:
+    with open( path, 'r' ) as entities_file:
+      entities = codec.loads( entities_file.read() )
+  except IOError:
+    return []
+
+  return [ entity[key] for entity in entities['array'] if helpers.is_remote( entity ) ]
+
+def import_ldap_entities ( config ):
+  """
+  Import the remote groups and users in the buffer from the directory configured in the
+  DC/OS cluster in 'config', sending the requests concurrently. Groups are imported with their
+  members. An entity that already exists in the cluster (409) counts as imported.
+  Save the result of every import to env.LDAP_IMPORT_FILE.
+  Returns True if all entities were imported.
+  """
+
+  headers = {
+  'Content-type': 'application/json',
+  'Authorization': 'token='+config['TOKEN'],
+  }
+  items = [ ( 'group', gid ) for gid in load_remote_entities( env.GROUPS_FILE, 'gid' ) ]
+  items += [ ( 'user', uid ) for uid in load_remote_entities( env.USERS_FILE, 'uid' ) ]
+
+  def import_entity( index, item ):
+    kind, name = item
+    #POST /ldap/importgroup { groupname } or /ldap/importuser { username }
+    url = 'http://'+config['DCOS_IP']+'/acs/api/v1/ldap/import'+kind
+    data = { kind+'name': name }
+    try:
+      request = helpers.send_request(
+        'POST',
+        url,
+        'ldap_import',
+        headers = headers,
+        data = codec.dumps( data )
+      )
+      request.raise_for_status()
+      helpers.log(
+        log_level='INFO',
+        operation='IMPORT',
+        objects=['LDAP', kind+': '+name],
+        indx=index,
+        content=request.status_code
+        )
+    except requests.exceptions.HTTPError as error:
+      helpers.log(
+        log_level='ERROR',
+        operation='IMPORT',
+        objects=['LDAP', kind+': '+name],
+        indx=index,
+        content=request.text
+        )
+      #409: already exists in the cluster, not a failure
+      return { 'type': kind, 'id': name, 'status': request.status_code, 'imported': request.status_code == 409, 'error': request.text }
+
+    return { 'type': kind, 'id': name, 'status': request.status_code, 'imported': True }
+
+  metrics.expect( len( items ) )
+  results = scheduler.run_concurrently( import_entity, items )
+  #an exception in a request leaves no result for its entity
+  results = [
+    result or { 'type': kind, 'id': name, 'status': None, 'imported': False }
+    for result, ( kind, name ) in zip( results, items )
+  ]
+  with open( env.LDAP_IMPORT_FILE, 'w' ) as import_file:
+    import_file.write( codec.dumps( { 'array': results } ) )
+
+  imported = sum( 1 for result in results if result['imported'] )
+  helpers.log(
+    log_level='INFO' if imported == len( results ) else 'ERROR',
+    operation='IMPORT',
+    objects=['LDAP'],
+    indx=0,
+    content='{0} of {1} remote users and groups imported'.format( imported, len( results ) )
+    )
+
+  return imported == len( results )
@@ -10,13 +10,19 @@
 
 #reference:
 #https://mesosphere.github.io/marathon/docs/rest-api.html
+#https://mesosphere.github.io/marathon/docs/rest-api.html#get-v2-deployments
 
 import sys
 import os
+import time
 import requests
-import json
 import env        #environment variables and constants
+import codec        #JSON encoding and decoding
 import helpers      #helper functions in separate module helpers.py
+import service_group_hashes   #Merkle hashes of the service group tree
+import metrics      #run metrics
+import service_group_tree     #iterative traversal of the service group tree
+from get_service_groups import fetch_service_groups
 
 def post_service_groups ( DCOS_IP ):
 	""" 
@@ -25,6 +31,7 @@ def post_service_groups ( DCOS_IP ):
 	"""
 
 	config = helpers.get_config( env.CONFIG_FILE )
+	failed = False
 	try:  	
 		#open the SERVICE GROUPS file and load the LIST of groups from JSON
 		service_groups_file = open( env.SERVICE_GROUPS_FILE, 'r' )
@@ -46,7 +53,7 @@ def post_service_groups ( DCOS_IP ):
 		return False
 
 	#load entire text file and convert to JSON - dictionary
-	root_service_group = json.loads( service_groups_file.read() )
+	root_service_group = codec.loads( service_groups_file.read() )
 	service_groups_file.close()
 
 	#'/' is a service group itself but it can't be posted directly (it exists).
@@ -55,8 +62,8 @@ def post_service_groups ( DCOS_IP ):
 
 
 	for index, service_group in enumerate( root_service_group['groups'] ):   #don't post `/` but only his 'groups'
-		helpers.format_service_group( service_group )
-		service_group = helpers.single_to_double_quotes( json.dumps( service_group ) ) 
+		service_group = helpers.format_service_group( service_group )
+		service_group = codec.dumps( service_group )
 		#build the request
 		api_endpoint = '/marathon/v2/groups'
 		url = 'http://'+config['DCOS_IP']+api_endpoint
@@ -66,8 +73,10 @@ def post_service_groups ( DCOS_IP ):
 		}
 		#send the request to POST the new GROUP
 		try:
-			request = requests.post(
+			request = helpers.send_request(
+				'POST',
 				url,
+				'service_groups',
 				headers = headers,
 				data = service_group
 			)
@@ -81,6 +90,9 @@ def post_service_groups ( DCOS_IP ):
 				content=request.status_code
 			)
 		except requests.exceptions.HTTPError as error:
+			#409: already exists in the cluster, not a failure
+			if request.status_code != 409:
+				failed = True
 			helpers.log(
 				log_level='ERROR',
 				operation='PUT',
@@ -89,6 +101,308 @@ def post_service_groups ( DCOS_IP ):
 				content=request.text
 			)
 	
-	helpers.get_input( message=env.MSG_PRESS_ENTER )
+	helpers.pause()
 
-	return True
\ No newline at end of file
+	return not failed
+
+def post_service_groups_tree ( DCOS_IP ):
+	"""
+	Get the Service Group information from the service groups file, including apps, and submit
+	the whole tree in a single PUT against the root group of the DC/OS cluster available at the
+	DCOS_IP argument. Note this REPLACES the root group: the cluster ends up with the buffer's tree.
+	Marathon creates a single deployment for it, which is tracked until it finishes.
+	"""
+
+	config = helpers.get_config( env.CONFIG_FILE )
+	try:
+		#open the SERVICE GROUPS file and load the tree of groups from JSON
+		service_groups_file = open( env.SERVICE_GROUPS_FILE, 'r' )
+	except IOError as error:
+		helpers.log(
+			log_level='ERROR',
+			operation='LOAD',
+			objects=['Service Groups'],
+			indx=0,
+			content=env.MSG_ERROR_NO_SERVICE_GROUPS
+			)
+		helpers.pause()
+		return False
+
+	#load entire text file and convert to JSON - dictionary
+	root_service_group = codec.loads( service_groups_file.read() )
+	service_groups_file.close()
+	root_service_group = helpers.format_service_group( root_service_group, keep_apps=True )
+
+	#build the request
+	#https://mesosphere.github.io/marathon/docs/rest-api.html#put-v2-groups
+	api_endpoint = '/marathon/v2/groups'
+	url = 'http://'+config['DCOS_IP']+api_endpoint
+	headers = {
+		'Content-type': 'application/json',
+		'Authorization': 'token='+config['TOKEN'],
+	}
+	#send the request to PUT the whole tree
+	try:
+		request = helpers.send_request(
+			'PUT',
+			url,
+			'service_groups',
+			headers = headers,
+			data = codec.dumps( root_service_group )
+		)
+		request.raise_for_status()
+		helpers.log(
+			log_level='INFO',
+			operation='PUT',
+			objects=['Service Groups'],
+			indx=0,
+			content=request.status_code
+		)
+	except requests.exceptions.HTTPError as error:
+		helpers.log(
+			log_level='ERROR',
+			operation='PUT',
+			objects=['Service Groups'],
+			indx=0,
+			content=request.text
+		)
+		helpers.pause()
+		return False
+
+	deployed = wait_for_deployments( config, [ codec.loads( request.content )['deploymentId'] ] )
+
+	helpers.pause()
+
+	return deployed
+
+def wait_for_deployments ( config, deployment_ids ):
+	"""
+	Poll the Marathon deployments of the cluster in 'config' with exponential backoff until
+	none of the deployments received is listed anymore (i.e. all finished), or the timeout expires.
+	Returns True when all the deployments have finished.
+	"""
+
+	api_endpoint = '/marathon/v2/deployments'
+	url = 'http://'+config['DCOS_IP']+api_endpoint
+	headers = {
+		'Content-type': 'application/json',
+		'Authorization': 'token='+config['TOKEN'],
+	}
+	waiting = set( deployment_ids )
+	start = time.time()
+	delay = env.DEPLOYMENT_POLL_INITIAL
+	index = 0
+	while time.time()-start < env.DEPLOYMENT_TIMEOUT:
+		try:
+			request = helpers.send_request(
+				'GET',
+				url,
+				'deployments',
+				headers = headers
+			)
+			request.raise_for_status()
+		except requests.exceptions.HTTPError as error:
+			helpers.log(
+				log_level='ERROR',
+				operation='GET',
+				objects=['Deployments'],
+				indx=index,
+				content=request.text
+			)
+		else:
+			running = [ d for d in codec.loads( request.content ) if d['id'] in waiting ]
+			waiting = set( d['id'] for d in running )
+			if not waiting:
+				helpers.log(
+					log_level='INFO',
+					operation='GET',
+					objects=['Deployments'],
+					indx=index,
+					content='Finished in {0:.1f}s'.format( time.time()-start )
+				)
+				return True
+			helpers.log(
+				log_level='INFO',
+				operation='GET',
+				objects=['Deployments: '+running[0]['id']],
+				indx=index,
+				content='{0} running. Step {1}/{2}'.format( len( running ), running[0].get( 'currentStep' ), running[0].get( 'totalSteps' ) )
+			)
+		index += 1
+		time.sleep( delay )
+		delay = min( delay*2, env.DEPLOYMENT_POLL_MAX )
+
+	helpers.log(
+		log_level='ERROR',
+		operation='GET',
+		objects=['Deployments: '+', '.join( sorted( waiting ) )],
+		indx=index,
+		content=env.MSG_ERROR_DEPLOYMENT_TIMEOUT
+	)
+
+	return False
+
+def post_service_groups_changes ( DCOS_IP ):
+	"""
+	Compare the subtree hashes of the Service Groups in the buffer against those of a saved
+	configuration or of the DC/OS cluster available at the DCOS_IP argument, descending only
+	into the subtrees that differ, and post only the groups and apps that changed.
+	"""
+
+	config = helpers.get_config( env.CONFIG_FILE )
+	try:
+		service_groups_file = open( env.SERVICE_GROUPS_FILE, 'r' )
+	except IOError as error:
+		helpers.log(
+			log_level='ERROR',
+			operation='LOAD',
+			objects=['Service Groups'],
+			indx=0,
+			content=env.MSG_ERROR_NO_SERVICE_GROUPS
+			)
+		helpers.pause()
+		return False
+	root_service_group = codec.loads( service_groups_file.read() )
+	service_groups_file.close()
+	source = service_group_hashes.load_service_groups_hashes( env.SERVICE_GROUPS_FILE, env.SERVICE_GROUPS_HASHES_FILE )
+
+	#compare against a saved configuration, or against the cluster
+	name = helpers.get_input( message=env.MSG_ENTER_CONFIG_COMPARE )
+	if name:
+		target = service_group_hashes.load_service_groups_hashes(
+			env.BACKUP_DIR+'/'+name+'/'+os.path.basename( env.SERVICE_GROUPS_FILE ),
+			env.BACKUP_DIR+'/'+name+'/'+os.path.basename( env.SERVICE_GROUPS_HASHES_FILE )
+			)
+	else:
+		target_service_groups = fetch_service_groups( config )
+		target = service_group_hashes.hash_service_groups( target_service_groups ) if target_service_groups else None
+	if target is None:
+		helpers.log(
+			log_level='ERROR',
+			operation='LOAD',
+			objects=['Service Groups', name or config['DCOS_IP']],
+			indx=0,
+			content=env.ERROR_CONFIG_NOT_FOUND
+			)
+		helpers.pause()
+		return False
+
+	changes = service_group_hashes.diff_service_groups( source, target )
+	for group_id in changes['groups']:
+		print( 'Changed group (whole subtree): {0}'.format( group_id ) )
+	for app_id in changes['apps']:
+		print( 'Changed app: {0}'.format( app_id ) )
+	for group_id in changes['extra']:
+		print( 'Group not in buffer (left as is): {0}'.format( group_id ) )
+	if not ( changes['groups'] or changes['apps'] ):
+		print( env.MSG_NO_CHANGES )
+		helpers.pause()
+		return True
+	if helpers.get_input( message=env.MSG_RESTORE_CHANGES, valid_options=env.yYnN ).lower() != 'y':
+		return True
+
+	#index the buffer's groups and apps by id
+	groups, apps = {}, {}
+	for path, group in service_group_tree.walk_pre_order( root_service_group ):
+		groups[ group['id'] ] = group
+		apps.update( { app['id']: app for app in group['apps'] } )
+
+	#PUT /v2/groups/{id} and /v2/apps/{id} create or update the group/app
+	updates = [ ( '/marathon/v2/groups', group_id, helpers.format_service_group( groups[group_id], keep_apps=True ) ) for group_id in changes['groups'] ]
+	updates += [ ( '/marathon/v2/apps', app_id, helpers.format_app( apps[app_id] ) ) for app_id in changes['apps'] ]
+	deployed = put_and_deploy( config, updates )
+
+	helpers.pause()
+
+	return deployed
+
+def put_and_deploy ( config, updates ):
+	"""
+	PUT a list of ( api_endpoint, id, formatted definition ) of Marathon groups or apps to the
+	DC/OS cluster in 'config', then wait for all the deployments they triggered to finish.
+	Returns True if all PUTs succeeded and all deployments finished.
+	"""
+
+	headers = {
+		'Content-type': 'application/json',
+		'Authorization': 'token='+config['TOKEN'],
+	}
+	metrics.expect( len( updates ) )
+	failed = False
+	deployments = []
+	for index, ( api_endpoint, item_id, item ) in enumerate( updates ):
+		url = 'http://'+config['DCOS_IP']+api_endpoint+item_id
+		try:
+			request = helpers.send_request(
+				'PUT',
+				url,
+				'service_groups',
+				headers = headers,
+				data = codec.dumps( item )
+			)
+			request.raise_for_status()
+			helpers.log(
+				log_level='INFO',
+				operation='PUT',
+				objects=['Service Groups: '+item_id],
+				indx=index,
+				content=request.status_code
+			)
+		except requests.exceptions.HTTPError as error:
+			failed = True
+			helpers.log(
+				log_level='ERROR',
+				operation='PUT',
+				objects=['Service Groups: '+item_id],
+				indx=index,
+				content=request.text
+			)
+			continue
+		#updates answer with a deploymentId, creations with the app and its deployments
+		response = codec.loads( request.content )
+		if 'deploymentId' in response:
+			deployments.append( response['deploymentId'] )
+		deployments.extend( deployment['id'] for deployment in response.get( 'deployments', [] ) )
+
+	if deployments and not wait_for_deployments( config, deployments ):
+		failed = True
+
+	return not failed
+
+def post_service_groups_selection ( DCOS_IP ):
+	"""
+	Get the Service Groups from the buffer that match a path pattern (e.g. /prod/payments/**)
+	and post only those subtrees, with their apps, to the DC/OS cluster available at the DCOS_IP
+	argument. Branches that can't match the pattern are skipped without being visited.
+	"""
+
+	config = helpers.get_config( env.CONFIG_FILE )
+	try:
+		service_groups_file = open( env.SERVICE_GROUPS_FILE, 'r' )
+	except IOError as error:
+		helpers.log(
+			log_level='ERROR',
+			operation='LOAD',
+			objects=['Service Groups'],
+			indx=0,
+			content=env.MSG_ERROR_NO_SERVICE_GROUPS
+			)
+		helpers.pause()
+		return False
+	root_service_group = codec.loads( service_groups_file.read() )
+	service_groups_file.close()
+
+	pattern = helpers.get_input( message=env.MSG_ENTER_SERVICE_GROUPS_PATTERN )
+	updates = [
+		( '/marathon/v2/groups', group['id'], helpers.format_service_group( group, keep_apps=True ) )
+		for group in service_group_tree.select_subtrees( root_service_group, pattern )
+	]
+	if not updates:
+		print( env.MSG_NO_SERVICE_GROUPS_MATCH )
+		helpers.pause()
+		return True
+	deployed = put_and_deploy( config, updates )
+
+	helpers.pause()
+
+	return deployed
@@ -14,9 +14,10 @@
 import sys
 import os
 import requests
-import json
 import env        #environment variables and constants
+import codec        #JSON encoding and decoding
 import helpers      #helper functions in separate module helpers.py
+import metrics      #run metrics
 
 def post_users ( DCOS_IP ):
   """ 
@@ -25,6 +26,7 @@ def post_users ( DCOS_IP ):
   """ 
   
   config = helpers.get_config( env.CONFIG_FILE )  
+  failed = False
   try:  
     users_file = open( env.USERS_FILE, 'r' )  
   except IOError as error:
@@ -35,17 +37,21 @@ def post_users ( DCOS_IP ):
       indx=0,
       content=request.text
       )
-    helpers.get_input( message=env.MSG_PRESS_ENTER )
+    helpers.pause()
     return False #return Error if file isn't available
 
   #load entire text file and convert to JSON - dictionary
-  users = json.loads( users_file.read() )
+  users = codec.loads( users_file.read() )
   users_file.close()
 
   #loop through the list of users and
   #PUT /users/{uid}
+  metrics.expect( len( users['array'] ) )
   for index, user in ( enumerate( users['array'] ) ): 
 
+    #LDAP users are imported from the directory by post_ldap
+    if helpers.is_remote( user ):
+      continue
     uid = user['uid']
     #build the request
     api_endpoint = '/acs/api/v1/users/'+uid
@@ -60,10 +66,12 @@ def post_users ( DCOS_IP ):
     }
     #send the request to PUT the new USER
     try:
-      request = requests.put(
+      request = helpers.send_request(
+        'PUT',
         url,
+        'users',
         headers = headers,
-        data = json.dumps( data )
+        data = codec.dumps( data )
       )
       request.raise_for_status()
       #show progress after request
@@ -75,6 +83,9 @@ def post_users ( DCOS_IP ):
         content=request.status_code
         )
     except requests.exceptions.HTTPError as error:
+      #409: already exists in the cluster, not a failure
+      if request.status_code != 409:
+        failed = True
       helpers.log(
         log_level='ERROR',
         operation='PUT',
@@ -91,8 +102,8 @@ def post_users ( DCOS_IP ):
     content=env.MSG_DONE
     )
 
-  helpers.get_input( message=env.MSG_PRESS_ENTER )
-  return True
+  helpers.pause()
+  return not failed
 
 def post_users_groups ( DCOS_IP, users ):
   """ 
@@ -101,6 +112,7 @@ def post_users_groups ( DCOS_IP, users ):
   """
 
   config = helpers.get_config( env.CONFIG_FILE )
+  failed = False
   try:    
     #open the GROUPS file and load the LIST of groups from JSON
     users_groups_file = open( env.USERS_GROUPS_FILE, 'r' )
@@ -119,13 +131,14 @@ def post_users_groups ( DCOS_IP, users ):
       indx=0,
       content=request.text
       )
-    helpers.get_input( message=env.MSG_PRESS_ENTER )
+    helpers.pause()
     return False
 
   #load entire text file and convert to JSON - dictionary
-  users_groups = json.loads( users_groups_file.read() )
+  users_groups = codec.loads( users_groups_file.read() )
   users_groups_file.close()
 
+  metrics.expect( sum( len( user_group['groups'] ) for user_group in users_groups['array'] ) )
   for index, user_group in ( enumerate( users_groups['array'] ) ): 
     #PUT /users/{uid}/users/{uid}
     uid = helpers.escape( user_group['uid'] ) 
@@ -143,8 +156,10 @@ def post_users_groups ( DCOS_IP, users ):
       }
       #send the request to PUT the new USER
       try:
-        request = requests.put(
+        request = helpers.send_request(
+        'PUT',
         url,
+        'users_groups',
         headers = headers
         )
         request.raise_for_status()
@@ -157,6 +172,9 @@ def post_users_groups ( DCOS_IP, users ):
           content=request.status_code
           ) 
       except requests.exceptions.HTTPError as error:
+        #409: already exists in the cluster, not a failure
+        if request.status_code != 409:
+          failed = True
         helpers.log(
           log_level='ERROR',
           operation='PUT',
@@ -173,5 +191,5 @@ def post_users_groups ( DCOS_IP, users ):
     content=env.MSG_DONE
     )
 
-  helpers.get_input( message=env.MSG_PRESS_ENTER )
-  return True
+  helpers.pause()
+  return not failed
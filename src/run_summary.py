@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+#
+# run_summary.py: end-of-run report with throughput and failure breakdown
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Build a structured report of a full GET or RESTORE run from the run metrics
+# and the contents of the local buffer: entities and requests per resource type,
+# successes and failures by HTTP status, bytes, wall time, requests per second
+# and the slowest requests. The report is written next to the snapshot so that
+# it's saved with it and backup performance can be trended over time.
+
+import os
+import time
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import metrics			#run metrics
+import log_pipeline		#flush the log before printing the report
+import buffer_store		#atomic writes of buffer files
+import service_group_tree	#iterative traversal of the service group tree
+
+def count_entities( resource, path ):
+	"""
+	Count the entities of a resource type stored in a buffer file.
+	Returns the number of entities, or None if the file is not in the buffer.
+	"""
+
+	if not os.path.exists( path ):
+		return None
+	with open( path, 'r' ) as buffer_file:
+		try:
+			content = codec.loads( buffer_file.read() )
+		except ValueError:
+			return None
+
+	if resource == 'agents':
+		return len( content.get( 'slaves', [] ) )
+	if resource == 'ldap':
+		return 1
+	if resource == 'apps':
+		return len( content.get( 'apps', [] ) )+len( content.get( 'pods', [] ) )
+	if resource == 'service_groups':
+		#count every group in the tree, including the root
+		return sum( 1 for group in service_group_tree.walk_pre_order( content ) )
+
+	return len( content.get( 'array', [] ) )
+
+def build_run_summary( operation ):
+	"""
+	Build the summary of the run that just finished from the run metrics and the buffer.
+	Returns the summary as a dictionary.
+	"""
+
+	run = metrics.snapshot()
+	resources = {}
+	for ( resource, status ), count in run['completed'].items():
+		entry = resources.setdefault( resource, { 'requests': 0, 'succeeded': 0, 'failed': 0, 'bytes': 0, 'status': {} } )
+		entry['requests'] += count
+		entry['status'][status] = entry['status'].get( status, 0 ) + count
+		if status == 'None' or int( status ) >= 400:
+			entry['failed'] += count
+		else:
+			entry['succeeded'] += count
+	for resource, size in run['bytes'].items():
+		resources[resource]['bytes'] = size
+	for resource, path in env.buffer_files.items():
+		entities = count_entities( resource, path )
+		if entities is not None:
+			resources.setdefault( resource, { 'requests': 0, 'succeeded': 0, 'failed': 0, 'bytes': 0, 'status': {} } )
+			resources[resource]['entities'] = entities
+
+	total_requests = sum( entry['requests'] for entry in resources.values() )
+	summary = {
+		'operation':			operation,
+		'started':				time.strftime( '%Y-%m-%dT%H:%M:%S', time.localtime( run['start_time'] ) ),
+		'wall_time':			round( run['elapsed'], 3 ),
+		'requests':				total_requests,
+		'failed':				sum( entry['failed'] for entry in resources.values() ),
+		'bytes':				sum( entry['bytes'] for entry in resources.values() ),
+		'requests_per_second':	round( total_requests / run['elapsed'], 2 ) if run['elapsed'] else 0,
+		'token_refreshes':		run['token_refreshes'],
+		'resources':			resources,
+		'slowest':				[
+			{ 'request': description, 'resource': resource, 'status': status, 'seconds': round( seconds, 3 ) }
+			for ( seconds, description, resource, status ) in run['slowest']
+		]
+	}
+
+	return summary
+
+def print_run_summary( summary ):
+	"""
+	Print a short version of the run summary received.
+	"""
+
+	log_pipeline.flush()
+	print( '{0} {1} run: {2} requests ({3} failed), {4} bytes in {5}s, {6} req/s'.format(
+		env.MARK,
+		summary['operation'],
+		summary['requests'],
+		summary['failed'],
+		summary['bytes'],
+		summary['wall_time'],
+		summary['requests_per_second']
+		) )
+	for resource, entry in sorted( summary['resources'].items() ):
+		print( '{0:<20} entities: {1:<6} requests: {2:<6} failed: {3:<6} status: {4}'.format(
+			resource,
+			entry.get( 'entities', '-' ),
+			entry['requests'],
+			entry['failed'],
+			', '.join( '{0}={1}'.format( status, count ) for status, count in sorted( entry['status'].items() ) )
+			) )
+	for slow in summary['slowest']:
+		print( 'Slow request: {0:>8}s {1} [{2}]'.format( slow['seconds'], slow['request'], slow['status'] ) )
+
+	return True
+
+def run_summary_path( operation ):
+	"""
+	Returns the path of the summary of the operation received ('GET', 'PUT'...) in the buffer.
+	"""
+
+	return env.RUN_SUMMARY_FILE.format( operation.lower() )
+
+def write_run_summary( operation, path=None ):
+	"""
+	Build the summary of the run that just finished, write it as JSON to the path received
+	(by default next to the snapshot in the buffer, in a file of its own for each operation) and print it.
+	Returns the summary as a dictionary.
+	"""
+
+	summary = build_run_summary( operation )
+	buffer_store.write_buffer_file( path or run_summary_path( operation ), codec.dumps( summary, indent=True ) )
+	print_run_summary( summary )
+
+	return summary
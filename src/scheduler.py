@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+#
+# scheduler.py: run a set of dependent tasks concurrently
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Small task DAG scheduler used by the "ALL" operations. Each task starts
+# as soon as every task it depends on has finished, with a limited number
+# of tasks running at once.
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import env				#environment variables and constants
+import helpers			#helper functions in separate module helpers.py
+import metrics			#run metrics
+
+def run_dag ( tasks, max_workers=env.MAX_WORKERS ):
+	"""
+	Run the tasks received as a dictionary of { name: ( function, [ names of dependencies ] ) }.
+	Each function is called with the results of its dependencies as positional arguments,
+	in the order they are listed. A task is skipped if any of its dependencies failed,
+	i.e. raised an exception or returned False.
+	Returns a dictionary of { name: result } for the tasks that ran successfully.
+	"""
+
+	results = {}
+	failed = set()
+	pending = dict( tasks )
+	running = {}
+	metrics.set_concurrency( max_workers )
+
+	with ThreadPoolExecutor( max_workers=max_workers ) as executor:
+		while pending or running:
+			#skip the tasks that can't run anymore, then start the ones that are ready
+			for name, ( function, dependencies ) in list( pending.items() ):
+				if any( dependency in failed for dependency in dependencies ):
+					helpers.log(
+						log_level='ERROR',
+						operation='SKIP',
+						objects=[name],
+						indx=0,
+						content='Prerequisite failed: '+', '.join( d for d in dependencies if d in failed )
+						)
+					failed.add( name )
+					del pending[name]
+				elif all( dependency in results for dependency in dependencies ):
+					arguments = [ results[dependency] for dependency in dependencies ]
+					running[ executor.submit( function, *arguments ) ] = name
+					del pending[name]
+			if not running:
+				break
+			done, _ = wait( running, return_when=FIRST_COMPLETED )
+			for future in done:
+				name = running.pop( future )
+				try:
+					result = future.result()
+				except Exception as error:
+					helpers.log(
+						log_level='ERROR',
+						operation='RUN',
+						objects=[name],
+						indx=0,
+						content=repr( error )
+						)
+					result = False
+				if result is False:
+					failed.add( name )
+				else:
+					results[name] = result
+
+	metrics.set_concurrency( 1 )
+
+	return results
+
+def run_waves ( waves, max_workers=env.MAX_WORKERS ):
+	"""
+	Run the waves received as a list of { name: function } dictionaries, one after another.
+	The functions in a wave run in parallel (at most max_workers at once) and take no arguments.
+	Fail fast: if any function in a wave fails, the following waves are not run.
+	Returns True if all waves completed successfully.
+	"""
+
+	for index, wave in enumerate( waves ):
+		results = run_dag( { name: ( function, [] ) for name, function in wave.items() }, max_workers )
+		failed = [ name for name in wave if name not in results ]
+		if failed:
+			helpers.log(
+				log_level='ERROR',
+				operation='RUN',
+				objects=['Wave {0}'.format( index )],
+				indx=index,
+				content='Failed: '+', '.join( failed )+'. Remaining waves cancelled.'
+				)
+			return False
+
+	return True
+
+def run_concurrently ( function, items, max_workers=env.MAX_WORKERS ):
+	"""
+	Call function( index, item ) for every item received, with at most max_workers calls at once.
+	Returns the list of results, in the same order as the items. A call that raised an exception
+	is logged and its result is False.
+	"""
+
+	def call( index, item ):
+		try:
+			return function( index, item )
+		except Exception as error:
+			helpers.log(
+				log_level='ERROR',
+				operation='RUN',
+				objects=[getattr( function, '__name__', 'task' )],
+				indx=index,
+				content=repr( error )
+				)
+			return False
+
+	metrics.set_concurrency( max_workers )
+	with ThreadPoolExecutor( max_workers=max_workers ) as executor:
+		results = list( executor.map( call, range( len( items ) ), items ) )
+	metrics.set_concurrency( 1 )
+
+	return results
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+#
+# service_group_hashes.py: Merkle hashes of a Marathon service group tree
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Compute a hash for every group of a service group tree (as received from
+# "get_service_groups"), covering the group itself, its apps and, through
+# their own hashes, all its children. Two trees can then be compared top-down,
+# descending only into the subtrees whose hashes differ, so that only the
+# groups and apps that changed need to be posted.
+
+import hashlib
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import buffer_store		#atomic writes of buffer files
+import service_group_tree	#iterative traversal of the service group tree
+
+def hash_object( obj ):
+	"""
+	Hash a JSON-serializable object in a canonical form (sorted keys, no whitespace).
+	Returns the hex digest.
+	"""
+
+	return hashlib.sha256( codec.canonical( obj ) ).hexdigest()
+
+def hash_app( app ):
+	"""
+	Hash an app definition, ignoring the read-only fields that change on every deployment.
+	Returns the hex digest.
+	"""
+
+	return hash_object( { key: value for key, value in app.items() if key not in env.MARATHON_READ_ONLY_FIELDS } )
+
+def hash_service_groups( service_group ):
+	"""
+	Compute the hashes of a service group and all the groups under it, in a single
+	post-order pass over the tree.
+	Returns a dictionary indexed by group id, with for each group:
+	- 'node': hash of the group's own fields (everything but apps, groups and version)
+	- 'apps': dictionary of app id : app hash
+	- 'groups': list of the ids of its children
+	- 'tree': hash of the node, apps and children's tree hashes, i.e. of the whole subtree
+	"""
+
+	hashes = {}
+	for path, group in service_group_tree.walk_post_order( service_group ):
+		node = { key: value for key, value in group.items() if key not in ( 'apps', 'groups', 'version' ) }
+		apps = { app['id']: hash_app( app ) for app in group['apps'] }
+		children = sorted( child['id'] for child in group['groups'] )
+		hashes[ group['id'] ] = {
+			'node':		hash_object( node ),
+			'apps':		apps,
+			'groups':	children,
+			'tree':		hash_object( [ hash_object( node ), sorted( apps.items() ), [ hashes[child]['tree'] for child in children ] ] )
+		}
+
+	return hashes
+
+def diff_service_groups( source, target, root='/' ):
+	"""
+	Compare the hashes of two service group trees top-down, starting at root.
+	Only descends into subtrees whose tree hashes differ.
+	Returns a dictionary with:
+	- 'groups': ids of the groups of source missing or different in target (whole subtree to be posted)
+	- 'apps': ids of the apps of source missing or different in target, in groups that exist in both
+	- 'extra': ids of groups in target and not in source (not removed by a restore)
+	"""
+
+	changes = { 'groups': [], 'apps': [], 'extra': [] }
+	if root not in source:
+		return changes
+	pending = [ root ]
+	while pending:
+		group_id = pending.pop()
+		group, other = source[group_id], target.get( group_id )
+		if other is None or group['node'] != other['node']:
+			changes['groups'].append( group_id )
+			continue
+		if group['tree'] == other['tree']:
+			continue
+		for app_id, app_hash in sorted( group['apps'].items() ):
+			if other['apps'].get( app_id ) != app_hash:
+				changes['apps'].append( app_id )
+		changes['extra'].extend( sorted( set( other['groups'] )-set( group['groups'] ) ) )
+		pending.extend( reversed( group['groups'] ) )
+
+	return changes
+
+def save_service_groups_hashes( service_groups, path=env.SERVICE_GROUPS_HASHES_FILE ):
+	"""
+	Compute the hashes of the service group tree received and save them to the path received,
+	by default next to service_groups.json in the buffer.
+	Returns the hashes as a dictionary.
+	"""
+
+	hashes = hash_service_groups( service_groups )
+	buffer_store.write_buffer_file( path, codec.dumps( hashes ) )
+
+	return hashes
+
+def load_service_groups_hashes( service_groups_path, hashes_path ):
+	"""
+	Load the hashes saved alongside a service groups file, or compute them from the
+	service groups file if they were not saved (e.g. older snapshots).
+	Returns the hashes as a dictionary, or None if neither file exists.
+	"""
+
+	try:
+		with open( hashes_path, 'r' ) as hashes_file:
+			return codec.loads( hashes_file.read() )
+	except IOError:
+		pass
+	try:
+		with open( service_groups_path, 'r' ) as service_groups_file:
+			return hash_service_groups( codec.loads( service_groups_file.read() ) )
+	except IOError:
+		return None
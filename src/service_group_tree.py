@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+#
+# service_group_tree.py: iterative traversal of Marathon service group trees
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Service groups form a tree, with children under 'groups' and the (absolute)
+# group name under 'id'. These generators walk the tree with an explicit stack
+# instead of recursion, so deeply nested catalogs don't hit the recursion limit,
+# and format, print, hash and filter operations can all be done in a single
+# streaming pass over it.
+#
+# Subtrees can be selected with path patterns: segments separated by '/',
+# each matched with shell-style wildcards (e.g. 'pay*'), and '**' matching
+# any number of segments (e.g. '/prod/payments/**' or '/**/payments').
+
+from fnmatch import fnmatchcase
+
+def walk_pre_order( root, prune=None ):
+	"""
+	Iterate over a service group tree, parents before children, without recursion.
+	Yields ( path, group ) for every group, where path is the tuple of ids from the root to the group.
+	If prune is provided, it's called with ( path, group ) and the children of the groups
+	for which it returns True are not visited.
+	"""
+
+	pending = [ ( ( root['id'], ), root ) ]
+	while pending:
+		path, group = pending.pop()
+		yield path, group
+		if prune and prune( path, group ):
+			continue
+		#reversed, so that children are visited in their original order
+		for child in reversed( group.get( 'groups', [] ) ):
+			pending.append( ( path+( child['id'], ), child ) )
+
+def walk_post_order( root ):
+	"""
+	Iterate over a service group tree, children before parents, without recursion.
+	Yields ( path, group ) for every group, where path is the tuple of ids from the root to the group.
+	"""
+
+	pending = [ ( ( root['id'], ), root, False ) ]
+	while pending:
+		path, group, expanded = pending.pop()
+		if expanded:
+			yield path, group
+			continue
+		pending.append( ( path, group, True ) )
+		for child in reversed( group.get( 'groups', [] ) ):
+			pending.append( ( path+( child['id'], ), child, False ) )
+
+def map_post_order( root, function ):
+	"""
+	Build a new value for every group of a service group tree, children first, without recursion.
+	The function is called with ( path, group, children ), where children is the list of values
+	already built for the group's children, in their original order.
+	Returns the value built for the root.
+	"""
+
+	built = {}
+	for path, group in walk_post_order( root ):
+		children = [ built.pop( path+( child['id'], ) ) for child in group.get( 'groups', [] ) ]
+		built[path] = function( path, group, children )
+
+	return built[ ( root['id'], ) ]
+
+def split_path( path ):
+	"""
+	Split a group id or path pattern into its segments, ignoring leading and trailing '/'.
+	"""
+
+	return [ segment for segment in path.split( '/' ) if segment ]
+
+def literal_prefix( pattern ):
+	"""
+	Returns the group id that every match of the path pattern is under: its segments
+	up to the first one with a wildcard, e.g. '/prod/payments' for '/prod/payments/*/db'.
+	"""
+
+	prefix = []
+	for segment in split_path( pattern ):
+		if any( wildcard in segment for wildcard in '*?[' ):
+			break
+		prefix.append( segment )
+
+	return '/'+'/'.join( prefix )
+
+def graft( group ):
+	"""
+	Build the groups leading from the root '/' to the group received (found by its absolute id),
+	without apps, so that a subtree fetched on its own is rooted at '/' like a full tree.
+	Returns the root of the new tree.
+	"""
+
+	segments = split_path( group['id'] )
+	for depth in range( len( segments )-1, -1, -1 ):
+		group = { 'id': '/'+'/'.join( segments[:depth] ), 'apps': [], 'groups': [ group ] }
+
+	return group
+
+def advance( patterns, states, segment=None ):
+	"""
+	Match one more segment of a group id against the segments of a path pattern.
+	states is the set of positions in the patterns reached so far; a '**' can match no
+	segment (its position also reaches the next one) or any number of them (it stays).
+	Returns the positions reached after the segment, or the initial positions if no segment is given.
+	"""
+
+	if segment is None:
+		reached = set( states )
+	else:
+		reached = set()
+		for index in states:
+			if index < len( patterns ) and patterns[index] == '**':
+				reached.add( index )
+			elif index < len( patterns ) and fnmatchcase( segment, patterns[index] ):
+				reached.add( index+1 )
+	for index in sorted( reached ):
+		while index < len( patterns ) and patterns[index] == '**':
+			index += 1
+			reached.add( index )
+
+	return reached
+
+def match_states( pattern, group_id ):
+	"""
+	Returns the positions in the segments of the path pattern reached after matching the whole group id.
+	"""
+
+	patterns = split_path( pattern )
+	states = advance( patterns, { 0 } )
+	for segment in split_path( group_id ):
+		if not states:
+			break
+		states = advance( patterns, states, segment )
+
+	return states
+
+def match_path( pattern, group_id ):
+	"""
+	Returns True if the group id matches the path pattern.
+	"""
+
+	return len( split_path( pattern ) ) in match_states( pattern, group_id )
+
+def may_contain_match( pattern, group_id ):
+	"""
+	Returns True if the group id, or any group under it, could match the path pattern.
+	"""
+
+	return bool( match_states( pattern, group_id ) )
+
+def select_subtrees( root, pattern ):
+	"""
+	Iterate over the topmost groups of a service group tree that match the path pattern.
+	The subtree of a matching group is selected as a whole, and branches that can't
+	contain a match are not visited.
+	Yields every selected group.
+	"""
+
+	def prune( path, group ):
+		return match_path( pattern, group['id'] ) or not may_contain_match( pattern, group['id'] )
+
+	for path, group in walk_pre_order( root, prune ):
+		if match_path( pattern, group['id'] ):
+			yield group
+
+def prune_to_selection( root, pattern ):
+	"""
+	Build a copy of a service group tree keeping only the subtrees that match the path pattern,
+	and the groups leading to them (without their apps, as those were not selected).
+	Returns the pruned copy, or None if nothing matches.
+	"""
+
+	def prune_group( path, group, children ):
+		if match_path( pattern, group['id'] ):
+			return group
+		kept = [ child for child in children if child is not None ]
+		if not kept:
+			return None
+		pruned = dict( group )
+		pruned['groups'] = kept
+		pruned['apps'] = []
+		return pruned
+
+	return map_post_order( root, prune_group )
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+#
+# snapshot_diff.py: structural diff between two saved configurations
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Compare two configurations saved under BACKUP_DIR entity by entity instead
+# of line by line: every resource file is streamed one record at a time, reduced
+# to a sorted list of ( id, digest ) and both lists are merged in order. Only the
+# records whose digests differ are read again by position, one pair at a time,
+# to report the fields, memberships or grants that changed.
+#
+# At most one record of each file is parsed at a time, but the diff is not bounded
+# by one record: buffer files are not guaranteed to be sorted by id, so the
+# ( id, digest, position ) index of each file is held in memory to be sorted, as
+# are the byte spans of its records (see "buffer_stream"). That is O(records) small
+# tuples per file, instead of O(records) parsed entities, and lets the merge find
+# any pair of records regardless of the order the cluster returned them in.
+
+import os
+from ntpath import basename
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import helpers			#helper functions in separate module helpers.py
+import buffer_stream	#stream the records of a buffer file one at a time
+import service_group_hashes	#Merkle hashes of a Marathon service group tree
+
+def acl_grants( acl ):
+	"""
+	Returns the grants of an ACL record as a set of '<user|group>:<id>:<action>'.
+	"""
+
+	return { kind[:-1]+':'+principal[id_key]+':'+action['name']
+		for kind, id_key in ( ( 'users', 'uid' ), ( 'groups', 'gid' ) )
+		for principal in acl.get( kind, [] )
+		for action in principal.get( 'actions', [] ) }
+
+#resource : ( buffer file, [ ( list key, id field ) ], function returning the grants of a record or None )
+DIFF_RESOURCES = {
+	'users':			( env.USERS_FILE, [ ( 'array', 'uid' ) ], None ),
+	'users_groups':		( env.USERS_GROUPS_FILE, [ ( 'array', 'uid' ) ],
+		lambda user: { membership['group']['gid'] for membership in user.get( 'groups', [] ) } ),
+	'groups':			( env.GROUPS_FILE, [ ( 'array', 'gid' ) ], None ),
+	'groups_users':		( env.GROUPS_USERS_FILE, [ ( 'array', 'gid' ) ],
+		lambda group: { membership['user']['uid'] for membership in group.get( 'users', [] ) } ),
+	'acls':				( env.ACLS_FILE, [ ( 'array', 'rid' ) ], None ),
+	'acls_permissions':	( env.ACLS_PERMISSIONS_FILE, [ ( 'array', 'rid' ) ], acl_grants ),
+	'apps':				( env.APPS_FILE, [ ( 'apps', 'id' ), ( 'pods', 'id' ) ], None ),
+}
+
+def digest_records( path, key, id_field ):
+	"""
+	Stream the records of the list under 'key' in the file at path, parsing one at a time.
+	Returns the list of ( id, digest, position in the file ) of every record, sorted by id:
+	its size grows with the number of records, not with their size.
+	"""
+
+	entries = []
+	with buffer_stream.BufferReader( path, key ) as reader:
+		for index, record in enumerate( reader ):
+			entries.append( ( record[id_field], service_group_hashes.hash_object( record ), index ) )
+	entries.sort()
+
+	return entries
+
+def merge_sorted( old, new ):
+	"""
+	Merge two lists of entries sorted by id, where the first two fields of every entry are ( id, digest ).
+	Yields ( id, old entry or None, new entry or None ) for every id whose digest is different or missing on either side.
+	"""
+
+	i, j = 0, 0
+	while i < len( old ) or j < len( new ):
+		if j == len( new ) or ( i < len( old ) and old[i][0] < new[j][0] ):
+			yield old[i][0], old[i], None
+			i += 1
+		elif i == len( old ) or new[j][0] < old[i][0]:
+			yield new[j][0], None, new[j]
+			j += 1
+		else:
+			if old[i][1] != new[j][1]:
+				yield old[i][0], old[i], new[j]
+			i += 1
+			j += 1
+
+def changed_fields( old, new ):
+	"""
+	Returns the sorted list of top-level fields that differ between two records.
+	"""
+
+	return sorted( key for key in set( old ) | set( new ) if old.get( key ) != new.get( key ) )
+
+def diff_resource( resource, old_dir, new_dir ):
+	"""
+	Compare a resource file of two snapshot directories.
+	Yields a dictionary for every entity added, removed or changed. Changes list the fields
+	that differ and, for memberships and permissions, the grants added and removed.
+	"""
+
+	path, lists, grants = DIFF_RESOURCES[resource]
+	old_path = os.path.join( old_dir, basename( path ) )
+	new_path = os.path.join( new_dir, basename( path ) )
+	if not ( os.path.exists( old_path ) and os.path.exists( new_path ) ):
+		return
+	for key, id_field in lists:
+		old, new = digest_records( old_path, key, id_field ), digest_records( new_path, key, id_field )
+		with buffer_stream.BufferReader( old_path, key ) as old_reader, buffer_stream.BufferReader( new_path, key ) as new_reader:
+			for entity_id, old_entry, new_entry in merge_sorted( old, new ):
+				if new_entry is None:
+					yield { 'resource': resource, 'id': entity_id, 'change': 'removed' }
+					continue
+				if old_entry is None:
+					yield { 'resource': resource, 'id': entity_id, 'change': 'added' }
+					continue
+				#only this pair of records is parsed again, from the spans cached while digesting
+				old_record, new_record = old_reader[ old_entry[2] ], new_reader[ new_entry[2] ]
+				change = { 'resource': resource, 'id': entity_id, 'change': 'changed', 'fields': changed_fields( old_record, new_record ) }
+				if grants:
+					old_grants, new_grants = grants( old_record ), grants( new_record )
+					change['added'] = sorted( new_grants-old_grants )
+					change['removed'] = sorted( old_grants-new_grants )
+				yield change
+
+def diff_service_groups( old_dir, new_dir ):
+	"""
+	Compare the service groups of two snapshot directories through their hashes.
+	Yields a dictionary for every group added, removed or changed, with the apps added, removed and changed.
+	"""
+
+	def load( directory ):
+		hashes = service_group_hashes.load_service_groups_hashes(
+			os.path.join( directory, basename( env.SERVICE_GROUPS_FILE ) ),
+			os.path.join( directory, basename( env.SERVICE_GROUPS_HASHES_FILE ) )
+		)
+		hashes = hashes or {}
+		return hashes, sorted(
+			( group_id, service_group_hashes.hash_object( [ group['node'], sorted( group['apps'].items() ) ] ) )
+			for group_id, group in hashes.items()
+		)
+
+	old_hashes, old = load( old_dir )
+	new_hashes, new = load( new_dir )
+	for group_id, old_entry, new_entry in merge_sorted( old, new ):
+		if new_entry is None:
+			yield { 'resource': 'service_groups', 'id': group_id, 'change': 'removed' }
+		elif old_entry is None:
+			yield { 'resource': 'service_groups', 'id': group_id, 'change': 'added' }
+		else:
+			old_apps, new_apps = old_hashes[group_id]['apps'], new_hashes[group_id]['apps']
+			yield {
+				'resource':	'service_groups',
+				'id':		group_id,
+				'change':	'changed',
+				'fields':	[ 'group' ] if old_hashes[group_id]['node'] != new_hashes[group_id]['node'] else [],
+				'added':	sorted( set( new_apps )-set( old_apps ) ),
+				'removed':	sorted( set( old_apps )-set( new_apps ) ),
+				'apps':		sorted( app for app in set( old_apps ) & set( new_apps ) if old_apps[app] != new_apps[app] )
+			}
+
+def diff_snapshot_dirs( old_dir, new_dir ):
+	"""
+	Compare all the resources of two snapshot directories.
+	Yields a dictionary for every entity added, removed or changed.
+	"""
+
+	for resource in DIFF_RESOURCES:
+		for change in diff_resource( resource, old_dir, new_dir ):
+			yield change
+	for change in diff_service_groups( old_dir, new_dir ):
+		yield change
+
+def format_change( change ):
+	"""
+	Returns a line describing the change received, e.g. '~ acls_permissions dcos:x +user:bob:read'.
+	"""
+
+	mark = { 'added': '+', 'removed': '-', 'changed': '~' }[ change['change'] ]
+	details = [ '+'+item for item in change.get( 'added', [] ) ] + [ '-'+item for item in change.get( 'removed', [] ) ]
+	details += [ '~'+item for item in change.get( 'apps', [] ) ]
+	if change.get( 'fields' ):
+		details.append( '('+', '.join( change['fields'] )+')' )
+
+	return ' '.join( [ mark, change['resource'], change['id'] ] + details )
+
+def diff_snapshots ( DCOS_IP=None ):
+	"""
+	Compare two configurations saved to disk, printing every entity added, removed or changed
+	from the first to the second, and saving the changes as JSON lines to env.SNAPSHOT_DIFF_FILE.
+	Takes no parameters but DCOS_IP is left to use the same interface on all options.
+	"""
+
+	helpers.list_configs()
+	old_name = helpers.get_input( message=env.MSG_ENTER_SNAPSHOT_FROM )
+	new_name = helpers.get_input( message=env.MSG_ENTER_SNAPSHOT_TO )
+	for name in ( old_name, new_name ):
+		if not os.path.isdir( env.BACKUP_DIR+'/'+name ):
+			helpers.log(
+				log_level='ERROR',
+				operation='DIFF',
+				objects=['Config: '+name],
+				indx=0,
+				content=env.ERROR_CONFIG_NOT_FOUND
+				)
+			helpers.get_input( message=env.MSG_PRESS_ENTER )
+			return False
+
+	counts = { 'added': 0, 'removed': 0, 'changed': 0 }
+	with open( env.SNAPSHOT_DIFF_FILE, 'w' ) as diff_file:
+		for change in diff_snapshot_dirs( env.BACKUP_DIR+'/'+old_name, env.BACKUP_DIR+'/'+new_name ):
+			counts[ change['change'] ] += 1
+			diff_file.write( codec.dumps( change )+'\n' )
+			print( format_change( change ) )
+	print( '{0} {1} added, {2} removed, {3} changed.'.format( env.MARK, counts['added'], counts['removed'], counts['changed'] ) )
+	helpers.get_input( message=env.MSG_PRESS_ENTER )
+
+	return counts
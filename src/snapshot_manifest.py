@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+#
+# snapshot_manifest.py: integrity manifest of the configurations saved to disk
+#
+# Author: Fernando Sanchez [ fernando at mesosphere.com ]
+#
+# Every configuration saved under BACKUP_DIR carries a manifest with the size,
+# number of records and sha256 digest of each of its files, computed in parallel
+# when it's saved. Configurations can then be verified against their manifest
+# (one, or all of them at once with a pool of workers) well before they are
+# needed for a restore.
+
+import os
+import time
+import hashlib
+from ntpath import basename
+from concurrent.futures import ThreadPoolExecutor
+import env				#environment variables and constants
+import codec				#JSON encoding and decoding
+import helpers			#helper functions in separate module helpers.py
+import buffer_store		#atomic writes of buffer files
+import buffer_stream	#stream the records of a buffer file one at a time
+
+#files whose records are counted, with the lists they hold them in
+RECORD_LISTS = {
+	basename( env.USERS_FILE ):				[ 'array' ],
+	basename( env.USERS_GROUPS_FILE ):		[ 'array' ],
+	basename( env.GROUPS_FILE ):			[ 'array' ],
+	basename( env.GROUPS_USERS_FILE ):		[ 'array' ],
+	basename( env.ACLS_FILE ):				[ 'array' ],
+	basename( env.ACLS_PERMISSIONS_FILE ):	[ 'array' ],
+	basename( env.AGENTS_FILE ):			[ 'slaves' ],
+	basename( env.APPS_FILE ):				[ 'apps', 'pods' ],
+}
+
+def hash_file( path ):
+	"""
+	Returns the sha256 hex digest of the file at path, read in chunks.
+	"""
+
+	digest = hashlib.sha256()
+	with open( path, 'rb' ) as hashed_file:
+		for chunk in iter( lambda: hashed_file.read( env.BUFFER_CHUNK_SIZE ), b'' ):
+			digest.update( chunk )
+
+	return digest.hexdigest()
+
+def file_entry( path ):
+	"""
+	Describe the file at path for the manifest.
+	Returns a dictionary with its 'size', 'sha256' and, for files with a list of records, 'records'.
+	"""
+
+	entry = { 'size': os.path.getsize( path ), 'sha256': hash_file( path ) }
+	if basename( path ) in RECORD_LISTS:
+		entry['records'] = 0
+		for key in RECORD_LISTS[ basename( path ) ]:
+			with buffer_stream.BufferReader( path, key ) as reader:
+				entry['records'] += len( reader )
+
+	return entry
+
+def write_manifest( directory, max_workers=env.MAX_WORKERS ):
+	"""
+	Describe every snapshot file in the directory received, in parallel, and save the manifest
+	to env.MANIFEST_FILE_NAME in that directory.
+	Returns the manifest as a dictionary.
+	"""
+
+	names = sorted( set( basename( path ) for path in env.snapshot_files ) )
+	names = [ name for name in names if os.path.exists( os.path.join( directory, name ) ) ]
+	with ThreadPoolExecutor( max_workers=max_workers ) as executor:
+		entries = executor.map( file_entry, [ os.path.join( directory, name ) for name in names ] )
+		manifest = {
+			'created':	time.strftime( '%Y-%m-%dT%H:%M:%S' ),
+			'files':	dict( zip( names, entries ) )
+		}
+	buffer_store.write_buffer_file( os.path.join( directory, env.MANIFEST_FILE_NAME ), codec.dumps( manifest, indent=True ) )
+
+	return manifest
+
+def verify_file( directory, name, expected ):
+	"""
+	Check a file of a snapshot directory against its manifest entry.
+	Returns the list of problems found (empty if the file is intact).
+	"""
+
+	path = os.path.join( directory, name )
+	if not os.path.exists( path ):
+		return [ name+': missing' ]
+	if os.path.getsize( path ) != expected['size']:
+		return [ '{0}: size {1}, expected {2}'.format( name, os.path.getsize( path ), expected['size'] ) ]
+	try:
+		entry = file_entry( path )
+	except ValueError as error:
+		return [ '{0}: unreadable ({1})'.format( name, error ) ]
+	problems = []
+	if entry['sha256'] != expected['sha256']:
+		problems.append( name+': sha256 mismatch' )
+	if entry.get( 'records' ) != expected.get( 'records' ):
+		problems.append( '{0}: {1} records, expected {2}'.format( name, entry.get( 'records' ), expected.get( 'records' ) ) )
+
+	return problems
+
+def verify_snapshots( names, max_workers=env.MAX_WORKERS ):
+	"""
+	Verify the configurations saved under BACKUP_DIR with the names received against their
+	manifests, checking all their files with a single pool of workers.
+	Returns a dictionary of name : list of problems found (empty if the configuration is intact).
+	"""
+
+	results = { name: [] for name in names }
+	jobs = []
+	for name in names:
+		directory = os.path.join( env.BACKUP_DIR, name )
+		try:
+			with open( os.path.join( directory, env.MANIFEST_FILE_NAME ), 'rb' ) as manifest_file:
+				manifest = codec.loads( manifest_file.read() )
+		except ( IOError, ValueError ):
+			results[name].append( env.MANIFEST_FILE_NAME+': missing or unreadable' )
+			continue
+		for file_name, expected in manifest['files'].items():
+			jobs.append( ( name, directory, file_name, expected ) )
+
+	with ThreadPoolExecutor( max_workers=max_workers ) as executor:
+		checked = executor.map( lambda job: ( job[0], verify_file( *job[1:] ) ), jobs )
+		for name, problems in checked:
+			results[name].extend( problems )
+
+	return results
+
+def verify_configs ( DCOS_IP=None ):
+	"""
+	Verify a configuration saved to disk against its manifest, or all of them if no name is entered.
+	Takes no parameters but DCOS_IP is left to use the same interface on all options.
+	"""
+
+	helpers.list_configs()
+	name = helpers.get_input( message=env.MSG_ENTER_CONFIG_VERIFY ).strip()
+	names = [ name ] if name else sorted( os.listdir( env.BACKUP_DIR ) )
+	results = verify_snapshots( names )
+	for name, problems in sorted( results.items() ):
+		helpers.log(
+			log_level='ERROR' if problems else 'INFO',
+			operation='VERIFY',
+			objects=['Config: '+name],
+			indx=len( problems ),
+			content='; '.join( problems ) if problems else '** OK **'
+			)
+	helpers.get_input( message=env.MSG_PRESS_ENTER )
+
+	return not any( results.values() )
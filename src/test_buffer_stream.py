@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+#
+# test_buffer_stream.py: tests for the chunked record scanner and the buffer readers
+
+import codec
+import buffer_stream
+
+RECORDS = [
+	{ 'uid': 'bob', 'description': 'braces { [ in strings ] }' },
+	{ 'uid': 'al"ice', 'description': 'escaped \\" quote and backslash \\\\' },
+	{ 'uid': 'carol', 'groups': [ { 'gid': 'a' }, { 'gid': 'b', 'nested': [ [ 1 ], { 'x': '}' } ] } ] },
+	{ 'uid': 'dave\\', 'description': '' }
+]
+
+#another list and keys before the one scanned, which must be ignored
+DOCUMENT = codec.dumps( { 'other': [ { 'uid': 'nope' } ], 'arr': 'array', 'array': RECORDS, 'pods': [] } ).encode( 'utf-8' )
+
+def scan( document, key, chunk_size ):
+	scanner = buffer_stream.RecordScanner( key )
+	spans = []
+	for offset in range( 0, len( document ), chunk_size ):
+		spans.extend( scanner.feed( document[ offset:offset+chunk_size ], offset ) )
+	return [ codec.loads( document[start:end] ) for start, end in spans ]
+
+def test_scanner_finds_every_record_at_any_chunk_size():
+	for chunk_size in range( 1, 17 ):
+		assert scan( DOCUMENT, 'array', chunk_size ) == RECORDS
+
+def test_scanner_only_scans_the_list_under_key():
+	assert scan( DOCUMENT, 'other', 3 ) == [ { 'uid': 'nope' } ]
+	assert scan( DOCUMENT, 'pods', 3 ) == []
+	assert scan( DOCUMENT, 'missing', 3 ) == []
+
+def test_scanner_escape_split_across_chunks():
+	#the backslash ends a chunk and the character it escapes starts the next one
+	document = b'{"array": [{"a": "x\\\\"}, {"b": "\\"}"}]}'
+	for chunk_size in range( 1, len( document )+1 ):
+		assert scan( document, 'array', chunk_size ) == [ { 'a': 'x\\' }, { 'b': '"}' } ]
+
+def test_reader_small_chunks( tmp_path ):
+	path = str( tmp_path / 'users.json' )
+	with open( path, 'wb' ) as buffer_file:
+		buffer_file.write( DOCUMENT )
+	with buffer_stream.BufferReader( path, 'array', chunk_size=2 ) as reader:
+		assert reader[2] == RECORDS[2]
+		assert list( reader ) == RECORDS
+		assert len( reader ) == len( RECORDS )
+		assert reader.page( 3, 10 ) == RECORDS[3:]
+	#read again, from the spans cached for the unchanged file
+	assert list( buffer_stream.iter_records( path, 'array', chunk_size=5 ) ) == RECORDS
+
+def test_reader_empty_file( tmp_path ):
+	path = str( tmp_path / 'empty.json' )
+	open( path, 'wb' ).close()
+	with buffer_stream.BufferReader( path ) as reader:
+		assert list( reader ) == []
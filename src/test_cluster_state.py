@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+#
+# test_cluster_state.py: tests for the comparison of two live clusters
+
+import pytest
+pytest.importorskip( 'requests' )
+import requests
+import codec
+import helpers
+import cluster_state
+
+FIRST = { 'DCOS_IP': 'first', 'TOKEN': 't' }
+SECOND = { 'DCOS_IP': 'second', 'TOKEN': 't' }
+
+class Response( object ):
+
+	def __init__( self, body, status_code=200 ):
+		self.content = codec.dumps( body )
+		self.status_code = status_code
+		self.text = ''
+
+	def raise_for_status( self ):
+		if self.status_code >= 400:
+			raise requests.exceptions.HTTPError( self.status_code )
+
+BODIES = {
+	'/acs/api/v1/users': { 'array': [ { 'uid': 'bob', 'description': 'Bob' }, { 'uid': 'al', 'description': 'Al' } ] },
+	'/acs/api/v1/groups': { 'array': [] },
+	'/acs/api/v1/acls': { 'array': [ { 'rid': 'dcos:ops', 'description': 'Ops' } ] },
+	'/marathon/v2/groups': { 'id': '/', 'apps': [], 'groups': [] },
+	'/acs/api/v1/users/bob/groups': { 'array': [] },
+	'/acs/api/v1/users/al/groups': { 'array': [] },
+	'/acs/api/v1/acls/dcos:ops/permissions': { 'users': [], 'groups': [] }
+}
+
+def serve( errors ):
+	"""
+	Fake send_request answering BODIES, except for the ( host, endpoint ) in errors, answered with their status.
+	"""
+
+	def send_request( method, url, resource, **kwargs ):
+		host, api_endpoint = url[ len( 'http://' ): ].split( '/', 1 )
+		api_endpoint = '/'+api_endpoint
+		if ( host, api_endpoint ) in errors:
+			return Response( {}, errors[ ( host, api_endpoint ) ] )
+		return Response( BODIES[api_endpoint] ) if api_endpoint in BODIES else Response( {}, 404 )
+
+	return send_request
+
+def test_same_clusters( monkeypatch ):
+	monkeypatch.setattr( helpers, 'send_request', serve( {} ) )
+	assert list( cluster_state.diff_clusters( FIRST, SECOND ) ) == []
+
+def test_failed_detail_is_unreadable_not_missing( monkeypatch ):
+	monkeypatch.setattr( helpers, 'send_request', serve( { ( 'second', '/acs/api/v1/users/bob/groups' ): 503 } ) )
+	assert list( cluster_state.diff_clusters( FIRST, SECOND ) ) == [
+		{ 'resource': 'memberships', 'id': 'bob', 'problem': 'unreadable', 'cluster': 'second' }
+	]
+
+def test_refused_list_is_unreadable( monkeypatch ):
+	monkeypatch.setattr( helpers, 'send_request', serve( { ( 'first', '/acs/api/v1/acls' ): 403 } ) )
+	differences = list( cluster_state.diff_clusters( FIRST, SECOND ) )
+	assert differences == [ { 'resource': 'acls', 'id': None, 'problem': 'unreadable', 'cluster': 'first' } ]
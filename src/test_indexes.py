@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+#
+# test_indexes.py: tests for the permissions queries over the ACL and membership indexes
+
+import pytest
+pytest.importorskip( 'requests' )
+import indexes
+
+INDEXES = {
+	'rid_principals': {
+		'dcos:adminrouter:ops': { 'user:bob': [ 'read' ], 'group:ops': [ 'full' ] },
+		'dcos:secrets': { 'group:ops': [ 'read' ] }
+	},
+	'principal_rids': {
+		'user:bob': { 'dcos:adminrouter:ops': [ 'read' ] },
+		'group:ops': { 'dcos:adminrouter:ops': [ 'full' ], 'dcos:secrets': [ 'read' ] }
+	},
+	'group_members': { 'ops': [ 'alice', 'bob' ] },
+	'user_groups': { 'alice': [ 'ops' ], 'bob': [ 'ops' ] }
+}
+
+def test_who_can_merges_direct_and_group_grants():
+	#grants are visited in principal order: the group's before bob's own
+	assert indexes.who_can( INDEXES, 'dcos:adminrouter:ops' ) == {
+		'user:bob': { 'actions': [ 'full', 'read' ], 'via': [ 'group:ops', 'direct' ] },
+		'group:ops': { 'actions': [ 'full' ], 'via': [ 'direct' ] },
+		'user:alice': { 'actions': [ 'full' ], 'via': [ 'group:ops' ] }
+	}
+	assert indexes.who_can( INDEXES, 'dcos:unknown' ) == {}
+
+def test_what_can_merges_direct_and_group_grants():
+	assert indexes.what_can( INDEXES, 'user:bob' ) == {
+		'dcos:adminrouter:ops': { 'actions': [ 'full', 'read' ], 'via': [ 'direct', 'group:ops' ] },
+		'dcos:secrets': { 'actions': [ 'read' ], 'via': [ 'group:ops' ] }
+	}
+	assert indexes.what_can( INDEXES, 'group:ops' ) == {
+		'dcos:adminrouter:ops': { 'actions': [ 'full' ], 'via': [ 'direct' ] },
+		'dcos:secrets': { 'actions': [ 'read' ], 'via': [ 'direct' ] }
+	}
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+#
+# test_service_group_hashes.py: tests for the Merkle hashes of service group trees
+
+import copy
+import service_group_hashes
+
+TREE = {
+	'id': '/', 'apps': [], 'groups': [
+		{ 'id': '/a', 'apps': [ { 'id': '/a/app', 'cmd': 'sleep 1', 'version': '1' } ], 'groups': [
+			{ 'id': '/a/b', 'apps': [], 'groups': [] }
+		] },
+		{ 'id': '/c', 'apps': [], 'groups': [] }
+	]
+}
+
+def diff( source, target ):
+	return service_group_hashes.diff_service_groups(
+		service_group_hashes.hash_service_groups( source ), service_group_hashes.hash_service_groups( target ) )
+
+def test_same_tree():
+	assert diff( TREE, copy.deepcopy( TREE ) ) == { 'groups': [], 'apps': [], 'extra': [] }
+
+def test_read_only_fields_are_ignored():
+	target = copy.deepcopy( TREE )
+	target['groups'][0]['apps'][0]['version'] = '2'
+	assert diff( TREE, target ) == { 'groups': [], 'apps': [], 'extra': [] }
+
+def test_changed_app():
+	target = copy.deepcopy( TREE )
+	target['groups'][0]['apps'][0]['cmd'] = 'sleep 2'
+	assert diff( TREE, target ) == { 'groups': [], 'apps': [ '/a/app' ], 'extra': [] }
+
+def test_missing_changed_and_extra_groups():
+	target = copy.deepcopy( TREE )
+	target['groups'][0]['groups'] = []
+	target['groups'][1]['enforceRole'] = True
+	target['groups'].append( { 'id': '/d', 'apps': [], 'groups': [] } )
+	assert diff( TREE, target ) == { 'groups': [ '/a/b', '/c' ], 'apps': [], 'extra': [ '/d' ] }
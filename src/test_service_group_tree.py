@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+#
+# test_service_group_tree.py: tests for the service group tree traversal and path patterns
+
+import service_group_tree
+
+def group( group_id, *groups, apps=() ):
+	return { 'id': group_id, 'apps': [ { 'id': app } for app in apps ], 'groups': list( groups ) }
+
+TREE = group( '/',
+	group( '/prod',
+		group( '/prod/payments', group( '/prod/payments/db' ), apps=[ '/prod/payments/api' ] ),
+		group( '/prod/web' ),
+		apps=[ '/prod/proxy' ] ),
+	group( '/dev', group( '/dev/team', group( '/dev/team/payments' ) ) ),
+	group( '/payments' )
+)
+
+def ids( groups ):
+	return [ g['id'] for g in groups ]
+
+def test_walk_orders():
+	pre = ids( g for path, g in service_group_tree.walk_pre_order( TREE ) )
+	post = ids( g for path, g in service_group_tree.walk_post_order( TREE ) )
+	assert pre == [ '/', '/prod', '/prod/payments', '/prod/payments/db', '/prod/web', '/dev', '/dev/team', '/dev/team/payments', '/payments' ]
+	assert post.index( '/prod/payments/db' ) < post.index( '/prod/payments' ) < post.index( '/prod' ) < post.index( '/' )
+
+def test_walk_deep_tree_without_recursion():
+	root = leaf = group( '/' )
+	for depth in range( 5000 ):
+		child = group( leaf['id'].rstrip( '/' )+'/g' )
+		leaf['groups'].append( child )
+		leaf = child
+	assert len( list( service_group_tree.walk_post_order( root ) ) ) == 5001
+
+def test_match_path_wildcards():
+	assert service_group_tree.match_path( '/prod/pay*', '/prod/payments' )
+	assert service_group_tree.match_path( 'prod/payments/', '/prod/payments' )
+	assert not service_group_tree.match_path( '/prod/pay*', '/prod/payments/db' )
+	assert not service_group_tree.match_path( '/prod/*', '/prod' )
+
+def test_match_path_double_star():
+	for group_id in ( '/prod', '/prod/payments', '/prod/payments/db' ):
+		assert service_group_tree.match_path( '/prod/**', group_id )
+	assert not service_group_tree.match_path( '/prod/**', '/dev' )
+	for group_id in ( '/payments', '/prod/payments', '/dev/team/payments' ):
+		assert service_group_tree.match_path( '/**/payments', group_id )
+	assert not service_group_tree.match_path( '/**/payments', '/prod/payments/db' )
+	assert service_group_tree.match_path( '/**/payments/**', '/prod/payments/db' )
+	assert service_group_tree.match_path( '/prod/**/db', '/prod/payments/db' )
+	assert service_group_tree.match_path( '**', '/' )
+	assert service_group_tree.match_path( '/**/**/db', '/prod/payments/db' )
+
+def test_may_contain_match():
+	assert service_group_tree.may_contain_match( '/prod/payments/**', '/prod' )
+	assert not service_group_tree.may_contain_match( '/prod/payments/**', '/dev' )
+	assert service_group_tree.may_contain_match( '/**/payments', '/dev/team' )
+
+def test_select_subtrees_topmost_only():
+	assert ids( service_group_tree.select_subtrees( TREE, '/**/payments' ) ) == [ '/prod/payments', '/dev/team/payments', '/payments' ]
+	assert ids( service_group_tree.select_subtrees( TREE, '/prod/**' ) ) == [ '/prod' ]
+	assert ids( service_group_tree.select_subtrees( TREE, '/nothing/*' ) ) == []
+
+def test_prune_to_selection_keeps_root():
+	pruned = service_group_tree.prune_to_selection( TREE, '/prod/payments' )
+	assert pruned['id'] == '/' and pruned['apps'] == []
+	prod = pruned['groups'][0]
+	assert ids( pruned['groups'] ) == [ '/prod' ] and prod['apps'] == []
+	assert prod['groups'] == [ TREE['groups'][0]['groups'][0] ]
+	assert service_group_tree.prune_to_selection( TREE, '/nothing' ) is None
+	assert service_group_tree.prune_to_selection( TREE, '/**' ) is TREE
+
+def test_literal_prefix_and_graft():
+	assert service_group_tree.literal_prefix( '/prod/payments/**' ) == '/prod/payments'
+	assert service_group_tree.literal_prefix( '/prod/pay*/db' ) == '/prod'
+	assert service_group_tree.literal_prefix( '/**/payments' ) == '/'
+	subtree = group( '/prod/payments', apps=[ '/prod/payments/api' ] )
+	root = service_group_tree.graft( subtree )
+	assert root['id'] == '/' and ids( root['groups'] ) == [ '/prod' ]
+	assert root['groups'][0]['groups'] == [ subtree ]
+	assert service_group_tree.graft( TREE ) is TREE
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+#
+# test_snapshot_diff.py: tests for the sorted merge of the structural snapshot diff
+
+import pytest
+pytest.importorskip( 'requests' )
+import snapshot_diff
+
+def test_merge_sorted():
+	old = [ ( 'a', 1, 0 ), ( 'b', 2, 1 ), ( 'd', 4, 2 ) ]
+	new = [ ( 'b', 2, 0 ), ( 'c', 3, 1 ), ( 'd', 5, 2 ), ( 'e', 6, 3 ) ]
+	assert list( snapshot_diff.merge_sorted( old, new ) ) == [
+		( 'a', ( 'a', 1, 0 ), None ),
+		( 'c', None, ( 'c', 3, 1 ) ),
+		( 'd', ( 'd', 4, 2 ), ( 'd', 5, 2 ) ),
+		( 'e', None, ( 'e', 6, 3 ) )
+	]
+
+def test_merge_sorted_empty_sides():
+	entries = [ ( 'a', 1, 0 ) ]
+	assert list( snapshot_diff.merge_sorted( [], [] ) ) == []
+	assert list( snapshot_diff.merge_sorted( entries, [] ) ) == [ ( 'a', entries[0], None ) ]
+	assert list( snapshot_diff.merge_sorted( [], entries ) ) == [ ( 'a', None, entries[0] ) ]